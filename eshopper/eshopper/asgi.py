@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eshopper.settings')
+# Use the async storefront views (see STORE_ASYNC_VIEWS) unless told otherwise.
+os.environ.setdefault('ESHOPPER_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -10,6 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import tempfile
+import django
+from django.core.exceptions import ImproperlyConfigured
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,29 +48,41 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # Serve static files before sessions, CSRF and auth run.
+    # WhiteNoise, async capable so ASGI views aren't pushed into a thread (store.storage).
+    'store.storage.StoreWhiteNoiseMiddleware',
+    # Times everything below it; see store.instrumentation.
+    'store.instrumentation.PerformanceMiddleware',
+    'store.sessions.CountingSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
 ]
 
 ROOT_URLCONF = 'eshopper.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, with render time reported by PerformanceMiddleware.
+        'BACKEND': 'store.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept in memory instead of re-parsed for every render.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'django.template.context_processors.csrf',
+                'store.context_processors.fragments',
             ],
         },
     },
@@ -77,12 +94,66 @@ WSGI_APPLICATION = 'eshopper.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default. Set ESHOPPER_DB_ENGINE=postgresql, plus ESHOPPER_DB_NAME,
+# _USER, _PASSWORD, _HOST and _PORT, to run on Postgres.
+DB_ENGINE = os.environ.get('ESHOPPER_DB_ENGINE', 'sqlite3')
+
+# Seconds a connection is reused across requests (0 closes it after each one);
+# health checks replace a connection that went away in the meantime.
+DB_CONN_MAX_AGE = int(os.environ.get('ESHOPPER_DB_CONN_MAX_AGE', 60))
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('ESHOPPER_DB_NAME', 'eshopper'),
+            'USER': os.environ.get('ESHOPPER_DB_USER', 'eshopper'),
+            'PASSWORD': os.environ.get('ESHOPPER_DB_PASSWORD', ''),
+            'HOST': os.environ.get('ESHOPPER_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('ESHOPPER_DB_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            # PgBouncer in transaction pooling mode can't hold server-side cursors open.
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('ESHOPPER_DB_PGBOUNCER') == '1',
+            'OPTIONS': {'connect_timeout': 5},
+        }
+    }
+    # In-process pool (Django 5.1+ with psycopg 3), sized per worker process.
+    # It replaces persistent connections, so CONN_MAX_AGE must be 0.
+    DB_POOL_SIZE = int(os.environ.get('ESHOPPER_DB_POOL_SIZE', 0))
+    if DB_POOL_SIZE and django.VERSION < (5, 1):
+        raise ImproperlyConfigured('ESHOPPER_DB_POOL_SIZE needs Django 5.1 or later.')
+    if DB_POOL_SIZE:
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {'min_size': 1, 'max_size': DB_POOL_SIZE, 'timeout': 10}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('ESHOPPER_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
     }
+    if django.VERSION >= (5, 1):
+        # Take the write lock when a transaction starts, so concurrent checkouts
+        # wait on busy_timeout instead of failing to upgrade a read lock.
+        DATABASES['default']['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
+
+# Run on every new SQLite connection (see store.signals). WAL lets readers carry
+# on while a checkout writes, and synchronous=NORMAL is durable under WAL
+# except against power loss; busy_timeout is in milliseconds.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': int(os.environ.get('ESHOPPER_SQLITE_BUSY_TIMEOUT', 5000)),
+    'mmap_size': 256 * 1024 * 1024,
 }
+# The sample database checked into the repo. journal_mode is the one pragma
+# stored in the file itself, so it is left alone there: switching it to WAL
+# would change a tracked file on the first run.
+SQLITE_TRACKED_DATABASE = BASE_DIR / 'db.sqlite3'
 
 
 # Password validation
@@ -104,6 +175,33 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing profile: 'argon2' (needs argon2-cffi), 'scrypt' or 'pbkdf2',
+# set with ESHOPPER_PASSWORD_HASHER. Hashes from the other profiles still
+# verify and are rehashed with the chosen one when the customer next logs in.
+PASSWORD_HASHER_PROFILES = {
+    'argon2': 'store.hashers.StoreArgon2PasswordHasher',
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHER_PROFILE = os.environ.get('ESHOPPER_PASSWORD_HASHER', 'argon2' if find_spec('argon2') else 'scrypt')
+PASSWORD_HASHERS = [PASSWORD_HASHER_PROFILES[PASSWORD_HASHER_PROFILE]] + [
+    hasher for profile, hasher in PASSWORD_HASHER_PROFILES.items() if profile != PASSWORD_HASHER_PROFILE
+]
+
+# Login attempts allowed per client IP and per email address in each window
+# (seconds), counted in the cache before any password hashing. 0 turns a limit off.
+LOGIN_THROTTLE_WINDOW = 300
+LOGIN_THROTTLE_PER_IP = 50
+LOGIN_THROTTLE_PER_EMAIL = 10
+
+# Behind a reverse proxy, the header carrying the client address for the
+# per-IP limit (e.g. X-Forwarded-For or X-Real-IP), and how many proxies
+# append to it; the entry that many places from the right is used. Unset,
+# the limit is keyed on REMOTE_ADDR, which is the proxy's own address there.
+STORE_THROTTLE_IP_HEADER = os.environ.get('ESHOPPER_THROTTLE_IP_HEADER') or None
+STORE_THROTTLE_PROXY_COUNT = int(os.environ.get('ESHOPPER_THROTTLE_PROXY_COUNT', 1))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -123,16 +221,36 @@ STATIC_ROOT = BASE_DIR / 'productionfiles'
 
 STATIC_URL = 'static/'
 
+# collectstatic writes content-hashed copies plus gzip (and brotli, when the
+# brotli package is installed) variants; WhiteNoise serves hashed files with
+# far-future immutable cache headers.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'store.storage.StoreStaticFilesStorage',
+    },
+}
+
+# Cache lifetime in seconds for static files without a hash in their name.
+WHITENOISE_MAX_AGE = 3600
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Sessions hold the cart and customer details. cached_db serves reads from the
+# cache and only writes through to django_session when the session changes;
+# set ESHOPPER_SESSION_ENGINE=django.contrib.sessions.backends.signed_cookies
+# to keep them entirely client side.
+SESSION_ENGINE = os.environ.get('ESHOPPER_SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
 
 SESSION_COOKIE_AGE = 3600
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
-SESSION_SAVE_EVERY_REQUEST = True
+# Only save sessions that were modified (see store.sessions for the write counter).
+SESSION_SAVE_EVERY_REQUEST = False
 SESSION_COOKIE_SECURE = True
 SESSION_COOKIE_HTTPONLY = False
 SESSION_COOKIE_SAMESITE = 'Lax'
@@ -140,7 +258,80 @@ SESSION_COOKIE_NAME = 'eshopper_sessionid'
 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'ENTER YOUR EMAIL HOST HERE' #For example GMAIL
-EMAIL_PORT = PORT
+EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = 'ENTER YOUR EMAIL HERE'
 EMAIL_HOST_PASSWORD = 'ENTER YOUR APP PASSWORD'  # Use App Password, not regular password
+
+# Order confirmations are queued in store.OutboundEmail and delivered by
+# `python manage.py send_queued_emails`.
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_WORKERS = 2
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60  # seconds, doubled after every failed attempt
+EMAIL_OUTBOX_LEASE = 300  # seconds a claimed batch is hidden from other senders
+
+# 'log': checkouts append to a sales log that `python manage.py rollup_sales --loop`
+# adds to Product.amount_sold, so orders for one hot product don't queue on its row.
+# 'row': update amount_sold in the checkout transaction (best sellers update at once).
+STORE_SALES_COUNTER = 'log'
+SALES_ROLLUP_BATCH_SIZE = 500
+
+# Staff sales reports (store.reports): order ids folded into the daily tables
+# per transaction by `python manage.py rollup_reports`, and seconds a report is cached.
+SALES_REPORT_BATCH_SIZE = 5000
+SALES_REPORT_CACHE_TIMEOUT = 300
+
+# Catalog files (store.catalog_io): rows upserted per transaction by
+# `python manage.py import_catalog`, and rows fetched per query by export_catalog.
+CATALOG_IMPORT_BATCH_SIZE = 2000
+CATALOG_EXPORT_CHUNK_SIZE = 2000
+
+# Order line rows fetched per query and written per block by the staff order
+# export and `python manage.py export_orders` (store.exports).
+ORDER_EXPORT_CHUNK_SIZE = 2000
+
+# Per-process cache by default; point this at Redis/Memcached when running
+# more than one worker so invalidation reaches every process.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'eshopper',
+    },
+    # Rendered product cards and the category menu ({% cache ... using="fragments" %}).
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'eshopper-fragments',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Seconds a cached template fragment lives; saving a Product or Category also busts it.
+STORE_FRAGMENT_CACHE_TIMEOUT = 3600
+
+# Request timing histogram (store.instrumentation): seconds of history kept,
+# and where each process flushes it for `python manage.py dump_metrics`.
+STORE_METRICS_WINDOW = 900
+STORE_METRICS_FLUSH_INTERVAL = 10
+STORE_METRICS_DIR = os.environ.get('ESHOPPER_METRICS_DIR', os.path.join(tempfile.gettempdir(), 'eshopper-metrics'))
+# Send per-request timings to clients in a Server-Timing header.
+STORE_SERVER_TIMING = True
+
+# Serve home, search, product, collections, cart and checkout from the async
+# views in store.async_views. eshopper/asgi.py turns this on; WSGI keeps the sync views.
+STORE_ASYNC_VIEWS = os.environ.get('ESHOPPER_ASYNC_VIEWS') == '1'
+
+# Seconds a rendered product page body is kept; a product save changes its key.
+PRODUCT_PAGE_CACHE_TIMEOUT = 3600
+
+# Seconds the home page product rails stay cached (they are also invalidated on Product changes).
+HOME_RAILS_TIMEOUT = 600
+
+# Resized AVIF/WebP/JPEG product image variants, served as static files and
+# written by `python manage.py generate_thumbnails`. With
+# PRODUCT_THUMBNAILS_ON_SAVE a product save that changes the image also queues
+# them on a background thread; turn it off to leave them to the command alone.
+PRODUCT_THUMBNAIL_ROOT = BASE_DIR / 'store' / 'static' / 'thumbs'
+PRODUCT_THUMBNAIL_STATIC_PREFIX = 'thumbs/'
+PRODUCT_THUMBNAIL_WIDTHS = [320, 640, 960]
+PRODUCT_THUMBNAILS_ON_SAVE = True
@@ -1,13 +1,134 @@
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections, router
+from django.db.models import Q
+from django.utils.functional import cached_property
 from .models import Product
 from .models import Category
 from .models import Customer
 from .models import Order
 from .models import OrderItem
+from .models import OutboundEmail
+from .search import get_search_backend
 
-# Register your models here.
-admin.site.register(Product)
-admin.site.register(Category)
-admin.site.register(Customer)
-admin.site.register(Order)
-admin.site.register(OrderItem)
\ No newline at end of file
+
+def estimate_count(model):
+    """
+    Cheap row count estimate for a table: the planner's statistics on
+    PostgreSQL, the highest primary key elsewhere. Returns None if unknown.
+    """
+    connection = connections[router.db_for_read(model)]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        # -1 until the table has been analyzed.
+        return int(row[0]) if row and row[0] >= 0 else None
+    return model._default_manager.order_by('-pk').values_list('pk', flat=True).first()
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for changelists over huge tables. An unfiltered list shows an
+    estimated total (see estimate_count) instead of running COUNT(*) over the
+    whole table; filtered and searched lists are still counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimate_count(self.object_list.model)
+            if estimate is not None and estimate >= getattr(settings, 'ADMIN_ESTIMATED_COUNT_THRESHOLD', 10000):
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Defaults for tables that grow with traffic: estimated totals and no
+    second COUNT(*) for the "x of y selected" line on filtered lists.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ('name',)
+    search_fields = ('name',)
+
+
+@admin.register(Product)
+class ProductAdmin(LargeTableAdmin):
+    list_display = ('title', 'sku', 'category', 'price', 'amount_sold', 'updated_at')
+    list_filter = ('category',)
+    list_select_related = ('category',)
+    search_fields = ('title',)
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Searches with the storefront's search backend (full-text where available)
+        instead of a LIKE scan over every title.
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        limit = getattr(settings, 'ADMIN_SEARCH_LIMIT', 1000)
+        ids = get_search_backend().ranked_ids(search_term, 0, limit)
+        if search_term.isdigit():
+            ids.append(int(search_term))
+        return queryset.filter(Q(id__in=ids) | Q(sku=search_term)), False
+
+
+@admin.register(Customer)
+class CustomerAdmin(LargeTableAdmin):
+    list_display = ('first_name', 'last_name', 'email', 'phone')
+    # Exact match on the unique email index.
+    search_fields = ('=email',)
+
+
+class OrderItemInline(admin.TabularInline):
+    """
+    An order's lines. The product is shown read-only from the joined row, since
+    a raw-id widget looks up its label with one query per line; lines are
+    added through the order item admin.
+    """
+    model = OrderItem
+    extra = 0
+    fields = ('product', 'quantity', 'price')
+    readonly_fields = ('product',)
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
+
+@admin.register(Order)
+class OrderAdmin(LargeTableAdmin):
+    list_display = ('id', 'customer', 'date', 'status', 'address', 'phone')
+    list_filter = ('status',)
+    list_select_related = ('customer',)
+    # Exact matches on the primary key and the unique customer email.
+    search_fields = ('=id', '=customer__email')
+    # Drill-down filters and sorts on date; order_date_idx (date, id) serves both.
+    date_hierarchy = 'date'
+    raw_id_fields = ('customer',)
+    inlines = (OrderItemInline,)
+
+
+@admin.register(OrderItem)
+class OrderItemAdmin(LargeTableAdmin):
+    list_display = ('id', 'order', 'product', 'quantity', 'price')
+    list_select_related = ('order', 'product')
+    search_fields = ('=order__id',)
+    raw_id_fields = ('order', 'product')
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(LargeTableAdmin):
+    list_display = ('subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
@@ -0,0 +1,158 @@
+"""
+Async versions of the read-heavy storefront views and checkout, used when
+STORE_ASYNC_VIEWS is on (eshopper/asgi.py turns it on).
+
+They share their context building and templates with store.views. Queries go
+through the async ORM. The session is loaded once per request in a worker
+thread, because Django's session stores are sync. After that, reads and writes
+only touch the in-memory dict, and the session middleware saves it as usual.
+Templates are rendered on the event loop once the category registry is warm,
+so the navbar never queries from async code.
+"""
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.utils.text import slugify
+from . import views
+from .cart import Cart
+from .catalog import acollection_page, category_registry
+from .models import Product
+from .pages import aget_cached_page, aproduct_validators, aset_cached_page
+from .rails import aget_best_sellers, aget_hot_deals
+
+
+async def _load_session(request):
+    await sync_to_async(request.session.get)('Customer')
+
+
+async def _render(request, template_name, context):
+    await category_registry.aentries()
+    return render(request, template_name, context)
+
+
+async def home(request):
+    """
+    Async home(): the main index page.
+    """
+    await _load_session(request)
+    most_sold_prod = await aget_best_sellers()
+    hot_prod = await aget_hot_deals()
+    cust, cart = views._init_home_session(request)
+
+    return await _render(request, 'home.html', {
+        'Customer': cust,
+        'Cart': cart,
+        'Most_Sold_Products': most_sold_prod,
+        'Hot_Products': hot_prod,
+    })
+
+
+async def q(request):
+    """
+    Async q(): product search.
+    """
+    search = request.GET.get('search') or request.POST.get('search')
+    if not search:
+        return redirect('home')
+    try:
+        page_number = int(request.GET.get('page', 1))
+    except ValueError:
+        page_number = 1
+
+    await _load_session(request)
+    # The search backends run raw SQL, so they stay sync.
+    page = await sync_to_async(Product.search)(search, page=page_number)
+
+    return await _render(request, 'q.html', {
+        'Products': views._product_cards(page.results),
+        'Page': page,
+        'Cart': request.session.get('Cart', {}),
+    })
+
+
+async def product(request, product_id):
+    """
+    Async product(). Does the same conditional GET handling as the
+    @condition decorator on the sync view, which can't wrap async views in
+    every Django version this project runs on.
+    """
+    await _load_session(request)
+    validators = await aproduct_validators(request, product_id)
+    if validators is None:
+        return redirect('home')
+
+    etag = quote_etag(validators['etag'])
+    last_modified = int(validators['last_modified'].timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        body = await aget_cached_page(validators['key'])
+        if body is None:
+            try:
+                product_obj = await Product.objects.aget(id=product_id)
+            except Product.DoesNotExist:
+                return redirect('home')
+            await category_registry.aentries()
+            body = views._render_product_page(request, product_obj, request.session.get('Customer', {}))
+            await aset_cached_page(validators['key'], body)
+        response = views._product_response(request, body)
+
+    if request.method in ('GET', 'HEAD'):
+        if not response.has_header('Last-Modified'):
+            response.headers['Last-Modified'] = http_date(last_modified)
+        if not response.has_header('ETag'):
+            response.headers['ETag'] = etag
+    return response
+
+
+async def collections(request, slug):
+    """
+    Async collections(): one keyset page of a category's products.
+    """
+    category = await category_registry.aget(slug)
+    if category is None:
+        moved = await category_registry.aget(slugify(slug))
+        if moved is not None:
+            return views._collection_moved(request, moved)
+
+    await _load_session(request)
+    sort = views._collection_sort(request)
+    prod, next_cursor = [], None
+    if category is not None:
+        prod, next_cursor = await acollection_page(category.id, sort=sort, cursor=request.GET.get('cursor'))
+
+    context = views._collections_context(request, slug, category, sort, prod, next_cursor)
+    return await _render(request, 'collections.html', context)
+
+
+async def cart(request):
+    """
+    Async cart(): the cart page, priced in one query.
+    """
+    await _load_session(request)
+    cart = await Cart(request.session).asummary()
+    return await _render(request, 'cart.html', {'Cart': cart, 'Customer': request.session.get('Customer', {})})
+
+
+async def order(request):
+    """
+    Async order(). The order and its confirmation email are written in one
+    transaction on a worker thread, since the async ORM has no transactions.
+    The email goes to the outbox, so checkout never waits on SMTP.
+    """
+    await _load_session(request)
+    if request.method != 'POST':
+        return await _render(request, 'order.html', {
+            'Cart': request.session.get('Cart', {}), 'Customer': request.session.get('Customer', {}),
+        })
+
+    cart = Cart(request.session)
+    if not len(cart):
+        return redirect('home')
+
+    failed = await sync_to_async(views._checkout)(request, cart, request.session.get('Customer', {}))
+    if failed is not None:
+        return failed
+
+    cart.clear()
+    return redirect('ordered')
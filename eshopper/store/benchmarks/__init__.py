@@ -0,0 +1,80 @@
+"""
+Benchmarks run with `python manage.py benchmark <name>`.
+
+Every benchmark works on a throwaway test database created for the run, so
+the project's own database is never touched.
+"""
+import statistics
+import time
+from contextlib import contextmanager
+from importlib import import_module
+from django.db import connections
+
+# name -> module exposing add_arguments(parser) and run(options, stdout)
+BENCHMARKS = {
+    'asgi': 'store.benchmarks.asgi',
+    'catalog': 'store.benchmarks.catalog',
+    'checkout': 'store.benchmarks.checkout',
+    'indexes': 'store.benchmarks.indexes',
+    'instrumentation': 'store.benchmarks.instrumentation',
+    'login': 'store.benchmarks.login',
+    'reports': 'store.benchmarks.reports',
+    'search': 'store.benchmarks.search',
+    'static': 'store.benchmarks.static',
+    'templates': 'store.benchmarks.templates',
+    'traffic': 'store.benchmarks.traffic',
+}
+
+
+def get_benchmark(name):
+    return import_module(BENCHMARKS[name])
+
+
+@contextmanager
+def benchmark_database(name=None, alias='default'):
+    """
+    Creates a fresh, fully migrated test database for the duration of the block.
+    `name` overrides the test database name (a file path for SQLite).
+    """
+    connection = connections[alias]
+    if name:
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = name
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def measure(fn, repeat=20, warmup=2):
+    """
+    Calls fn repeatedly and returns latency statistics in milliseconds.
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """
+    Returns min/mean/percentile statistics for a list of millisecond samples.
+    """
+    return {
+        'count': len(samples),
+        'min_ms': round(min(samples), 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+    }
@@ -0,0 +1,297 @@
+"""
+Compares storefront throughput under ASGI, with the async views, against the
+WSGI deployment with the sync views.
+
+Both run the traffic mix from the `traffic` benchmark with --concurrency
+shoppers in flight at once: WSGI with one thread per shopper, as a threaded
+server would, and ASGI as concurrent tasks on one event loop, as uvicorn would.
+Requests are handed to each application object in process, so the numbers
+measure Django and the views rather than a server's HTTP parsing. Query
+counts are read from the Server-Timing header.
+
+On SQLite pass --db with a file path, so the database runs in WAL mode; the
+in-memory test database locks whole tables between threads.
+"""
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from http.cookies import SimpleCookie
+from io import BytesIO
+from urllib.parse import urlencode
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import override_settings
+from store import async_views, views
+from store.catalog import category_registry
+from store.models import Product
+from store.urls import storefront_urlpatterns
+from . import benchmark_database
+from .seed import MATERIALS, WORDS, seed_store
+from .traffic import DEFAULT_MIX, OK_STATUSES, VirtualUser, _report, parse_mix
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+class URLConf:
+    """
+    A ROOT_URLCONF with the storefront pages taken from store.views or store.async_views.
+    """
+
+    def __init__(self, pages):
+        self.urlpatterns = storefront_urlpatterns(pages)
+
+
+class Shopper:
+    """
+    Cookies and CSRF token of one visitor, plus the request details both
+    applications need.
+    """
+
+    def __init__(self, index):
+        self.cookies = SimpleCookie()
+        self.ip = f'10.2.{index // 250}.{index % 250}'
+
+    def prepare(self, method, path, data):
+        query, body = '', b''
+        if method == 'GET' and data:
+            query = urlencode(data)
+        elif method == 'POST':
+            body = urlencode(data or {}).encode()
+        headers = {'host': '127.0.0.1'}
+        if self.cookies:
+            headers['cookie'] = '; '.join(f'{name}={morsel.value}' for name, morsel in self.cookies.items())
+        if method == 'POST':
+            headers['content-type'] = 'application/x-www-form-urlencoded'
+            headers['content-length'] = str(len(body))
+            if 'csrftoken' in self.cookies:
+                headers['x-csrftoken'] = self.cookies['csrftoken'].value
+        return query, body, headers
+
+    def finish(self, status, headers):
+        for name, value in headers:
+            if name.lower() == 'set-cookie':
+                self.cookies.load(value)
+        timing = next((value for name, value in headers if name.lower() == 'server-timing'), '')
+        match = QUERIES.search(timing)
+        return status, int(match.group(1)) if match else 0
+
+
+class WSGIShopper(Shopper):
+    def __init__(self, index, app):
+        super().__init__(index)
+        self.app = app
+
+    def request(self, method, path, data=None):
+        query, body, headers = self.prepare(method, path, data)
+        environ = {
+            'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+            'SERVER_NAME': '127.0.0.1', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': self.ip, 'wsgi.input': BytesIO(body), 'wsgi.errors': BytesIO(),
+            'wsgi.url_scheme': 'http', 'wsgi.version': (1, 0),
+            'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        for name, value in headers.items():
+            if name in ('content-type', 'content-length'):
+                environ[name.upper().replace('-', '_')] = value
+            else:
+                environ['HTTP_' + name.upper().replace('-', '_')] = value
+
+        started = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            started['status'], started['headers'] = int(status.split()[0]), response_headers
+
+        response = self.app(environ, start_response)
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        return self.finish(started['status'], started['headers'])
+
+
+class ASGIShopper(Shopper):
+    def __init__(self, index, app):
+        super().__init__(index)
+        self.app = app
+
+    async def request(self, method, path, data=None):
+        query, body, headers = self.prepare(method, path, data)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http',
+            'method': method, 'path': path, 'raw_path': path.encode(), 'root_path': '',
+            'query_string': query.encode(), 'client': (self.ip, 50000), 'server': ('127.0.0.1', 80),
+            'headers': [(name.encode(), value.encode()) for name, value in headers.items()],
+        }
+        received = False
+        disconnected = asyncio.Event()
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            # Like a server, only report a disconnect once the response is done.
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        started = {}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                started['status'] = message['status']
+                started['headers'] = [(name.decode(), value.decode()) for name, value in message['headers']]
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            disconnected.set()
+        return self.finish(started['status'], started['headers'])
+
+
+class _Results:
+    def __init__(self):
+        self.results = {}
+        self.lock = threading.Lock()
+
+    def add(self, action, elapsed, status, queries):
+        with self.lock:
+            result = self.results.setdefault(action, {'samples': [], 'queries': [], 'errors': 0})
+            result['samples'].append(elapsed)
+            result['queries'].append(queries)
+            result['errors'] += status not in OK_STATUSES
+
+
+def _users(shoppers, options, catalog, rng):
+    return [VirtualUser(shopper, f"customer{index % options['customers']}@example.com", catalog,
+                        random.Random(rng.random()))
+            for index, shopper in enumerate(shoppers)]
+
+
+def _plan(options, rng, count):
+    actions, weights = list(options['mix']), list(options['mix'].values())
+    return [rng.choices(actions, weights)[0] for _ in range(count)]
+
+
+def run_wsgi(options, catalog):
+    """
+    Replays the mix against the WSGI app with one thread per shopper.
+    Returns (results, elapsed seconds).
+    """
+    app = WSGIHandler()
+    rng = random.Random(options['seed'])
+    users = _users([WSGIShopper(i, app) for i in range(options['concurrency'])], options, catalog, rng)
+    plans = [_plan(options, rng, options['requests'] // len(users)) for user in users]
+    collected = _Results()
+
+    def shop(user, plan):
+        user.start()
+        barrier.wait()
+        for choice in plan:
+            action, method, path, data = user.next_request(choice)
+            began = time.perf_counter()
+            status, queries = user.session.request(method, path, data)
+            collected.add(action, (time.perf_counter() - began) * 1000, status, queries)
+
+    barrier = threading.Barrier(len(users) + 1)
+    threads = [threading.Thread(target=shop, args=pair) for pair in zip(users, plans)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return collected.results, time.perf_counter() - began
+
+
+def run_asgi(options, catalog):
+    """
+    Replays the mix against the ASGI app with one task per shopper on one event loop.
+    Returns (results, elapsed seconds).
+    """
+    app = ASGIHandler()
+    rng = random.Random(options['seed'])
+    users = _users([ASGIShopper(i, app) for i in range(options['concurrency'])], options, catalog, rng)
+    plans = [_plan(options, rng, options['requests'] // len(users)) for user in users]
+    collected = _Results()
+
+    async def start(user):
+        await user.session.request('GET', '/')
+        await user.session.request('POST', '/login', {'email': user.email, 'password': 'password'})
+
+    async def shop(user, plan):
+        for choice in plan:
+            action, method, path, data = user.next_request(choice)
+            began = time.perf_counter()
+            status, queries = await user.session.request(method, path, data)
+            collected.add(action, (time.perf_counter() - began) * 1000, status, queries)
+
+    async def main():
+        await asyncio.gather(*(start(user) for user in users))
+        began = time.perf_counter()
+        await asyncio.gather(*(shop(user, plan) for user, plan in zip(users, plans)))
+        return time.perf_counter() - began
+
+    elapsed = asyncio.run(main())
+    return collected.results, elapsed
+
+
+SERVERS = {
+    'wsgi': (run_wsgi, views),
+    'asgi': (run_asgi, async_views),
+}
+
+
+def add_arguments(parser):
+    parser.add_argument('--servers', nargs='+', choices=SERVERS, default=list(SERVERS))
+    parser.add_argument('--categories', type=int, default=3)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16, help='Shoppers with a request in flight at once.')
+    parser.add_argument('--requests', type=int, default=2000, help='Measured requests per server.')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='Weighted actions, e.g. home=20,product=25,checkout=5.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', default=None, help='Test database name (file path for SQLite).')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+
+def run(options, stdout):
+    report = {}
+    with benchmark_database(options['db']), override_settings(
+            LOGIN_THROTTLE_PER_IP=0, LOGIN_THROTTLE_PER_EMAIL=0, STORE_METRICS_DIR=None, ALLOWED_HOSTS=['127.0.0.1']):
+        stdout.write('Seeding...')
+        seed_store(options['categories'], options['products'], options['customers'], options['orders'])
+        catalog = {
+            'products': list(Product.objects.values_list('id', flat=True)),
+            'categories': [category.slug for category in category_registry.all()],
+            'terms': [word.lower() for word in WORDS + MATERIALS] + ['wrap dress', 'slim denim'],
+        }
+        for name in options['servers']:
+            runner, pages = SERVERS[name]
+            with override_settings(ROOT_URLCONF=URLConf(pages)):
+                results, elapsed = runner(options, catalog)
+            requests = sum(len(result['samples']) for result in results.values())
+            overall, endpoints = _report(results)
+            report[name] = {
+                'requests': requests,
+                'elapsed_s': round(elapsed, 3),
+                'requests_per_s': round(requests / elapsed, 1),
+                'overall': overall,
+                'endpoints': endpoints,
+            }
+
+    if options['json']:
+        stdout.write(json.dumps(report, indent=2))
+        return
+
+    stdout.write(f"{options['concurrency']} concurrent shoppers")
+    stdout.write(f"{'server':<8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'errors':>8}")
+    for name, row in report.items():
+        overall = row['overall']
+        stdout.write(f"{name:<8}{row['requests_per_s']:>9.1f}{overall['p50_ms']:>9.2f}{overall['p95_ms']:>9.2f}"
+                     f"{overall['p99_ms']:>9.2f}{overall['queries_mean']:>9.2f}{overall['errors']:>8}")
@@ -0,0 +1,100 @@
+"""
+Catalog import and export throughput on a generated file.
+
+Writes --rows products to a CSV or JSON Lines file, imports it into an empty
+catalog (all inserts), imports it again (all upserts on SKU), then exports the
+catalog. Peak resident memory is reported after each step. It includes the
+database driver's own caches (SQLite's FTS index buffers, for one), so pass
+--trace-memory to also report the peak Python heap of each step, which should
+stay flat as --rows grows. Tracing slows every step down.
+"""
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from store.catalog_io import FIELDS, export_rows, import_catalog, read_rows, write_rows
+from . import benchmark_database
+from .seed import CATEGORY_NAMES, MATERIALS, WORDS
+
+
+def generate_rows(count, categories, seed=0):
+    rng = random.Random(seed)
+    names = CATEGORY_NAMES + [f'Category {i}' for i in range(len(CATEGORY_NAMES), categories)]
+    for i in range(count):
+        yield {
+            'sku': f'SKU-{i:08d}',
+            'title': f'{rng.choice(WORDS)} {rng.choice(WORDS)} {i}',
+            'material': rng.choice(MATERIALS),
+            'description': f'{rng.choice(WORDS)} {rng.choice(MATERIALS).lower()} piece',
+            'price': rng.randint(5, 500),
+            'category': rng.choice(names[:categories]),
+            'image': f'store/static/{i % 3 + 1}.png',
+        }
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere.
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _timed(rows, fn, trace=False):
+    if trace:
+        tracemalloc.start()
+    began = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - began
+    result = {'elapsed_s': round(elapsed, 3), 'rows_per_s': round(rows / elapsed), 'peak_rss_mb': _peak_rss_mb()}
+    if trace:
+        result['peak_heap_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+        tracemalloc.stop()
+    return result
+
+
+def add_arguments(parser):
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--format', choices=('csv', 'jsonl'), default='csv')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='Rows per import transaction (default: CATALOG_IMPORT_BATCH_SIZE).')
+    parser.add_argument('--trace-memory', action='store_true', help='Also report the peak Python heap.')
+    parser.add_argument('--db', default=None, help='Test database name (file path for SQLite).')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+
+def run(options, stdout):
+    rows, fmt, trace = options['rows'], options['format'], options['trace_memory']
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, benchmark_database(options['db']):
+        source = os.path.join(tmp, f'catalog.{fmt}')
+        stdout.write(f'Writing {rows} rows to {source}...')
+        with open(source, 'w', newline='') as stream:
+            generated = generate_rows(rows, options['categories'])
+            results['generate'] = _timed(rows, lambda: write_rows(stream, generated, fmt))
+        results['generate']['file_mb'] = round(os.path.getsize(source) / 1024 / 1024, 1)
+
+        def load():
+            with open(source, newline='') as stream:
+                import_catalog(read_rows(stream, fmt), batch_size=options['batch_size'])
+
+        stdout.write('Importing...')
+        results['import (insert)'] = _timed(rows, load, trace)
+        results['import (update)'] = _timed(rows, load, trace)
+
+        stdout.write('Exporting...')
+        with open(os.path.join(tmp, f'export.{fmt}'), 'w', newline='') as stream:
+            results['export'] = _timed(rows, lambda: write_rows(stream, export_rows(), fmt), trace)
+
+    if options['json']:
+        stdout.write(json.dumps(results, indent=2))
+        return
+
+    stdout.write(f"{rows} rows, {fmt}, columns: {', '.join(FIELDS)}")
+    stdout.write(f"{'step':<18}{'seconds':>10}{'rows/s':>10}{'peak RSS MB':>13}{'peak heap MB':>14}")
+    for step, row in results.items():
+        heap = f"{row['peak_heap_mb']:>14.1f}" if 'peak_heap_mb' in row else f"{'-':>14}"
+        stdout.write(f"{step:<18}{row['elapsed_s']:>10.2f}{row['rows_per_s']:>10}{row['peak_rss_mb']:>13.1f}{heap}")
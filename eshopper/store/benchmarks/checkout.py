@@ -0,0 +1,169 @@
+"""
+Concurrent checkouts against concurrent catalog reads, before and after the
+SQLite WAL settings, with each sales counter (see store.sales). --hot puts one
+product in every order, as in a flash sale.
+"""
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.test import override_settings
+from store.checkout import place_order
+from store.models import Customer, Product
+from store.sales import rollup_sales
+from . import benchmark_database, summarize
+from .seed import seed_categories, seed_customers, seed_products
+
+# label -> SQLITE_PRAGMAS; the first is SQLite's own defaults, as the project ran before.
+SQLITE_CONFIGS = [
+    ('rollback journal', {'journal_mode': 'delete', 'synchronous': 'full'}),
+    ('WAL', None),
+]
+
+
+def _carts(count, products, seed, hot=None):
+    rng = random.Random(seed)
+    carts = [{product_id: rng.randint(1, 3) for product_id in rng.sample(products, rng.randint(1, 5))}
+             for _ in range(count)]
+    if hot is not None:
+        for lines in carts:
+            lines[hot] = 1
+    return carts
+
+
+def _run_writer(customer_id, carts, start, samples, errors):
+    try:
+        customer = Customer.objects.get(pk=customer_id)
+        start.wait()
+        for lines in carts:
+            began = time.perf_counter()
+            try:
+                place_order(customer, lines)
+            except OperationalError:
+                errors.append(1)
+                continue
+            samples.append((time.perf_counter() - began) * 1000)
+    finally:
+        connection.close()
+
+
+def _run_reader(start, stop, samples, errors):
+    try:
+        start.wait()
+        while not stop.is_set():
+            began = time.perf_counter()
+            try:
+                ids = list(Product.objects.order_by('-amount_sold').values_list('id', flat=True)[:8])
+                list(Product.objects.filter(id__in=ids).values())
+            except OperationalError:
+                errors.append(1)
+                continue
+            samples.append((time.perf_counter() - began) * 1000)
+    finally:
+        connection.close()
+
+
+def _load_test(options, products, customers):
+    writers, readers = options['writers'], options['readers']
+    hot = products[0] if options['hot'] else None
+    start = threading.Barrier(writers + readers + 1)
+    stop = threading.Event()
+    checkout_samples, checkout_errors, read_samples, read_errors = [], [], [], []
+    threads = [
+        threading.Thread(target=_run_writer, args=(
+            customers[i % len(customers)], _carts(options['orders'], products, seed=i, hot=hot), start,
+            checkout_samples, checkout_errors,
+        ))
+        for i in range(writers)
+    ] + [
+        threading.Thread(target=_run_reader, args=(start, stop, read_samples, read_errors))
+        for _ in range(readers)
+    ]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    for thread in threads[:writers]:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    stop.set()
+    for thread in threads[writers:]:
+        thread.join()
+    return {
+        'checkouts_per_s': round(len(checkout_samples) / elapsed, 1),
+        'checkout': summarize(checkout_samples or [0]),
+        'checkout_errors': len(checkout_errors),
+        'reads_per_s': round(len(read_samples) / elapsed, 1),
+        'read': summarize(read_samples or [0]),
+        'read_errors': len(read_errors),
+    }
+
+
+def _solo_checkout_ms(products, customer_id, count=20):
+    customer = Customer.objects.get(pk=customer_id)
+    samples = []
+    for lines in _carts(count, products, seed=-1):
+        began = time.perf_counter()
+        place_order(customer, lines)
+        samples.append((time.perf_counter() - began) * 1000)
+    return summarize(samples)['p50_ms']
+
+
+def add_arguments(parser):
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--writers', type=int, default=8, help='Threads placing orders.')
+    parser.add_argument('--readers', type=int, default=8, help='Threads reading the catalog meanwhile.')
+    parser.add_argument('--orders', type=int, default=50, help='Orders per writer thread.')
+    parser.add_argument('--hot', action='store_true', help='Every order also buys the same product.')
+    parser.add_argument('--counters', nargs='+', choices=['row', 'log'], default=['row', 'log'],
+                        help='Sales counters to compare (STORE_SALES_COUNTER).')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'eshopper-checkout-benchmark.sqlite3'),
+                        help='Test database name. Must be a file for SQLite; threads need a shared database.')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+
+def run(options, stdout):
+    if connection.vendor == 'sqlite':
+        configs = [(label, pragmas or settings.SQLITE_PRAGMAS) for label, pragmas in SQLITE_CONFIGS]
+    else:
+        configs = [(connection.vendor, None)]
+
+    results = {}
+    for (label, pragmas), counter in [(config, counter) for config in configs for counter in options['counters']]:
+        overrides = {'STORE_SALES_COUNTER': counter}
+        if pragmas:
+            overrides['SQLITE_PRAGMAS'] = pragmas
+        label = f'{label}, {counter}'
+        with override_settings(**overrides), benchmark_database(options['db']):
+            seed_products(options['products'], seed_categories())
+            seed_customers(options['writers'])
+            products = list(Product.objects.values_list('id', flat=True))
+            customers = list(Customer.objects.values_list('id', flat=True))
+
+            stdout.write(f'Running {label}...')
+            solo_ms = _solo_checkout_ms(products, customers[0])
+            result = _load_test(options, products, customers)
+            # Time a checkout spent waiting on other connections, on average.
+            result['lock_wait_ms'] = round(max(0.0, result['checkout']['mean_ms'] - solo_ms), 3)
+            result['solo_checkout_p50_ms'] = solo_ms
+            began = time.perf_counter()
+            rollup_sales()
+            result['rollup_ms'] = round((time.perf_counter() - began) * 1000, 3)
+            results[label] = result
+
+    if options['json']:
+        stdout.write(json.dumps(results, indent=2))
+        return
+
+    stdout.write(f"{options['writers']} writers x {options['orders']} orders, {options['readers']} readers"
+                 + (', one hot product' if options['hot'] else ''))
+    stdout.write(f"{'configuration':<24}{'orders/s':>10}{'p95 ms':>10}{'lock wait':>11}{'errors':>8}"
+                 f"{'reads/s':>10}{'read p95':>10}{'errors':>8}{'rollup ms':>11}")
+    for label, r in results.items():
+        stdout.write(f"{label:<24}{r['checkouts_per_s']:>10.1f}{r['checkout']['p95_ms']:>10.2f}"
+                     f"{r['lock_wait_ms']:>11.2f}{r['checkout_errors']:>8}"
+                     f"{r['reads_per_s']:>10.1f}{r['read']['p95_ms']:>10.2f}{r['read_errors']:>8}{r['rollup_ms']:>11.2f}")
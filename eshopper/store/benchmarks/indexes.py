@@ -0,0 +1,73 @@
+"""
+Latency of each view's main query before and after the 0003_indexes migration.
+"""
+import json
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from . import benchmark_database, measure
+from .seed import seed_categories, seed_customers, seed_products
+
+BEFORE = ('store', '0002_outboundemail')
+AFTER = ('store', '0003_indexes')
+
+
+def _queries(apps, customers):
+    Category = apps.get_model('store', 'Category')
+    Customer = apps.get_model('store', 'Customer')
+    Product = apps.get_model('store', 'Product')
+    email = f'customer{customers - 1}@example.com'
+    return [
+        ('home: best sellers', lambda: list(Product.objects.order_by('-amount_sold').values('id')[:8])),
+        ('home: hot deals', lambda: list(Product.objects.order_by('price').values('id')[:3])),
+        ('login: customer by email', lambda: Customer.objects.filter(email=email).first()),
+        ('signup: email exists', lambda: Customer.objects.filter(email=email).exists()),
+        ('collections: category by name', lambda: list(Category.objects.filter(name='Jeans'))),
+        ('collections: first page by price', lambda: list(
+            Product.objects.filter(category__name='Jeans').order_by('price').values('id')[:24])),
+    ]
+
+
+def _state_apps(target):
+    return MigrationExecutor(connection).loader.project_state(target).apps
+
+
+def _migrate(target):
+    call_command('migrate', target[0], target[1], verbosity=0)
+
+
+def add_arguments(parser):
+    parser.add_argument('--products', type=int, default=1000000)
+    parser.add_argument('--customers', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--db', default=None, help='Test database name (file path for SQLite).')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+
+def run(options, stdout):
+    results = {}
+    with benchmark_database(options['db']):
+        _migrate(BEFORE)
+        apps = _state_apps(BEFORE)
+        stdout.write(f"Seeding {options['products']} products and {options['customers']} customers...")
+        categories = seed_categories(apps=apps)
+        seed_products(options['products'], categories, apps=apps)
+        seed_customers(options['customers'], apps=apps)
+
+        for label, query in _queries(apps, options['customers']):
+            results[label] = {'before': measure(query, repeat=options['repeat'])}
+
+        _migrate(AFTER)
+        for label, query in _queries(_state_apps(AFTER), options['customers']):
+            results[label]['after'] = measure(query, repeat=options['repeat'])
+
+    if options['json']:
+        stdout.write(json.dumps(results, indent=2))
+        return
+
+    stdout.write(f"{'query':<36}{'before p50 ms':>15}{'after p50 ms':>15}{'speedup':>10}")
+    for label, result in results.items():
+        before = result['before']['p50_ms']
+        after = result['after']['p50_ms']
+        speedup = before / after if after else float('inf')
+        stdout.write(f'{label:<36}{before:>15.3f}{after:>15.3f}{speedup:>9.1f}x')
@@ -0,0 +1,90 @@
+"""
+Per-request cost of PerformanceMiddleware and the timed template backend.
+"""
+import json
+import time
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+from store.instrumentation import PerformanceMiddleware
+from store.models import Product
+from . import benchmark_database
+from .seed import seed_store
+
+MIDDLEWARE = 'store.instrumentation.PerformanceMiddleware'
+
+
+def _plain_settings():
+    templates = [dict(engine, BACKEND='django.template.backends.django.DjangoTemplates')
+                 for engine in settings.TEMPLATES]
+    return {
+        'MIDDLEWARE': [name for name in settings.MIDDLEWARE if name != MIDDLEWARE],
+        'TEMPLATES': templates,
+    }
+
+
+def _time_requests(urls, repeat):
+    client = Client()
+    for url in urls:
+        client.get(url)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for url in urls:
+            client.get(url)
+    return (time.perf_counter() - start) * 1e6 / (repeat * len(urls))
+
+
+def _middleware_cost(repeat):
+    """
+    Microseconds PerformanceMiddleware adds around a view that does nothing.
+    """
+    request = RequestFactory().get('/')
+    response = HttpResponse()
+    bare = lambda request: response  # noqa: E731
+    wrapped = PerformanceMiddleware(bare)
+    timings = []
+    for handler in (bare, wrapped):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            handler(request)
+        timings.append((time.perf_counter() - start) * 1e6 / repeat)
+    return timings[1] - timings[0]
+
+
+def add_arguments(parser):
+    parser.add_argument('--repeat', type=int, default=500, help='Passes over the page list per configuration.')
+    parser.add_argument('--rounds', type=int, default=3, help='Alternating rounds; the fastest of each is kept.')
+    parser.add_argument('--db', default=None, help='Test database name (file path for SQLite).')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+
+def run(options, stdout):
+    # Keep the benchmark's own requests out of the flushed production histogram.
+    with benchmark_database(options['db']), override_settings(STORE_METRICS_DIR=None):
+        seed_store(products=1000, customers=10, orders=0)
+        product_id = Product.objects.values_list('id', flat=True).first()
+        urls = [reverse('home'), reverse('product', args=[product_id]), reverse('collections', args=['dress']),
+                reverse('q') + '?search=linen']
+        plain, instrumented = [], []
+        for _ in range(options['rounds']):
+            with override_settings(**_plain_settings()):
+                plain.append(_time_requests(urls, options['repeat']))
+            instrumented.append(_time_requests(urls, options['repeat']))
+
+        middleware_us = _middleware_cost(options['repeat'] * 100)
+
+    results = {
+        'without_us': round(min(plain), 1),
+        'with_us': round(min(instrumented), 1),
+        'middleware_us': round(middleware_us, 2),
+    }
+    results['overhead_us'] = round(results['with_us'] - results['without_us'], 1)
+
+    if options['json']:
+        stdout.write(json.dumps(results, indent=2))
+        return
+    stdout.write(f"without instrumentation: {results['without_us']:.1f} us/request")
+    stdout.write(f"with instrumentation:    {results['with_us']:.1f} us/request")
+    stdout.write(f"difference:              {results['overhead_us']:.1f} us (within run-to-run noise if near 0)")
+    stdout.write(f"middleware alone:        {results['middleware_us']:.2f} us/request")
@@ -0,0 +1,102 @@
+"""
+Login throughput per core under credential-stuffing traffic, by hasher profile and with or without the login throttle.
+"""
+import json
+import random
+import time
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import Client, override_settings
+from django.urls import reverse
+from store.models import Customer
+from . import benchmark_database, summarize
+from .seed import seed_customers
+
+
+def _profiles(names):
+    for name in names:
+        if name == 'argon2':
+            try:
+                import argon2  # noqa: F401
+            except ImportError:
+                continue
+        yield name
+
+
+def _traffic(requests, customers, attackers, legit_share, seed=0):
+    """
+    Yields (ip, email, password) tuples: mostly guesses from a few attacker
+    IPs against real and made-up emails, with some real logins mixed in.
+    """
+    rng = random.Random(seed)
+    for i in range(requests):
+        if rng.random() < legit_share:
+            yield f'10.0.{i // 250}.{i % 250}', f'customer{rng.randrange(customers)}@example.com', 'password', True
+        else:
+            number = rng.randrange(customers * 2)
+            yield f'192.0.2.{rng.randrange(attackers)}', f'customer{number}@example.com', f'guess{i}', False
+
+
+def _attack(options):
+    url = reverse('login')
+    attackers = Client()
+    samples = []
+    outcomes = {'ok': 0, 'rejected': 0, 'throttled': 0, 'legit_ok': 0, 'legit_total': 0}
+    start = time.perf_counter()
+    for ip, email, password, legit in _traffic(options['requests'], options['customers'], options['attackers'],
+                                               options['legit_share']):
+        client = Client() if legit else attackers
+        began = time.perf_counter()
+        response = client.post(url, {'email': email, 'password': password}, REMOTE_ADDR=ip)
+        samples.append((time.perf_counter() - began) * 1000)
+        if response.status_code == 302:
+            outcomes['ok'] += 1
+        elif response.status_code == 429:
+            outcomes['throttled'] += 1
+        else:
+            outcomes['rejected'] += 1
+        if legit:
+            outcomes['legit_total'] += 1
+            outcomes['legit_ok'] += response.status_code == 302
+    elapsed = time.perf_counter() - start
+    return {'requests_per_s': round(len(samples) / elapsed, 1), **outcomes, **summarize(samples)}
+
+
+def add_arguments(parser):
+    parser.add_argument('--customers', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=500, help='Login attempts per configuration.')
+    parser.add_argument('--attackers', type=int, default=2, help='Distinct attacker IPs.')
+    parser.add_argument('--legit-share', type=float, default=0.05, help='Share of attempts with the right password.')
+    parser.add_argument('--profiles', nargs='+', default=list(settings.PASSWORD_HASHER_PROFILES),
+                        help='Hasher profiles to compare (argon2 is skipped without argon2-cffi).')
+    parser.add_argument('--db', default=None, help='Test database name (file path for SQLite).')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+
+def run(options, stdout):
+    results = {}
+    with benchmark_database(options['db']):
+        seed_customers(options['customers'])
+        for profile in _profiles(options['profiles']):
+            hashers = settings.PASSWORD_HASHER_PROFILES
+            with override_settings(PASSWORD_HASHERS=[hashers[profile]] + [
+                    hasher for name, hasher in hashers.items() if name != profile]):
+                # One hash for everyone, as seed_customers does, under this profile.
+                Customer.objects.update(password=make_password('password'))
+                for throttle in (False, True):
+                    limits = {} if throttle else {'LOGIN_THROTTLE_PER_IP': 0, 'LOGIN_THROTTLE_PER_EMAIL': 0}
+                    cache.clear()
+                    with override_settings(**limits):
+                        label = f"{profile}, {'throttled' if throttle else 'no throttle'}"
+                        stdout.write(f'Running {label}...')
+                        results[label] = _attack(options)
+
+    if options['json']:
+        stdout.write(json.dumps(results, indent=2))
+        return
+
+    stdout.write(f"{'configuration':<26}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'throttled':>11}{'legit ok':>10}")
+    for label, result in results.items():
+        stdout.write(f"{label:<26}{result['requests_per_s']:>9.1f}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+                     f"{result['throttled']:>11}{result['legit_ok']:>6}/{result['legit_total']}")
@@ -0,0 +1,73 @@
+"""
+Sales report latency read straight from the order history against the daily
+rollup tables, as the history grows.
+"""
+import json
+import time
+from datetime import timedelta
+from django.db.models import F, Sum
+from django.utils import timezone
+from store.models import Order, OrderItem
+from store.reports import category_revenue, rollup_reports, top_products
+from . import benchmark_database, measure
+from .seed import seed_orders, seed_store
+
+
+def _scan_category_revenue(start, end):
+    return list(OrderItem.objects.filter(order__date__range=(start, end))
+                .values('order__date', 'product__category_id')
+                .annotate(revenue=Sum(F('price') * F('quantity'))).order_by('order__date'))
+
+
+def _scan_top_products(start, end):
+    return list(OrderItem.objects.filter(order__date__range=(start, end)).values('product_id')
+                .annotate(revenue=Sum(F('price') * F('quantity'))).order_by('-revenue')[:10])
+
+
+def add_arguments(parser):
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--customers', type=int, default=1000)
+    parser.add_argument('--orders', type=int, nargs='+', default=[10000, 100000],
+                        help='Order history sizes to measure at, smallest first.')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--db', default=None, help='Test database name (file path for SQLite).')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+
+def run(options, stdout):
+    end = timezone.localdate()
+    ranges = {'categories, 30 days': end - timedelta(days=29), 'top products, 7 days': end - timedelta(days=6)}
+    results = {}
+    with benchmark_database(options['db']):
+        seed_store(products=options['products'], customers=options['customers'], orders=0)
+        for size in options['orders']:
+            stdout.write(f'Seeding to {size} orders...')
+            seed_orders(size - Order.objects.count(), seed=size)
+            began = time.perf_counter()
+            rollup_reports()
+            rollup_ms = round((time.perf_counter() - began) * 1000, 3)
+
+            start = ranges['categories, 30 days']
+            week = ranges['top products, 7 days']
+            results[size] = {
+                'rollup_ms': rollup_ms,
+                'categories, 30 days': {
+                    'order history': measure(lambda: _scan_category_revenue(start, end), repeat=options['repeat']),
+                    'rollup tables': measure(lambda: category_revenue(start, end), repeat=options['repeat']),
+                },
+                'top products, 7 days': {
+                    'order history': measure(lambda: _scan_top_products(week, end), repeat=options['repeat']),
+                    'rollup tables': measure(lambda: top_products(week, end), repeat=options['repeat']),
+                },
+            }
+
+    if options['json']:
+        stdout.write(json.dumps(results, indent=2))
+        return
+
+    stdout.write(f"{'orders':>9}  {'report':<22}{'history p50':>13}{'rollup p50':>12}{'rollup run ms':>15}")
+    for size, result in results.items():
+        for report in ranges:
+            row = result[report]
+            stdout.write(f"{size:>9}  {report:<22}{row['order history']['p50_ms']:>13.2f}"
+                         f"{row['rollup tables']['p50_ms']:>12.2f}{result['rollup_ms']:>15.2f}")
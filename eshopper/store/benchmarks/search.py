@@ -0,0 +1,52 @@
+"""
+Search backend latency against the original LIKE query on a large catalog.
+"""
+import json
+from django.db.models import Q
+from store.models import Product
+from store.search import LikeSearchBackend, get_search_backend
+from . import benchmark_database, measure
+from .seed import seed_categories, seed_products
+
+TERMS = ['linen', 'slim', 'jeans', 'vintage floral', 'wrap dress', 'nothingmatches']
+
+
+def _legacy_search(term):
+    # The query Product.search used to run: every match, no limit.
+    return list(Product.objects.filter(Q(title__icontains=term) | Q(category__name__icontains=term)).values())
+
+
+def add_arguments(parser):
+    parser.add_argument('--products', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--db', default=None, help='Test database name (file path for SQLite).')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+
+def run(options, stdout):
+    results = {}
+    with benchmark_database(options['db']):
+        stdout.write(f"Seeding {options['products']} products...")
+        seed_products(options['products'], seed_categories())
+
+        backend = get_search_backend()
+        like = LikeSearchBackend()
+        engines = [
+            ('legacy LIKE (all rows)', _legacy_search),
+            ('LIKE backend (page 1)', lambda term: like.search(term)),
+            (f'{backend.__class__.__name__} (page 1)', lambda term: backend.search(term)),
+        ]
+        for term in TERMS:
+            results[term] = {
+                label: measure(lambda: engine(term), repeat=options['repeat'], warmup=1)
+                for label, engine in engines
+            }
+
+    if options['json']:
+        stdout.write(json.dumps(results, indent=2))
+        return
+
+    labels = [label for label, _ in engines]
+    stdout.write(f"{'term':<18}" + ''.join(f'{label:>30}' for label in labels) + '   (p50 ms)')
+    for term, result in results.items():
+        stdout.write(f'{term:<18}' + ''.join(f"{result[label]['p50_ms']:>30.3f}" for label in labels))
@@ -0,0 +1,105 @@
+import random
+from datetime import timedelta
+from django.apps import apps as global_apps
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+CATEGORY_NAMES = ['Dress', 'Jeans', 'Tops']
+MATERIALS = ['Linen', 'Cotton', 'Denim', 'Silk', 'Wool']
+WORDS = ['Summer', 'Classic', 'Slim', 'Relaxed', 'Midi', 'Cropped', 'Vintage', 'Floral', 'Striped', 'Wrap']
+
+
+def _batched(count, batch_size):
+    for start in range(0, count, batch_size):
+        yield start, min(batch_size, count - start)
+
+
+def seed_categories(count=3, apps=global_apps):
+    """
+    Creates `count` categories, starting with the storefront's own names.
+    """
+    Category = apps.get_model('store', 'Category')
+    names = CATEGORY_NAMES + [f'Category {i}' for i in range(len(CATEGORY_NAMES), count)]
+    return Category.objects.bulk_create([Category(name=name) for name in names[:count]])
+
+
+def seed_products(count, categories, batch_size=10000, seed=0, apps=global_apps):
+    """
+    Bulk inserts `count` products spread across `categories`.
+    """
+    Product = apps.get_model('store', 'Product')
+    rng = random.Random(seed)
+    for start, size in _batched(count, batch_size):
+        Product.objects.bulk_create([
+            Product(
+                title=f'{rng.choice(WORDS)} {rng.choice(WORDS)} {start + i}',
+                material=rng.choice(MATERIALS),
+                description=f'{rng.choice(WORDS)} {rng.choice(MATERIALS).lower()} piece',
+                price=rng.randint(5, 500),
+                amount_sold=rng.randint(0, 10000),
+                category=rng.choice(categories),
+                image=f'store/static/{(start + i) % 3 + 1}.png',
+            )
+            for i in range(size)
+        ])
+
+
+def seed_customers(count, batch_size=10000, apps=global_apps):
+    """
+    Bulk inserts `count` customers sharing one precomputed password hash.
+    Emails follow the pattern customer<N>@example.com.
+    """
+    Customer = apps.get_model('store', 'Customer')
+    password = make_password('password')
+    for start, size in _batched(count, batch_size):
+        Customer.objects.bulk_create([
+            Customer(
+                first_name='Customer',
+                last_name=str(start + i),
+                address=f'{start + i} High Street',
+                phone='07000000000',
+                email=f'customer{start + i}@example.com',
+                password=password,
+            )
+            for i in range(size)
+        ])
+
+
+def seed_orders(count, batch_size=5000, days=365, seed=0, apps=global_apps):
+    """
+    Bulk inserts `count` orders from existing customers, each with one to five
+    line items priced from existing products and dated over the last `days` days.
+    """
+    Customer = apps.get_model('store', 'Customer')
+    Order = apps.get_model('store', 'Order')
+    OrderItem = apps.get_model('store', 'OrderItem')
+    Product = apps.get_model('store', 'Product')
+    rng = random.Random(seed)
+    customers = list(Customer.objects.values_list('id', flat=True))
+    products = list(Product.objects.values_list('id', 'price'))
+    today = timezone.now().date()
+    for start, size in _batched(count, batch_size):
+        orders = Order.objects.bulk_create([
+            Order(
+                customer_id=rng.choice(customers),
+                address=f'{rng.randint(1, 200)} High Street',
+                phone='07000000000',
+                date=today - timedelta(days=rng.randrange(days)),
+            )
+            for _ in range(size)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order_id=order.id, product_id=product_id, quantity=rng.randint(1, 3), price=price)
+            for order in orders
+            for product_id, price in rng.sample(products, min(len(products), rng.randint(1, 5)))
+        ])
+
+
+def seed_store(categories=3, products=10000, customers=1000, orders=5000, apps=global_apps):
+    """
+    Seeds a whole storefront: categories, products, customers, then their orders.
+    """
+    seed_products(products, seed_categories(categories, apps=apps), apps=apps)
+    seed_customers(customers, apps=apps)
+    if orders:
+        seed_orders(orders, apps=apps)
@@ -0,0 +1,39 @@
+"""
+Latency of a collected static file served by WhiteNoise against a page that
+goes through the session and the database.
+
+Static files are answered by the middleware before sessions, auth or any view
+run, so a hashed asset should cost a fraction of the cheapest page.
+"""
+import json
+import tempfile
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import Client, override_settings
+from django.urls import reverse
+from . import benchmark_database, measure
+
+
+def add_arguments(parser):
+    parser.add_argument('--requests', type=int, default=1000, help='Requests per path.')
+    parser.add_argument('--db', default=None, help='Test database name (file path for SQLite).')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+
+def run(options, stdout):
+    results = {}
+    with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root), \
+            benchmark_database(options['db']):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        client = Client()
+        for label, path in [('static file', static('styles.css')), ('page', reverse('ordered'))]:
+            results[label] = {'path': path, **measure(lambda: client.get(path), repeat=options['requests'])}
+
+    if options['json']:
+        stdout.write(json.dumps(results, indent=2))
+        return
+
+    stdout.write(f"{options['requests']} requests per path")
+    stdout.write(f"{'request':<14}{'path':<36}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for label, row in results.items():
+        stdout.write(f"{label:<14}{row['path']:<36}{row['mean_ms']:>10.3f}{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}")
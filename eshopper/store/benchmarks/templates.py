@@ -0,0 +1,116 @@
+"""
+Render time of home.html and collections.html with and without the cached template loader and fragment caching.
+"""
+import json
+import time
+from importlib import import_module
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.template.loader import render_to_string
+from django.test import RequestFactory, override_settings
+from store.cart import Cart
+from store.catalog import category_registry, collection_page
+from store.rails import get_best_sellers, get_hot_deals, image_basename
+from . import benchmark_database
+from .seed import seed_categories, seed_products
+
+UNCACHED_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+CACHED_LOADERS = [('django.template.loaders.cached.Loader', UNCACHED_LOADERS)]
+DUMMY_CACHE = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+
+
+def _templates(loaders):
+    templates = [dict(engine) for engine in settings.TEMPLATES]
+    templates[0]['OPTIONS'] = {**templates[0]['OPTIONS'], 'loaders': loaders}
+    return templates
+
+
+def _caches(fragments):
+    return {**settings.CACHES, 'fragments': fragments}
+
+
+# label -> settings overrides, from the original setup to the current one.
+CONFIGS = [
+    ('no template caching', lambda: {'TEMPLATES': _templates(UNCACHED_LOADERS), 'CACHES': _caches(DUMMY_CACHE)}),
+    ('cached loader', lambda: {'TEMPLATES': _templates(CACHED_LOADERS), 'CACHES': _caches(DUMMY_CACHE)}),
+    ('cached loader + fragments', lambda: {'TEMPLATES': _templates(CACHED_LOADERS)}),
+]
+
+
+def _request():
+    request = RequestFactory().get('/')
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+    request.user = AnonymousUser()
+    return request
+
+
+def _contexts():
+    # Built the way the home and collections views build them.
+    customer = {'First_Name': 'Guest', 'Session_ID': None}
+    cart = Cart({}).data
+    rows, next_cursor = collection_page(category_registry.get('dress').id)
+    return {
+        'home.html': {
+            'Customer': customer,
+            'Cart': cart,
+            'Most_Sold_Products': get_best_sellers(),
+            'Hot_Products': get_hot_deals(),
+        },
+        'collections.html': {
+            'Products': [{'product': row, 'image_path': {'path': image_basename(row['image'])}} for row in rows],
+            'Name': 'Dress',
+            'Sort': 'default',
+            'Next_Cursor': next_cursor,
+            'Is_First_Page': True,
+            'Cart': cart,
+            'Customer': customer,
+        },
+    }
+
+
+def _render_many(template, context, renders):
+    request = _request()
+    render_to_string(template, context, request)
+    start = time.perf_counter()
+    for _ in range(renders):
+        render_to_string(template, context, request)
+    return time.perf_counter() - start
+
+
+def add_arguments(parser):
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--renders', type=int, default=10000, help='Renders of each template per configuration.')
+    parser.add_argument('--db', default=None, help='Test database name (file path for SQLite).')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+
+def run(options, stdout):
+    results = {}
+    with benchmark_database(options['db']):
+        seed_products(options['products'], seed_categories())
+        contexts = _contexts()
+        for template, context in contexts.items():
+            results[template] = {}
+            for label, overrides in CONFIGS:
+                with override_settings(**overrides()):
+                    seconds = _render_many(template, context, options['renders'])
+                results[template][label] = {
+                    'total_s': round(seconds, 3),
+                    'mean_ms': round(seconds * 1000 / options['renders'], 4),
+                }
+            baseline = results[template][CONFIGS[0][0]]['total_s']
+            for result in results[template].values():
+                result['saved_s'] = round(baseline - result['total_s'], 3)
+
+    if options['json']:
+        stdout.write(json.dumps(results, indent=2))
+        return
+
+    stdout.write(f"{options['renders']} renders per template")
+    stdout.write(f"{'template':<18}{'configuration':<28}{'total s':>10}{'mean ms':>10}{'saved s':>10}")
+    for template, result in results.items():
+        for label, row in result.items():
+            stdout.write(f"{template:<18}{label:<28}{row['total_s']:>10.3f}{row['mean_ms']:>10.4f}{row['saved_s']:>10.3f}")
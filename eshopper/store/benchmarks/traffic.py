@@ -0,0 +1,334 @@
+"""
+Replays a storefront traffic mix (browse, search, cart, checkout) and reports latency, queries per request and memory.
+
+Requests go through Django's test client in process (`--driver client`) or
+over HTTP to a local WSGI server running in a background thread
+(`--driver wsgi`). Use --output to keep the JSON report for comparing runs.
+"""
+import json
+import random
+import resource
+import threading
+import time
+from http.client import HTTPConnection
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from store.catalog import SORT_MODES, category_registry
+from store.models import Product
+from . import benchmark_database, summarize
+from .seed import MATERIALS, WORDS, seed_store
+
+# action -> relative weight
+DEFAULT_MIX = {
+    'home': 20,
+    'product': 25,
+    'collections': 15,
+    'search': 10,
+    'cart_add': 12,
+    'cart_remove': 4,
+    'cart': 8,
+    'checkout': 6,
+}
+OK_STATUSES = {200, 302, 304}
+
+
+def parse_mix(value):
+    """
+    Parses 'home=20,product=25,...' into a mix; unknown actions are an error.
+    """
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f'Unknown action {name!r}; choose from {", ".join(DEFAULT_MIX)}')
+        mix[name] = float(weight)
+    return mix
+
+
+def current_rss_mb():
+    """
+    Resident set size of this process in MiB, or None where /proc isn't available.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return None
+    return round(pages * resource.getpagesize() / 2 ** 20, 1)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux.
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class ClientSession:
+    """
+    One visitor on the in-process test client. Queries are counted directly.
+    """
+
+    def __init__(self, index):
+        self.client = Client()
+        self.ip = f'10.1.{index // 250}.{index % 250}'
+
+    def request(self, method, path, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method.lower())(path, data or {}, REMOTE_ADDR=self.ip)
+        return response.status_code, len(ctx.captured_queries)
+
+
+class ClientDriver:
+    name = 'client'
+
+    def session(self, index):
+        return ClientSession(index)
+
+    def close(self):
+        pass
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def _counting_app(app):
+    """
+    Wraps a WSGI app to send the number of queries each request ran in X-Query-Count.
+    """
+    def counting(environ, start_response):
+        count = [0]
+
+        def counter(execute, sql, params, many, context):
+            count[0] += 1
+            return execute(sql, params, many, context)
+
+        def counted_start_response(status, headers, exc_info=None):
+            return start_response(status, headers + [('X-Query-Count', str(count[0]))], exc_info)
+
+        with connection.execute_wrapper(counter):
+            return app(environ, counted_start_response)
+
+    return counting
+
+
+class WSGISession:
+    """
+    One visitor talking HTTP to the local server, with its own cookies and CSRF token.
+    """
+
+    def __init__(self, port):
+        self.port = port
+        self.cookies = SimpleCookie()
+
+    def request(self, method, path, data=None):
+        headers = {}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={morsel.value}' for name, morsel in self.cookies.items())
+        body = None
+        if method == 'GET' and data:
+            path = f'{path}?{urlencode(data)}'
+        elif method == 'POST':
+            body = urlencode(data or {})
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            if 'csrftoken' in self.cookies:
+                headers['X-CSRFToken'] = self.cookies['csrftoken'].value
+        http = HTTPConnection('127.0.0.1', self.port)
+        try:
+            http.request(method, path, body=body, headers=headers)
+            response = http.getresponse()
+            response.read()
+            for cookie in response.headers.get_all('Set-Cookie') or []:
+                self.cookies.load(cookie)
+            return response.status, int(response.headers.get('X-Query-Count', 0))
+        finally:
+            http.close()
+
+
+class WSGIDriver:
+    name = 'wsgi'
+
+    def __init__(self):
+        self.server = make_server('127.0.0.1', 0, _counting_app(get_wsgi_application()), handler_class=_QuietHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def session(self, index):
+        return WSGISession(self.server.server_port)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+DRIVERS = {'client': ClientDriver, 'wsgi': WSGIDriver}
+
+
+class VirtualUser:
+    """
+    A shopper who logs in once and then picks actions from the traffic mix.
+    """
+
+    def __init__(self, session, email, catalog, rng):
+        self.session = session
+        self.email = email
+        self.catalog = catalog
+        self.rng = rng
+        self.cart = []
+        self.logged_in = False
+
+    def next_request(self, action):
+        """
+        Returns (action actually taken, method, path, data). Cart removals and
+        checkouts with an empty cart become an add instead.
+        """
+        rng, catalog = self.rng, self.catalog
+        if action in ('cart_remove', 'checkout') and not self.cart:
+            action = 'cart_add'
+        if action == 'home':
+            return action, 'GET', reverse('home'), None
+        if action == 'product':
+            return action, 'GET', reverse('product', args=[rng.choice(catalog['products'])]), None
+        if action == 'collections':
+            return action, 'GET', reverse('collections', args=[rng.choice(catalog['categories'])]), {
+                'sort': rng.choice(list(SORT_MODES))}
+        if action == 'search':
+            return action, 'GET', reverse('q'), {'search': rng.choice(catalog['terms'])}
+        if action == 'cart_add':
+            product_id = rng.choice(catalog['products'])
+            self.cart.append(product_id)
+            return action, 'POST', reverse('cart_api_add', args=[product_id]), None
+        if action == 'cart_remove':
+            product_id = self.cart.pop(rng.randrange(len(self.cart)))
+            return action, 'POST', reverse('cart_api_remove', args=[product_id]), None
+        if action == 'cart':
+            return action, 'GET', reverse('cart'), None
+        self.cart = []
+        return 'checkout', 'POST', reverse('order'), None
+
+    def start(self):
+        # Picks up the CSRF cookie, then logs in as a seeded customer.
+        self.session.request('GET', reverse('home'))
+        status, _ = self.session.request('POST', reverse('login'), {'email': self.email, 'password': 'password'})
+        self.logged_in = status == 302
+
+
+def replay(driver, options, catalog, record=True):
+    rng = random.Random(options['seed'])
+    mix = options['mix']
+    actions, weights = list(mix), list(mix.values())
+    users = []
+    for index in range(options['users']):
+        user = VirtualUser(driver.session(index), f"customer{index % options['customers']}@example.com", catalog,
+                           random.Random(rng.random()))
+        user.start()
+        users.append(user)
+
+    results = {}
+    for i in range(options['requests']):
+        user = users[i % len(users)]
+        action, method, path, data = user.next_request(rng.choices(actions, weights)[0])
+        began = time.perf_counter()
+        status, queries = user.session.request(method, path, data)
+        elapsed = (time.perf_counter() - began) * 1000
+        result = results.setdefault(action, {'samples': [], 'queries': [], 'errors': 0})
+        result['samples'].append(elapsed)
+        result['queries'].append(queries)
+        result['errors'] += status not in OK_STATUSES
+    return results, sum(user.logged_in for user in users)
+
+
+def _report(results):
+    def stats(samples, queries, errors):
+        return {
+            **summarize(samples),
+            'queries_mean': round(sum(queries) / len(queries), 2),
+            'queries_max': max(queries),
+            'errors': errors,
+        }
+
+    endpoints = {action: stats(r['samples'], r['queries'], r['errors']) for action, r in sorted(results.items())}
+    overall = stats(
+        [s for r in results.values() for s in r['samples']],
+        [q for r in results.values() for q in r['queries']],
+        sum(r['errors'] for r in results.values()),
+    )
+    return overall, endpoints
+
+
+def add_arguments(parser):
+    parser.add_argument('--driver', choices=DRIVERS, default='client')
+    parser.add_argument('--categories', type=int, default=3)
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--customers', type=int, default=1000)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=20, help='Concurrent shopping sessions, served round robin.')
+    parser.add_argument('--requests', type=int, default=2000, help='Measured requests.')
+    parser.add_argument('--warmup', type=int, default=200, help='Requests replayed first and not measured.')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='Weighted actions, e.g. home=20,product=25,checkout=5.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', default=None, help='Test database name (file path for SQLite).')
+    parser.add_argument('--output', default=None, help='Also write the JSON report to this file.')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+
+def run(options, stdout):
+    # Every virtual user shares 127.0.0.1 over HTTP, so the login throttle is off for the run.
+    with benchmark_database(options['db']), override_settings(LOGIN_THROTTLE_PER_IP=0, LOGIN_THROTTLE_PER_EMAIL=0):
+        stdout.write('Seeding...')
+        seed_store(options['categories'], options['products'], options['customers'], options['orders'])
+        catalog = {
+            'products': list(Product.objects.values_list('id', flat=True)),
+            'categories': [category.slug for category in category_registry.all()],
+            'terms': [word.lower() for word in WORDS + MATERIALS] + ['wrap dress', 'slim denim'],
+        }
+
+        driver = DRIVERS[options['driver']]()
+        try:
+            if options['warmup']:
+                replay(driver, {**options, 'requests': options['warmup'], 'seed': options['seed'] - 1}, catalog)
+            rss_start = current_rss_mb()
+            began = time.perf_counter()
+            results, logged_in = replay(driver, options, catalog)
+            elapsed = time.perf_counter() - began
+        finally:
+            driver.close()
+
+    overall, endpoints = _report(results)
+    report = {
+        'driver': options['driver'],
+        'dataset': {name: options[name] for name in ('categories', 'products', 'customers', 'orders')},
+        'users': options['users'],
+        'logged_in_users': logged_in,
+        'requests': options['requests'],
+        'mix': options['mix'],
+        'elapsed_s': round(elapsed, 3),
+        'requests_per_s': round(options['requests'] / elapsed, 1),
+        'overall': overall,
+        'endpoints': endpoints,
+        'rss_mb': {'start': rss_start, 'end': current_rss_mb(), 'peak': peak_rss_mb()},
+    }
+    if options['output']:
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if options['json']:
+        stdout.write(json.dumps(report, indent=2))
+        return
+
+    stdout.write(f"{report['requests']} requests over {options['driver']} in {report['elapsed_s']} s "
+                 f"({report['requests_per_s']} req/s), {logged_in}/{options['users']} users logged in")
+    stdout.write(f"{'endpoint':<14}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'errors':>8}")
+    for name, row in [*endpoints.items(), ('overall', overall)]:
+        stdout.write(f"{name:<14}{row['count']:>7}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+                     f"{row['queries_mean']:>9.2f}{row['errors']:>8}")
+    rss = report['rss_mb']
+    stdout.write(f"RSS MiB: start {rss['start']}, end {rss['end']}, peak {rss['peak']}")
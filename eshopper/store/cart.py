@@ -0,0 +1,117 @@
+import random
+from .models import Product
+from .rails import image_basename
+
+
+class Cart:
+    """
+    Shopping cart kept in the session as a compact {product id: quantity} map.
+
+    Only ids and quantities are stored, so every mutation is O(1) and the
+    client can't choose a price. Titles, prices and images are looked up from
+    Product in one batched query when the cart is rendered or checked out.
+    The session dict keeps a running 'Quantity' for the navbar badge.
+    """
+    SESSION_KEY = 'Cart'
+
+    def __init__(self, session):
+        self.session = session
+        data = session.get(self.SESSION_KEY, {})
+        if 'Lines' not in data and data.get('Products'):
+            # Carts saved before lines were keyed by product id.
+            data = {'Cart_ID': data.get('Cart_ID'), 'Lines': {
+                str(item['Product_ID']): item['Quantity'] for item in data['Products'].values()
+            }}
+        self.data = {
+            'Cart_ID': data.get('Cart_ID') or str(random.randint(0, 999)),
+            'Lines': dict(data.get('Lines', {})),
+        }
+        self.data['Quantity'] = sum(self.data['Lines'].values())
+
+    def __len__(self):
+        return len(self.data['Lines'])
+
+    @property
+    def quantity(self):
+        return self.data['Quantity']
+
+    @property
+    def lines(self):
+        """
+        {product id: quantity} for every product in the cart.
+        """
+        return {int(product_id): quantity for product_id, quantity in self.data['Lines'].items()}
+
+    def get(self, product_id):
+        return self.data['Lines'].get(str(product_id), 0)
+
+    def set(self, product_id, quantity):
+        """
+        Sets a line's quantity, removing the line when it drops to zero.
+        """
+        quantity = max(0, int(quantity))
+        key = str(product_id)
+        if quantity == self.data['Lines'].get(key, 0):
+            return
+        self.data['Quantity'] += quantity - self.data['Lines'].get(key, 0)
+        if quantity:
+            self.data['Lines'][key] = quantity
+        else:
+            self.data['Lines'].pop(key, None)
+        self.save()
+
+    def add(self, product_id, quantity=1):
+        self.set(product_id, self.get(product_id) + quantity)
+
+    def remove(self, product_id, quantity=1):
+        self.set(product_id, self.get(product_id) - quantity)
+
+    def clear(self):
+        self.session.pop(self.SESSION_KEY, None)
+        self.data['Lines'] = {}
+        self.data['Quantity'] = 0
+
+    def save(self):
+        self.session[self.SESSION_KEY] = self.data
+
+    def products(self):
+        """
+        Products in the cart, fetched in a single query. Lines whose product no
+        longer exists are skipped.
+        """
+        return Product.objects.in_bulk(self.lines.keys())
+
+    def summary(self):
+        """
+        The cart as the templates expect it, priced from the database.
+        """
+        return self._summarize(self.products())
+
+    async def asummary(self):
+        """
+        Async summary(), for the ASGI views.
+        """
+        return self._summarize(await Product.objects.ain_bulk(self.lines.keys()))
+
+    def _summarize(self, products):
+        items = []
+        total = 0
+        for product_id, quantity in self.lines.items():
+            product = products.get(product_id)
+            if product is None:
+                continue
+            items.append({
+                'title': product.title,
+                'Product_ID': product.id,
+                'Price': product.price,
+                'Quantity': quantity,
+                'Image': image_basename(product.image),
+                'Product_Total': product.price * quantity,
+            })
+            total += product.price * quantity
+        return {
+            'Cart_ID': self.data['Cart_ID'],
+            'Quantity': sum(item['Quantity'] for item in items),
+            'Cart_Total': total,
+            'Products': items,
+        }
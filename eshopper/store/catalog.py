@@ -0,0 +1,166 @@
+import base64
+import binascii
+import json
+import threading
+import time
+from dataclasses import dataclass
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.text import slugify
+from .models import Category, Product
+
+# sort mode -> (field, descending). Every mode is tie-broken on id for a stable keyset.
+SORT_MODES = {
+    'default': ('id', False),
+    'price': ('price', False),
+    'best-selling': ('amount_sold', True),
+}
+
+
+@dataclass(frozen=True)
+class CategoryEntry:
+    id: int
+    name: str
+    slug: str
+
+
+class CategoryRegistry:
+    """
+    Process-local map of category slug -> CategoryEntry, thread safe.
+
+    Loaded with a single query and kept in memory, so collections and the
+    navbar never touch the category table per request. `invalidate()` bumps a
+    version in the shared cache as well, so every process reloads on its next
+    lookup.
+    """
+    VERSION_KEY = 'store:category_registry:version'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = None  # (version, {slug: CategoryEntry})
+
+    def _version(self):
+        version = cache.get(self.VERSION_KEY)
+        if version is None:
+            # Seeded from the clock so a cleared cache never matches an old version.
+            cache.add(self.VERSION_KEY, int(time.time() * 1000), None)
+            version = cache.get(self.VERSION_KEY)
+        return version
+
+    def _load(self):
+        entries = {}
+        for category_id, name in Category.objects.order_by('id').values_list('id', 'name'):
+            slug = slugify(name) or str(category_id)
+            # The oldest category keeps a slug when two names collide.
+            entries.setdefault(slug, CategoryEntry(category_id, name, slug))
+        return entries
+
+    def entries(self):
+        version = self._version()
+        loaded = self._loaded
+        if loaded is None or loaded[0] != version:
+            with self._lock:
+                loaded = self._loaded
+                if loaded is None or loaded[0] != version:
+                    loaded = (version, self._load())
+                    self._loaded = loaded
+        return loaded[1]
+
+    async def aentries(self):
+        """
+        Async entries(). Only a reload leaves the event loop, so this also
+        warms the registry before a template reads it from an async view.
+        """
+        version = await cache.aget(self.VERSION_KEY)
+        loaded = self._loaded
+        if version is not None and loaded is not None and loaded[0] == version:
+            return loaded[1]
+        return await sync_to_async(self.entries)()
+
+    def all(self):
+        """
+        Every category, oldest first.
+        """
+        return list(self.entries().values())
+
+    def get(self, slug):
+        return self.entries().get(slug)
+
+    async def aget(self, slug):
+        return (await self.aentries()).get(slug)
+
+    def invalidate(self):
+        self._loaded = None
+        try:
+            cache.incr(self.VERSION_KEY)
+        except ValueError:
+            cache.set(self.VERSION_KEY, int(time.time() * 1000), None)
+
+
+category_registry = CategoryRegistry()
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Returns the [sort value, id] pair stored in a cursor, or None if it is invalid.
+    """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        return None
+    if not (isinstance(values, list) and len(values) == 2 and all(isinstance(v, int) for v in values)):
+        return None
+    return values
+
+
+def _collection_query(category_id, sort, cursor, per_page):
+    field, descending = SORT_MODES.get(sort, SORT_MODES['default'])
+    products = Product.objects.filter(category_id=category_id)
+
+    after = decode_cursor(cursor)
+    if after is not None:
+        value, last_id = after
+        if field == 'id':
+            products = products.filter(id__gt=last_id)
+        else:
+            lookup = 'lt' if descending else 'gt'
+            products = products.filter(Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, 'id__gt': last_id}))
+
+    ordering = [f'-{field}' if descending else field]
+    if field != 'id':
+        ordering.append('id')
+    return products.order_by(*ordering).values()[:per_page + 1], field
+
+
+def _collection_result(rows, field, per_page):
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor([last[field], last['id']])
+    return rows, next_cursor
+
+
+def collection_page(category_id, sort='default', cursor=None, per_page=24):
+    """
+    Returns one page of a category's products using keyset pagination, so each
+    page is an index range scan instead of an OFFSET scan.
+    Returns (products as value dicts, cursor for the next page or None).
+    """
+    products, field = _collection_query(category_id, sort, cursor, per_page)
+    return _collection_result(list(products), field, per_page)
+
+
+async def acollection_page(category_id, sort='default', cursor=None, per_page=24):
+    """
+    Async collection_page(), for the ASGI views.
+    """
+    products, field = _collection_query(category_id, sort, cursor, per_page)
+    return _collection_result([row async for row in products], field, per_page)
@@ -0,0 +1,201 @@
+"""
+Bulk catalog import and export as CSV or JSON Lines.
+
+Files are read and written one row at a time, so memory use depends on the
+batch size and not on the size of the catalog. Each import batch is one
+transaction: categories named in the batch are created if they are new, then
+the products are upserted in a single bulk_create(update_conflicts=True) on
+their SKU. Rows without a SKU can't be matched and are always inserted.
+
+Columns: sku, title, material, description, price, category (by name), image.
+"""
+import csv
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+import django
+from django.conf import settings
+from django.db import transaction
+from .catalog import category_registry
+from .fragments import bump_category_version, bump_product_version
+from .images import find_source, generate_derivatives, record_derivatives
+from .models import Category, Product
+from .rails import image_basename, invalidate_home_rails
+
+FIELDS = ['sku', 'title', 'material', 'description', 'price', 'category', 'image']
+UPDATE_FIELDS = ['title', 'material', 'description', 'price', 'category', 'image', 'updated_at']
+FORMATS = ('csv', 'jsonl')
+
+
+def detect_format(path):
+    return 'jsonl' if Path(path).suffix.lower() in ('.jsonl', '.ndjson') else 'csv'
+
+
+def read_rows(stream, fmt):
+    """
+    Yields (line number, row dict) from a CSV or JSON Lines text stream.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, 1):
+        if line.strip():
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as e:
+                raise ValueError(f'line {line_number}: {e}') from None
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _product(line_number, row, category_ids):
+    try:
+        title = (row.get('title') or '').strip()
+        if not title:
+            raise ValueError('title is required')
+        name = (row.get('category') or '').strip()
+        if not name:
+            raise ValueError('category is required')
+        return Product(
+            sku=str(row.get('sku') or '').strip() or None,
+            title=title,
+            material=row.get('material') or '',
+            description=row.get('description') or '',
+            price=int(row.get('price') or 0),
+            category_id=category_ids[name],
+            image=row.get('image') or '',
+        )
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'line {line_number}: {e}') from None
+
+
+def _add_categories(names, category_ids):
+    """
+    Creates the categories in `names` that don't exist yet and adds every
+    name's id to `category_ids`. Returns the number created.
+    """
+    missing = sorted(names - category_ids.keys())
+    if not missing:
+        return 0
+    category_ids.update(Category.objects.filter(name__in=missing).values_list('name', 'id'))
+    new = [name for name in missing if name not in category_ids]
+    for category in Category.objects.bulk_create([Category(name=name) for name in new]):
+        category_ids[category.name] = category.id
+    # Backends that don't return ids from bulk_create.
+    if any(name not in category_ids for name in new):
+        category_ids.update(Category.objects.filter(name__in=new).values_list('name', 'id'))
+    return len(new)
+
+
+def import_catalog(rows, batch_size=None, images=None):
+    """
+    Upserts (line number, row) pairs from read_rows() in batches. `images` is
+    an ImageIngester or None. Returns {'rows', 'batches', 'categories', 'images'}.
+    A bad row raises ValueError; batches before it stay committed.
+    """
+    batch_size = batch_size or getattr(settings, 'CATALOG_IMPORT_BATCH_SIZE', 2000)
+    category_ids = {}
+    stats = {'rows': 0, 'batches': 0, 'categories': 0, 'images': 0}
+    try:
+        for batch in _batched(rows, batch_size):
+            with transaction.atomic():
+                names = {(row.get('category') or '').strip() for _, row in batch} - {''}
+                stats['categories'] += _add_categories(names, category_ids)
+                # One row per SKU: a statement can't upsert the same row twice.
+                products, by_sku = [], {}
+                for line_number, row in batch:
+                    product = _product(line_number, row, category_ids)
+                    if product.sku is None:
+                        products.append(product)
+                    else:
+                        by_sku[product.sku] = product
+                products.extend(by_sku.values())
+                Product.objects.bulk_create(products, update_conflicts=True, unique_fields=['sku'],
+                                            update_fields=UPDATE_FIELDS)
+            stats['rows'] += len(batch)
+            stats['batches'] += 1
+            if images is not None:
+                stats['images'] += images.ingest(product.image.name for product in products)
+    finally:
+        # bulk_create sends no post_save, so do what store.signals would.
+        if stats['categories']:
+            category_registry.invalidate()
+            bump_category_version()
+        if stats['rows']:
+            invalidate_home_rails()
+            bump_product_version()
+    return stats
+
+
+class ImageIngester:
+    """
+    Generates the resized variants (store.images) of imported product images
+    in a pool of worker processes. Each image name is handled once per run.
+    """
+
+    def __init__(self, workers=None, force=False):
+        self.force = force
+        self.seen = set()
+        self.pool = ProcessPoolExecutor(workers, initializer=django.setup)
+
+    def ingest(self, images):
+        """
+        Processes one batch's image names and records the results. Returns the number processed.
+        """
+        sources = {}
+        for image in images:
+            name = image_basename(image)
+            if name and name not in self.seen:
+                self.seen.add(name)
+                source = find_source(name)
+                if source is not None:
+                    sources[name] = source
+        if not sources:
+            return 0
+        names = list(sources)
+        entries = self.pool.map(generate_derivatives, [sources[name] for name in names], names,
+                                [self.force] * len(names), [False] * len(names))
+        record_derivatives(dict(zip(names, entries)))
+        return len(names)
+
+    def close(self):
+        self.pool.shutdown()
+
+
+def export_rows(chunk_size=None):
+    """
+    Yields every product as an export row dict, oldest first, streamed from one query.
+    """
+    chunk_size = chunk_size or getattr(settings, 'CATALOG_EXPORT_CHUNK_SIZE', 2000)
+    products = Product.objects.order_by('id').values_list(
+        'sku', 'title', 'material', 'description', 'price', 'category__name', 'image')
+    for values in products.iterator(chunk_size=chunk_size):
+        row = dict(zip(FIELDS, values))
+        row['sku'] = row['sku'] or ''
+        row['description'] = row['description'] or ''
+        yield row
+
+
+def write_rows(stream, rows, fmt):
+    """
+    Writes row dicts to a text stream as CSV or JSON Lines. Returns the number written.
+    """
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+        return count
+    for row in rows:
+        stream.write(json.dumps(row) + '\n')
+        count += 1
+    return count
@@ -0,0 +1,15 @@
+from .fragments import fragment_timeout, get_versions
+from .catalog import category_registry
+
+
+def fragments(request):
+    """
+    Fragment cache timeout and versions for the `{% cache %}` blocks in the
+    storefront templates, plus the categories for the navbar menu from the
+    in-memory category registry.
+    """
+    return {
+        'fragment_timeout': fragment_timeout(),
+        'categories': category_registry.all(),
+        **get_versions(),
+    }
@@ -0,0 +1,58 @@
+"""
+Version numbers for cached template fragments.
+
+Product cards and the category menu are cached with `{% cache %}` keyed on a
+version from here. Saving or deleting a Product or Category bumps its version,
+so every stale fragment is skipped at once without having to find its keys.
+"""
+import time
+from django.conf import settings
+from django.core.cache import caches
+
+PRODUCT_VERSION_KEY = 'store:fragments:product_version'
+CATEGORY_VERSION_KEY = 'store:fragments:category_version'
+
+
+def fragment_cache():
+    return caches[getattr(settings, 'STORE_FRAGMENT_CACHE', 'fragments')]
+
+
+def fragment_timeout():
+    return getattr(settings, 'STORE_FRAGMENT_CACHE_TIMEOUT', 3600)
+
+
+def _initial_version():
+    # Seeded from the clock so a restarted cache doesn't reuse old fragment keys.
+    return int(time.time() * 1000)
+
+
+def get_versions():
+    """
+    Returns {'product_version', 'category_version'}, initialising missing ones.
+    """
+    cache = fragment_cache()
+    found = cache.get_many([PRODUCT_VERSION_KEY, CATEGORY_VERSION_KEY])
+    missing = {key: _initial_version() for key in (PRODUCT_VERSION_KEY, CATEGORY_VERSION_KEY) if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {
+        'product_version': found[PRODUCT_VERSION_KEY],
+        'category_version': found[CATEGORY_VERSION_KEY],
+    }
+
+
+def _bump(key):
+    cache = fragment_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_version(), None)
+
+
+def bump_product_version():
+    _bump(PRODUCT_VERSION_KEY)
+
+
+def bump_category_version():
+    _bump(CATEGORY_VERSION_KEY)
@@ -0,0 +1,14 @@
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+
+class StoreArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id at the OWASP minimum cost (19 MiB, 2 passes, 1 lane).
+
+    Django's default (100 MiB across 8 lanes) is built for a handful of admin
+    logins, not every storefront worker checking passwords at once. Hashes
+    made with other parameters still verify and are upgraded on login.
+    """
+    time_cost = 2
+    memory_cost = 19456
+    parallelism = 1
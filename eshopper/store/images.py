@@ -0,0 +1,191 @@
+"""
+Resized, modern-format variants of product images.
+
+Each source image is written at a few widths as AVIF (when Pillow supports
+it), WebP and JPEG, with a content hash in the file name so the files can be
+cached forever. A JSON manifest in PRODUCT_THUMBNAIL_ROOT records what was
+generated; the `product_image` template tag reads it to emit srcset markup.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from PIL import Image, features
+
+MANIFEST_NAME = 'manifest.json'
+QUALITY = {'avif': 60, 'webp': 80, 'jpeg': 82}
+
+_lock = threading.Lock()
+_manifest = {'data': {}, 'mtime': None, 'checked': 0.0, 'path': None}
+# One thread, so saves never resize images in parallel with each other or the request.
+_background = ThreadPoolExecutor(max_workers=1, thread_name_prefix='thumbnails')
+
+
+def thumbnail_root():
+    return Path(getattr(settings, 'PRODUCT_THUMBNAIL_ROOT', Path(settings.BASE_DIR) / 'store' / 'static' / 'thumbs'))
+
+
+def thumbnail_static_prefix():
+    """
+    Static path prefix the thumbnail root is served under.
+    """
+    return getattr(settings, 'PRODUCT_THUMBNAIL_STATIC_PREFIX', 'thumbs/')
+
+
+def thumbnail_widths():
+    return getattr(settings, 'PRODUCT_THUMBNAIL_WIDTHS', [320, 640, 960])
+
+
+def output_formats():
+    formats = ['webp', 'jpeg']
+    if features.check('avif'):
+        formats.insert(0, 'avif')
+    return formats
+
+
+def variant_name(name, digest, width, fmt):
+    stem = Path(name).stem.replace(' ', '-')
+    return f"{stem}-{digest}-{width}.{'jpg' if fmt == 'jpeg' else fmt}"
+
+
+def find_source(name):
+    """
+    Absolute path of a product image given its file name, or None.
+    """
+    return finders.find(name)
+
+
+def load_manifest():
+    """
+    Returns the manifest, re-reading it at most once a second when it changes on disk.
+    """
+    now = time.monotonic()
+    path = thumbnail_root() / MANIFEST_NAME
+    if now - _manifest['checked'] < 1.0 and path == _manifest['path']:
+        return _manifest['data']
+    with _lock:
+        _manifest['checked'] = now
+        _manifest['path'] = path
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            _manifest['data'], _manifest['mtime'] = {}, None
+            return _manifest['data']
+        if mtime != _manifest['mtime']:
+            with open(path) as f:
+                _manifest['data'] = json.load(f)
+            _manifest['mtime'] = mtime
+    return _manifest['data']
+
+
+def _write_manifest(entries):
+    root = thumbnail_root()
+    with _lock:
+        path = root / MANIFEST_NAME
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        manifest.update(entries)
+        fd, tmp = tempfile.mkstemp(dir=root, suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+        _manifest['checked'] = 0.0
+
+
+def _flatten(image):
+    # JPEG has no alpha channel; composite transparent product shots onto white.
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.split()[-1])
+        return background
+    return image.convert('RGB')
+
+
+def record_derivatives(entries):
+    """
+    Adds {name: entry} results of generate_derivatives(..., record=False) to the manifest.
+    """
+    if entries:
+        _write_manifest(entries)
+
+
+def generate_derivatives(source, name=None, force=False, record=True):
+    """
+    Writes every width/format variant for one source image and records them in
+    the manifest. Skips the work when the manifest already has this content hash.
+    Returns the manifest entry.
+
+    Worker processes pass record=False and leave the manifest to the parent
+    (see record_derivatives), since the manifest lock only covers threads.
+    """
+    source = Path(source)
+    name = name or source.name
+    data = source.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()[:12]
+
+    existing = load_manifest().get(name)
+    if existing and existing['hash'] == digest and not force:
+        return existing
+
+    root = thumbnail_root()
+    root.mkdir(parents=True, exist_ok=True)
+    with Image.open(source) as image:
+        original = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+        width, height = original.size
+        widths = sorted({min(w, width) for w in thumbnail_widths()})
+        variants = {}
+        for fmt in output_formats():
+            variants[fmt] = []
+            for target in widths:
+                resized = original.resize((target, round(height * target / width)), Image.LANCZOS)
+                if fmt == 'jpeg':
+                    resized = _flatten(resized)
+                options = {'quality': QUALITY[fmt]}
+                if fmt == 'jpeg':
+                    options.update(optimize=True, progressive=True)
+                if fmt == 'webp':
+                    options['method'] = 6
+                resized.save(root / variant_name(name, digest, target, fmt), fmt.upper(), **options)
+                variants[fmt].append(target)
+
+    entry = {'hash': digest, 'width': width, 'height': height, 'variants': variants}
+    if record:
+        _write_manifest({name: entry})
+    return entry
+
+
+def queue_derivatives(name):
+    """
+    Generates the variants of a product image by file name on a background
+    thread, off the request path. Returns the Future, or None if there is no source file.
+    """
+    source = find_source(name)
+    if source is None:
+        return None
+    return _background.submit(generate_derivatives, source, name)
+
+
+def srcsets(name):
+    """
+    Returns (entry, {format: [(static path, width), ...]}) for an image, or
+    (None, {}) if no variants have been generated.
+    """
+    entry = load_manifest().get(name)
+    if not entry:
+        return None, {}
+    prefix = thumbnail_static_prefix()
+    sets = {
+        fmt: [(f"{prefix}{variant_name(name, entry['hash'], width, fmt)}", width) for width in widths]
+        for fmt, widths in entry['variants'].items()
+    }
+    return entry, sets
@@ -0,0 +1,385 @@
+"""
+Per-request performance instrumentation.
+
+`PerformanceMiddleware` measures each request's wall time, SQL query count and
+time, cache hits and misses, session writes and template render time. It
+sends them back in a Server-Timing header and records them, per view name, in
+a rolling histogram of one-minute slots. Each process writes its histogram to
+STORE_METRICS_DIR every few seconds, and `python manage.py dump_metrics`
+merges the files.
+
+The bookkeeping is a few counters per request plus one locked update of the
+histogram, so it is cheap enough to leave on in production.
+"""
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.template.backends.django import DjangoTemplates
+
+# Upper bounds (ms) of the latency histogram buckets; a last bucket catches the rest.
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+SLOT_SECONDS = 60
+
+_current = ContextVar('store_request_metrics', default=None)
+_MISSING = object()
+
+
+class RequestMetrics:
+    """
+    Counters for the request being handled, reachable through `current_metrics()`.
+    """
+    __slots__ = ('queries', 'db_ms', 'cache_hits', 'cache_misses', 'template_ms', 'template_depth', 'cache_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_ms = 0.0
+        self.template_depth = 0
+        self.cache_depth = 0
+
+
+def current_metrics():
+    return _current.get()
+
+
+def _count_query(execute, sql, params, many, context):
+    # Installed on every connection (store.signals.count_queries), so queries
+    # that the async ORM runs on a worker thread are counted too.
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_ms += (time.perf_counter() - start) * 1000
+
+
+def instrument_cache(cache):
+    """
+    Counts hits and misses of get() and get_many() on a cache instance.
+    Cache instances are per thread, so this is done once for each.
+    """
+    if getattr(cache, '_store_instrumented', False):
+        return
+    get, get_many = cache.get, cache.get_many
+
+    def counted_get(key, default=None, version=None):
+        value = get(key, _MISSING, version=version)
+        metrics = _current.get()
+        # Some backends implement get_many() with get(); count those once.
+        if metrics is not None and not metrics.cache_depth:
+            if value is _MISSING:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is _MISSING else value
+
+    def counted_get_many(keys, version=None):
+        metrics = _current.get()
+        if metrics is None:
+            return get_many(keys, version=version)
+        keys = list(keys)
+        metrics.cache_depth += 1
+        try:
+            found = get_many(keys, version=version)
+        finally:
+            metrics.cache_depth -= 1
+        metrics.cache_hits += len(found)
+        metrics.cache_misses += len(keys) - len(found)
+        return found
+
+    cache.get = counted_get
+    cache.get_many = counted_get_many
+    cache._store_instrumented = True
+
+
+class TimedTemplate:
+    """
+    Wraps a backend template to add its render time to the current request.
+    Nested renders (an email rendered inside a view, say) are counted once.
+    """
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return self.template.render(context, request)
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_ms += (time.perf_counter() - start) * 1000
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, with render times recorded by PerformanceMiddleware.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+def _empty_stats():
+    return {
+        'count': 0, 'errors': 0,
+        'wall_ms_sum': 0.0, 'wall_ms_max': 0.0,
+        'db_ms_sum': 0.0, 'queries_sum': 0, 'queries_max': 0,
+        'template_ms_sum': 0.0,
+        'cache_hits': 0, 'cache_misses': 0,
+        'session_writes': 0,
+        'buckets': [0] * (len(BUCKETS_MS) + 1),
+    }
+
+
+def merge_stats(into, stats):
+    for name, value in stats.items():
+        if name == 'buckets':
+            into['buckets'] = [a + b for a, b in zip(into['buckets'], value)]
+        elif name.endswith('_max'):
+            into[name] = max(into[name], value)
+        else:
+            into[name] += value
+    return into
+
+
+def _bucket(wall_ms):
+    for index, bound in enumerate(BUCKETS_MS):
+        if wall_ms <= bound:
+            return index
+    return len(BUCKETS_MS)
+
+
+class RollingHistogram:
+    """
+    Per-view request statistics in one-minute slots covering the last
+    STORE_METRICS_WINDOW seconds, thread safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slots = {}  # minute -> {view name: stats}
+        self._flushed = time.monotonic()
+
+    def record(self, view, wall_ms, metrics, session_writes=0, error=False):
+        minute = int(time.time() // SLOT_SECONDS)
+        with self._lock:
+            slot = self._slots.get(minute)
+            if slot is None:
+                slot = self._slots[minute] = {}
+                self._expire(minute)
+            stats = slot.get(view)
+            if stats is None:
+                stats = slot[view] = _empty_stats()
+            stats['count'] += 1
+            stats['errors'] += error
+            stats['wall_ms_sum'] += wall_ms
+            stats['wall_ms_max'] = max(stats['wall_ms_max'], wall_ms)
+            stats['db_ms_sum'] += metrics.db_ms
+            stats['queries_sum'] += metrics.queries
+            stats['queries_max'] = max(stats['queries_max'], metrics.queries)
+            stats['template_ms_sum'] += metrics.template_ms
+            stats['cache_hits'] += metrics.cache_hits
+            stats['cache_misses'] += metrics.cache_misses
+            stats['session_writes'] += session_writes
+            stats['buckets'][_bucket(wall_ms)] += 1
+        self._maybe_flush()
+
+    def _expire(self, minute):
+        oldest = minute - window_seconds() // SLOT_SECONDS
+        for old in [m for m in self._slots if m < oldest]:
+            del self._slots[old]
+
+    def slots(self):
+        """
+        A copy of the slots, as {minute: {view name: stats}}.
+        """
+        with self._lock:
+            return {minute: {view: dict(stats, buckets=list(stats['buckets'])) for view, stats in slot.items()}
+                    for minute, slot in self._slots.items()}
+
+    def reset(self):
+        with self._lock:
+            self._slots = {}
+
+    def _maybe_flush(self):
+        directory = getattr(settings, 'STORE_METRICS_DIR', None)
+        interval = getattr(settings, 'STORE_METRICS_FLUSH_INTERVAL', 10)
+        now = time.monotonic()
+        if not directory or now - self._flushed < interval:
+            return
+        self._flushed = now
+        self.flush(directory)
+
+    def flush(self, directory):
+        """
+        Writes this process's slots to <directory>/<host>-<pid>.json, atomically.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        data = {'pid': os.getpid(), 'updated': time.time(), 'slots': self.slots()}
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, directory / f'{socket.gethostname()}-{os.getpid()}.json')
+
+
+histogram = RollingHistogram()
+
+
+def window_seconds():
+    return getattr(settings, 'STORE_METRICS_WINDOW', 900)
+
+
+def merge_slots(slot_maps, window=None):
+    """
+    Merges {minute: {view: stats}} maps from any number of processes into
+    {view: stats}, keeping only the last `window` seconds.
+    """
+    oldest = int((time.time() - (window or window_seconds())) // SLOT_SECONDS)
+    merged = {}
+    for slots in slot_maps:
+        for minute, slot in slots.items():
+            if int(minute) < oldest:
+                continue
+            for view, stats in slot.items():
+                merge_stats(merged.setdefault(view, _empty_stats()), stats)
+    return merged
+
+
+def load_slot_maps(directory):
+    """
+    Reads every process's flushed slots from STORE_METRICS_DIR.
+    """
+    slot_maps = []
+    for path in sorted(Path(directory).glob('*.json')):
+        try:
+            with open(path) as f:
+                slot_maps.append(json.load(f)['slots'])
+        except (OSError, ValueError, KeyError):
+            continue
+    return slot_maps
+
+
+def estimate_percentile(stats, pct):
+    """
+    Upper bound of the histogram bucket holding the pct-th percentile, capped at the slowest request.
+    """
+    target = pct / 100 * stats['count']
+    seen = 0
+    for index, count in enumerate(stats['buckets']):
+        seen += count
+        if count and seen >= target:
+            bound = BUCKETS_MS[index] if index < len(BUCKETS_MS) else stats['wall_ms_max']
+            return min(bound, stats['wall_ms_max'])
+    return stats['wall_ms_max']
+
+
+def describe(stats):
+    """
+    Means, percentile estimates and ratios for one view's merged stats.
+    """
+    count = stats['count'] or 1
+    lookups = stats['cache_hits'] + stats['cache_misses']
+    return {
+        'count': stats['count'],
+        'errors': stats['errors'],
+        'mean_ms': round(stats['wall_ms_sum'] / count, 3),
+        'p50_ms': estimate_percentile(stats, 50),
+        'p95_ms': estimate_percentile(stats, 95),
+        'p99_ms': estimate_percentile(stats, 99),
+        'max_ms': round(stats['wall_ms_max'], 3),
+        'db_ms_mean': round(stats['db_ms_sum'] / count, 3),
+        'queries_mean': round(stats['queries_sum'] / count, 2),
+        'queries_max': stats['queries_max'],
+        'template_ms_mean': round(stats['template_ms_sum'] / count, 3),
+        'cache_hit_ratio': round(stats['cache_hits'] / lookups, 3) if lookups else None,
+        'session_writes_per_request': round(stats['session_writes'] / count, 3),
+    }
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.url_name or match.view_name
+
+
+def server_timing(wall_ms, metrics, session_writes):
+    return ', '.join([
+        f'app;dur={wall_ms:.1f}',
+        f'db;dur={metrics.db_ms:.1f};desc="{metrics.queries} queries"',
+        f'tpl;dur={metrics.template_ms:.1f}',
+        f'cache;desc="hits={metrics.cache_hits} misses={metrics.cache_misses}"',
+        f'session;desc="{session_writes} writes"',
+    ])
+
+
+class PerformanceMiddleware:
+    """
+    Records timings for every request and adds a Server-Timing header
+    (unless STORE_SERVER_TIMING is False). Runs sync under WSGI and async under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token, start = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        metrics, token, start = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics, start)
+
+    def _start(self):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        for alias in settings.CACHES:
+            instrument_cache(caches[alias])
+        return metrics, token, time.perf_counter()
+
+    def _finish(self, request, response, metrics, start):
+        wall_ms = (time.perf_counter() - start) * 1000
+        session_writes = getattr(request, 'session_writes', 0)
+        histogram.record(_view_name(request), wall_ms, metrics, session_writes, error=response.status_code >= 500)
+        if getattr(settings, 'STORE_SERVER_TIMING', True):
+            response.headers['Server-Timing'] = server_timing(wall_ms, metrics, session_writes)
+        return response
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from store.benchmarks import BENCHMARKS, get_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Runs a storefront benchmark against a throwaway test database.'
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='benchmark', required=True)
+        for name in BENCHMARKS:
+            module = get_benchmark(name)
+            subparser = subparsers.add_parser(name, help=(module.__doc__ or '').strip())
+            module.add_arguments(subparser)
+
+    def handle(self, *args, **options):
+        get_benchmark(options['benchmark']).run(options, self.stdout)
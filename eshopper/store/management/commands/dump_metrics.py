@@ -0,0 +1,44 @@
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from store.instrumentation import describe, histogram, load_slot_maps, merge_slots
+
+
+class Command(BaseCommand):
+    help = 'Prints the per-view request timing histogram recorded by PerformanceMiddleware.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=int, default=None,
+                            help='Seconds to report on (default: STORE_METRICS_WINDOW).')
+        parser.add_argument('--dir', default=None,
+                            help='Directory the web processes flush to (default: STORE_METRICS_DIR).')
+        parser.add_argument('--view', action='append', help='Only report these views (repeatable).')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or getattr(settings, 'STORE_METRICS_DIR', None)
+        slot_maps = load_slot_maps(directory) if directory else []
+        # Include this process too, for when the command is called in process.
+        slot_maps.append(histogram.slots())
+        merged = merge_slots(slot_maps, options['window'])
+        if options['view']:
+            merged = {view: stats for view, stats in merged.items() if view in options['view']}
+        report = {view: describe(stats) for view, stats in sorted(merged.items())}
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        if not report:
+            self.stdout.write('No requests recorded.')
+            return
+
+        self.stdout.write(f"{'view':<20}{'count':>8}{'mean':>9}{'p50':>8}{'p95':>8}{'p99':>8}{'db ms':>8}"
+                          f"{'queries':>9}{'tpl ms':>8}{'cache hit':>10}{'sess w':>8}{'errors':>8}")
+        for view, row in report.items():
+            hit_ratio = '-' if row['cache_hit_ratio'] is None else f"{row['cache_hit_ratio']:.0%}"
+            self.stdout.write(
+                f"{view:<20}{row['count']:>8}{row['mean_ms']:>9.2f}{row['p50_ms']:>8.1f}{row['p95_ms']:>8.1f}"
+                f"{row['p99_ms']:>8.1f}{row['db_ms_mean']:>8.2f}{row['queries_mean']:>9.2f}"
+                f"{row['template_ms_mean']:>8.2f}{hit_ratio:>10}{row['session_writes_per_request']:>8.2f}"
+                f"{row['errors']:>8}"
+            )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from store.images import find_source, generate_derivatives
+from store.models import Product
+from store.rails import image_basename
+
+
+class Command(BaseCommand):
+    help = 'Generates resized AVIF/WebP/JPEG variants of every product image.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate variants even if the manifest is up to date.')
+
+    def handle(self, *args, **options):
+        names = {image_basename(image) for image in Product.objects.values_list('image', flat=True)}
+        generated = missing = 0
+        for name in sorted(names):
+            source = find_source(name)
+            if source is None:
+                self.stderr.write(f'No source file for {name}')
+                missing += 1
+                continue
+            generate_derivatives(source, name, force=options['force'])
+            generated += 1
+        self.stdout.write(f'Processed {generated} image(s), {missing} missing.')
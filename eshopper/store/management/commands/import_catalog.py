@@ -0,0 +1,41 @@
+import sys
+import time
+from contextlib import nullcontext
+from django.core.management.base import BaseCommand, CommandError
+from store.catalog_io import FORMATS, ImageIngester, detect_format, import_catalog, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Upserts categories and products from a CSV or JSON Lines catalog file, matching products on SKU.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Catalog file, or '-' for stdin.")
+        parser.add_argument('--format', choices=FORMATS, default=None,
+                            help='File format (default: from the extension, else csv).')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Rows upserted per transaction (default: CATALOG_IMPORT_BATCH_SIZE).')
+        parser.add_argument('--images', action='store_true',
+                            help='Also generate resized variants of the product images.')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Image worker processes (default: one per CPU).')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path == '-' else detect_format(path))
+        images = ImageIngester(options['workers']) if options['images'] else None
+        began = time.perf_counter()
+        try:
+            with (open(path, newline='', encoding='utf-8') if path != '-' else nullcontext(sys.stdin)) as stream:
+                stats = import_catalog(read_rows(stream, fmt), batch_size=options['batch_size'], images=images)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        finally:
+            if images is not None:
+                images.close()
+        elapsed = time.perf_counter() - began
+
+        self.stdout.write(
+            f"Imported {stats['rows']} row(s) in {stats['batches']} batch(es), "
+            f"{stats['categories']} new categor{'y' if stats['categories'] == 1 else 'ies'}, "
+            f"{stats['images']} image(s) in {elapsed:.1f}s ({stats['rows'] / (elapsed or 1):.0f} rows/s)."
+        )
@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from store.reports import rollup_reports
+
+
+class Command(BaseCommand):
+    help = 'Adds orders placed since the last run to the daily sales report tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Order ids folded per transaction (default: SALES_REPORT_BATCH_SIZE).')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep rolling up new orders instead of exiting after one run.')
+        parser.add_argument('--interval', type=float, default=60.0,
+                            help='Seconds to sleep between runs when --loop is set.')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            total += rollup_reports(batch_size=options['batch_size'])
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(f'Rolled up {total} order id(s).')
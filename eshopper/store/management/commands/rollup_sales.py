@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from store.sales import rollup_sales
+
+
+class Command(BaseCommand):
+    help = 'Adds logged sales to Product.amount_sold.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Sale events folded per transaction (default: SALES_ROLLUP_BATCH_SIZE).')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep rolling up new sales instead of exiting once the log is empty.')
+        parser.add_argument('--interval', type=float, default=60.0,
+                            help='Seconds to sleep between rollups when --loop is set.')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            total += rollup_sales(batch_size=options['batch_size'])
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(f'Rolled up {total} sale event(s).')
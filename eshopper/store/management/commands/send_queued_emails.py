@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand
+from store.outbox import send_pending
+
+
+class Command(BaseCommand):
+    help = 'Delivers queued emails from the outbox in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Emails claimed and sent per batch (default: EMAIL_OUTBOX_BATCH_SIZE).')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Sender threads (default: EMAIL_OUTBOX_WORKERS).')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling the outbox instead of exiting once it is drained.')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to sleep between polls when --loop is set.')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_pending(batch_size=options['batch_size'], workers=options['workers'])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(f'Sent {total_sent} email(s), {total_failed} failed attempt(s).')
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:06
+
+from django.db import migrations, models
+
+
+def merge_duplicate_customers(apps, schema_editor):
+    # Guest checkout used to create a new Customer per order, so an email can
+    # appear more than once. Keep the oldest row and move the orders onto it
+    # before the unique constraint is added.
+    Customer = apps.get_model('store', 'Customer')
+    Order = apps.get_model('store', 'Order')
+    duplicates = (Customer.objects.values('email')
+                  .annotate(count=models.Count('id'), keep=models.Min('id'))
+                  .filter(count__gt=1))
+    for row in duplicates:
+        others = Customer.objects.filter(email=row['email']).exclude(id=row['keep'])
+        Order.objects.filter(customer__in=others).update(customer_id=row['keep'])
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_outboundemail'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_customers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='category',
+            name='name',
+            field=models.CharField(db_index=True, max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-amount_sold'], name='product_amount_sold_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price'], name='product_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'price'], name='product_category_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', '-amount_sold'], name='product_category_sold_idx'),
+        ),
+    ]
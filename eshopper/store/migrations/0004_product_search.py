@@ -0,0 +1,69 @@
+from django.db import migrations
+
+# Frozen copies of store.search as of this migration; later changes to the
+# search code must not change what this migration does.
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS store_product_fts USING fts5("
+    "title, category, description, material, tokenize='unicode61 remove_diacritics 2')",
+    """
+    CREATE TRIGGER IF NOT EXISTS store_product_fts_ai AFTER INSERT ON store_product BEGIN
+        INSERT INTO store_product_fts(rowid, title, category, description, material)
+        VALUES (new.id, new.title, (SELECT name FROM store_category WHERE id = new.category_id),
+                coalesce(new.description, ''), new.material);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS store_product_fts_ad AFTER DELETE ON store_product BEGIN
+        DELETE FROM store_product_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS store_product_fts_au
+    AFTER UPDATE OF title, description, material, category_id ON store_product BEGIN
+        DELETE FROM store_product_fts WHERE rowid = old.id;
+        INSERT INTO store_product_fts(rowid, title, category, description, material)
+        VALUES (new.id, new.title, (SELECT name FROM store_category WHERE id = new.category_id),
+                coalesce(new.description, ''), new.material);
+    END
+    """,
+    "INSERT INTO store_product_fts(rowid, title, category, description, material) "
+    "SELECT p.id, p.title, c.name, coalesce(p.description, ''), p.material "
+    "FROM store_product p LEFT JOIN store_category c ON c.id = p.category_id",
+]
+
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS store_product_fts_ai",
+    "DROP TRIGGER IF EXISTS store_product_fts_ad",
+    "DROP TRIGGER IF EXISTS store_product_fts_au",
+    "DROP TABLE IF EXISTS store_product_fts",
+]
+
+POSTGRES_INSTALL = [
+    "CREATE INDEX IF NOT EXISTS store_product_search_idx ON store_product USING gin (("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '') || ' ' || coalesce(material, '')), 'C')))",
+]
+
+POSTGRES_UNINSTALL = ["DROP INDEX IF EXISTS store_product_search_idx"]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for sql in statements.get(vendor, []):
+            schema_editor.execute(sql, params=None)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRES_INSTALL}),
+            run({'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL}),
+        ),
+    ]
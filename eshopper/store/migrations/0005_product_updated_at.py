@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:19
+
+from django.db import migrations, models
+from ._search import drop_category_search_trigger
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_product_search'),
+    ]
+
+    operations = [
+        # Adding the column rebuilds store_product on SQLite.
+        migrations.RunPython(drop_category_search_trigger, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_product_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='password',
+            field=models.CharField(max_length=255),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:52
+
+from django.db import migrations, models
+from ._search import drop_category_search_trigger
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_sales_reports'),
+    ]
+
+    operations = [
+        # Adding a unique column rebuilds store_product on SQLite.
+        migrations.RunPython(drop_category_search_trigger, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,13 @@
+from django.db import migrations
+from ._search import drop_category_search_trigger
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_order_date_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_category_search_trigger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,15 @@
+"""
+Shared by store migrations; the leading underscore keeps the migration loader
+from treating this module as a migration.
+
+Earlier versions of 0004 also installed store_category_fts_au, a trigger on
+store_category that reads store_product. SQLite refuses to rename a rebuilt
+store_product while it exists, so every migration that rebuilds store_product
+drops it first, as does 0011 for databases that are past them. Nothing puts
+it back: category renames now reach the search index through store.signals.
+"""
+
+
+def drop_category_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TRIGGER IF EXISTS store_category_fts_au", params=None)
@@ -1,10 +1,12 @@
 from django.db import models
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.contrib.auth.hashers import check_password, make_password
 
 # Create your models here.
 class Category(models.Model):
-    name = models.CharField(max_length=50)
+    name = models.CharField(max_length=50, db_index=True)
 
     @staticmethod
     def get_all_categories():
@@ -22,8 +24,9 @@ class Customer(models.Model):
     last_name = models.CharField(max_length=50)
     address = models.CharField(max_length=100, null=True)
     phone = models.CharField(max_length=11)
-    email = models.EmailField()
-    password = models.CharField(max_length=100)
+    email = models.EmailField(unique=True)
+    # Room for Argon2 and scrypt hashes, which are longer than PBKDF2's.
+    password = models.CharField(max_length=255)
 
     def register(self):
         self.save()
@@ -32,8 +35,20 @@ class Customer(models.Model):
     def get_customer_by_email(email):
         try:
             return Customer.objects.get(email=email)
-        except:
+        except Customer.DoesNotExist:
             return False
+
+    def check_password(self, raw_password):
+        """
+        Checks a password against the stored hash. When the hash was made with
+        an older hasher or cost, it is replaced with one from the current
+        PASSWORD_HASHERS profile.
+        """
+        def rehash(raw_password):
+            self.password = make_password(raw_password)
+            Customer.objects.filter(pk=self.pk).update(password=self.password)
+
+        return check_password(raw_password, self.password, rehash)
         
     def isExists(self):
         if Customer.objects.filter(email=self.email):
@@ -45,6 +60,8 @@ class Customer(models.Model):
         return self.first_name + ' ' + self.last_name
     
 class Product(models.Model):
+    # Supplier stock keeping unit; catalog imports upsert on it (see store.catalog_io).
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     title = models.CharField(max_length=60)
     material = models.CharField(max_length=60)
     description = models.CharField(max_length=1000, default='', blank=True, null=True)
@@ -52,10 +69,33 @@ class Product(models.Model):
     amount_sold = models.IntegerField(default=0)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, default=1)
     image = models.ImageField(upload_to='store\static')
+    # Drives the product page's Last-Modified/ETag; queryset.update() doesn't touch it.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Home page rails and the collections sort modes.
+            models.Index(fields=['-amount_sold'], name='product_amount_sold_idx'),
+            models.Index(fields=['price'], name='product_price_idx'),
+            models.Index(fields=['category', 'price'], name='product_category_price_idx'),
+            models.Index(fields=['category', '-amount_sold'], name='product_category_sold_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets store.signals tell whether a save changed the image.
+        if 'image' in field_names:
+            instance._loaded_image = values[field_names.index('image')]
+        return instance
 
     @staticmethod
-    def search(query):
-        return Product.objects.filter(Q(title__icontains=query) | Q(category__name__icontains=query)).values()
+    def search(query, page=1, per_page=24):
+        """
+        Returns a SearchPage of ranked product dicts from the configured search backend.
+        """
+        from .search import get_search_backend
+        return get_search_backend().search(query, page=page, per_page=per_page)
     
     @staticmethod
     def get_products_by_id(ids):
@@ -87,7 +127,23 @@ class Order(models.Model):
     phone = models.CharField(max_length=50, default='', blank=True)
     date = models.DateField(default=timezone.now)
     status = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Date-range order exports, which stream in (date, id) order, and the admin date hierarchy.
+            models.Index(fields=['date', 'id'], name='order_date_idx'),
+        ]
     
+    @staticmethod
+    def with_totals():
+        """
+        Orders annotated with `total` (sum of price x quantity) and `item_count`.
+        """
+        return Order.objects.annotate(
+            total=Coalesce(Sum(F('orderitem__price') * F('orderitem__quantity')), 0),
+            item_count=Coalesce(Sum('orderitem__quantity'), 0),
+        )
+
     def __str__(self):
         return str(self.id)
 
@@ -100,4 +156,111 @@ class OrderItem(models.Model):
     price = models.IntegerField()  # Price at the time of purchase
     
     def __str__(self):
-        return f"{self.quantity} x {self.product.title}"
\ No newline at end of file
+        return f"{self.quantity} x {self.product.title}"
+
+
+class OutboundEmail(models.Model):
+    """
+    Email waiting to be delivered by the send_queued_emails command.
+
+    Rows are written in the same transaction as the data they describe, so an
+    email is only ever sent for a committed order.
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, default='')
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+
+class SaleEvent(models.Model):
+    """
+    Units of a product sold by one checkout, waiting to be added to
+    Product.amount_sold by the rollup_sales command.
+
+    Checkouts only ever insert these rows, so concurrent orders for the same
+    product never wait on its row. See store.sales.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.IntegerField()
+
+    def __str__(self):
+        return f"{self.quantity} x product {self.product_id}"
+
+
+class DailyProductSales(models.Model):
+    """
+    Orders, units and revenue for one product on one day, maintained from
+    OrderItem by the rollup_reports command (see store.reports).
+    """
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    orders = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    revenue = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='daily_product_sales_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} product {self.product_id}: {self.revenue}"
+
+
+class DailyCategorySales(models.Model):
+    """
+    Orders, units and revenue for one category on one day, maintained from
+    OrderItem by the rollup_reports command (see store.reports).
+    """
+    day = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    orders = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    revenue = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category'], name='daily_category_sales_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} category {self.category_id}: {self.revenue}"
+
+
+class ReportWatermark(models.Model):
+    """
+    How far a rollup has read the order history: every Order with an id up
+    to `last_order_id` is included in its tables.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    last_order_id = models.IntegerField(default=0)
+    # Highest order id seen by the previous run; see store.reports.rollup_reports.
+    horizon_order_id = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_order_id}"
@@ -0,0 +1,120 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+from .models import OutboundEmail
+
+
+def queue_email(subject, message, from_email, recipient_list, html_message=None):
+    """
+    Stores an email in the outbox. Call inside the transaction that writes the
+    data the email is about so both commit (or roll back) together.
+    """
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=message,
+        html_body=html_message or '',
+        from_email=from_email,
+        to=list(recipient_list),
+    )
+
+
+def _build_message(email, connection):
+    message = EmailMultiAlternatives(email.subject, email.body, email.from_email, email.to,
+                                     connection=connection)
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def _send_chunk(emails):
+    """
+    Sends a chunk of emails over one reused connection.
+    Returns a list of (email id, error message or None).
+    """
+    results = []
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        return [(email.id, str(e) or e.__class__.__name__) for email in emails]
+
+    try:
+        for email in emails:
+            try:
+                connection.send_messages([_build_message(email, connection)])
+                results.append((email.id, None))
+            except Exception as e:
+                results.append((email.id, str(e) or e.__class__.__name__))
+    finally:
+        connection.close()
+    return results
+
+
+def _claim(batch_size, now):
+    """
+    Claims up to batch_size due emails for this worker by moving their
+    next_attempt_at forward by EMAIL_OUTBOX_LEASE seconds, so other workers
+    skip them. Each row is only taken if it still has the next_attempt_at that
+    was read, which keeps claims disjoint on SQLite, where select_for_update()
+    doesn't lock. If the worker dies, the emails are due again once the lease ends.
+    """
+    lease = now + timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_LEASE', 300))
+    claimed = []
+    with transaction.atomic():
+        due = (OutboundEmail.objects.select_for_update(skip_locked=True)
+               .filter(status=OutboundEmail.PENDING, next_attempt_at__lte=now)
+               .order_by('next_attempt_at', 'id')[:batch_size])
+        for email in due:
+            if OutboundEmail.objects.filter(id=email.id, status=OutboundEmail.PENDING,
+                                            next_attempt_at=email.next_attempt_at).update(next_attempt_at=lease):
+                email.next_attempt_at = lease
+                claimed.append(email)
+    return claimed
+
+
+def send_pending(batch_size=None, workers=None):
+    """
+    Claims and delivers one batch of due emails using a thread pool, each worker
+    reusing a single connection. Failed emails are retried with exponential
+    backoff until EMAIL_OUTBOX_MAX_ATTEMPTS is reached. Returns (sent, failed) counts.
+    """
+    batch_size = batch_size or getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50)
+    workers = workers or getattr(settings, 'EMAIL_OUTBOX_WORKERS', 1)
+    max_attempts = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    retry_delay = getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 60)
+
+    now = timezone.now()
+    emails = _claim(batch_size, now)
+    if not emails:
+        return 0, 0
+
+    # Split the batch evenly between workers; the database is only touched from this thread.
+    workers = max(1, min(workers, len(emails)))
+    chunks = [emails[i::workers] for i in range(workers)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = dict(result for chunk in pool.map(_send_chunk, chunks) for result in chunk)
+
+    sent = []
+    failed = []
+    for email in emails:
+        error = results[email.id]
+        email.attempts += 1
+        if error is None:
+            email.status = OutboundEmail.SENT
+            email.sent_at = now
+            email.last_error = ''
+            sent.append(email)
+        else:
+            email.last_error = error
+            if email.attempts >= max_attempts:
+                email.status = OutboundEmail.FAILED
+            else:
+                email.next_attempt_at = now + timedelta(seconds=retry_delay * 2 ** (email.attempts - 1))
+            failed.append(email)
+
+    OutboundEmail.objects.bulk_update(
+        emails, ['status', 'attempts', 'last_error', 'next_attempt_at', 'sent_at'])
+    return len(sent), len(failed)
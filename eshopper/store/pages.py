@@ -0,0 +1,100 @@
+"""
+Conditional GET and a shared server-side cache for product pages.
+
+A product page only differs between visitors in the navbar (guest or the
+customer's first name), the CSRF token and the cart badge. The badge is
+filled in by the browser from the cart API, the CSRF token is substituted
+into the cached body on the way out, and the navbar variant is part of the
+cache key, so one rendered body serves every session with the same variant.
+"""
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from .fragments import get_versions
+from .models import Product
+
+PRODUCT_PAGE_KEY = 'store:product_page:{}'
+# Stands in for the per-request CSRF token in cached bodies.
+CSRF_PLACEHOLDER = '__store_csrf_token__'
+
+
+def product_validators(request, product_id):
+    """
+    Returns {'etag', 'last_modified', 'key'} for a product page, or None if
+    the product doesn't exist. One query per request, memoized on the request
+    since the ETag and Last-Modified checks both need it.
+    """
+    cached = getattr(request, '_product_validators', None)
+    if cached is not None and cached[0] == product_id:
+        return cached[1]
+
+    updated_at = _updated_at(product_id).first()
+    return _remember_validators(request, product_id, updated_at)
+
+
+async def aproduct_validators(request, product_id):
+    """
+    Async product_validators(), for the ASGI views.
+    """
+    cached = getattr(request, '_product_validators', None)
+    if cached is not None and cached[0] == product_id:
+        return cached[1]
+    updated_at = await _updated_at(product_id).afirst()
+    return _remember_validators(request, product_id, updated_at)
+
+
+def _updated_at(product_id):
+    return Product.objects.filter(id=product_id).values_list('updated_at', flat=True)
+
+
+def _remember_validators(request, product_id, updated_at):
+    validators = None
+    if updated_at is not None:
+        variant = request.session.get('Customer', {}).get('First_Name', '')
+        parts = [product_id, updated_at.isoformat(), get_versions()['category_version'], variant]
+        digest = hashlib.sha256('|'.join(map(str, parts)).encode()).hexdigest()[:32]
+        validators = {
+            'etag': digest,
+            'last_modified': updated_at,
+            'key': PRODUCT_PAGE_KEY.format(digest),
+        }
+    request._product_validators = (product_id, validators)
+    return validators
+
+
+def product_etag(request, product_id):
+    validators = product_validators(request, product_id)
+    return validators and validators['etag']
+
+
+def product_last_modified(request, product_id):
+    validators = product_validators(request, product_id)
+    return validators and validators['last_modified']
+
+
+def get_cached_page(key):
+    return cache.get(key)
+
+
+def set_cached_page(key, body):
+    cache.set(key, body, _page_timeout())
+
+
+async def aget_cached_page(key):
+    return await cache.aget(key)
+
+
+async def aset_cached_page(key, body):
+    await cache.aset(key, body, _page_timeout())
+
+
+def _page_timeout():
+    return getattr(settings, 'PRODUCT_PAGE_CACHE_TIMEOUT', 3600)
+
+
+def personalize(request, body):
+    """
+    Puts this request's CSRF token into a cached page body.
+    """
+    return body.replace(CSRF_PLACEHOLDER, get_token(request))
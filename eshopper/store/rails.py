@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.core.cache import cache
+from .models import Product
+
+BEST_SELLERS_KEY = 'store:rails:best_sellers'
+HOT_DEALS_KEY = 'store:rails:hot_deals'
+
+
+def image_basename(full_path):
+    """
+    Returns the file name of an uploaded image, which is how product images are
+    served from the static directory.
+    """
+    full_path = str(full_path)
+    index = full_path.rfind('/')
+    return full_path[index+1:]
+
+
+def _best_sellers_query():
+    return Product.objects.order_by('-amount_sold').values()[:8]
+
+
+def _hot_deals_query():
+    return Product.objects.order_by('price').values()[:3]
+
+
+def _best_sellers_rail(products):
+    return [{'product': product, 'image_path': {'path': image_basename(product['image'])}}
+            for product in products]
+
+
+def _hot_deals_rail(products):
+    return [{'product': product, 'image_path': {'path': image_basename(product['image'])},
+             'price_cut': int(product['price'] * 1.6)}
+            for product in products]
+
+
+def _build_best_sellers():
+    return _best_sellers_rail(_best_sellers_query())
+
+
+def _build_hot_deals():
+    return _hot_deals_rail(_hot_deals_query())
+
+
+def _timeout():
+    return getattr(settings, 'HOME_RAILS_TIMEOUT', 600)
+
+
+def _cached(key, build):
+    rail = cache.get(key)
+    if rail is None:
+        rail = build()
+        cache.set(key, rail, _timeout())
+    return rail
+
+
+async def _acached(key, query, build):
+    rail = await cache.aget(key)
+    if rail is None:
+        rail = build([product async for product in query()])
+        await cache.aset(key, rail, _timeout())
+    return rail
+
+
+def get_best_sellers():
+    """
+    Returns the "Featured Products" rail (top 8 by amount_sold) from the cache.
+    """
+    return _cached(BEST_SELLERS_KEY, _build_best_sellers)
+
+
+def get_hot_deals():
+    """
+    Returns the "Hot Deals" rail (3 cheapest products) from the cache.
+    """
+    return _cached(HOT_DEALS_KEY, _build_hot_deals)
+
+
+async def aget_best_sellers():
+    """
+    Async get_best_sellers(), for the ASGI views.
+    """
+    return await _acached(BEST_SELLERS_KEY, _best_sellers_query, _best_sellers_rail)
+
+
+async def aget_hot_deals():
+    return await _acached(HOT_DEALS_KEY, _hot_deals_query, _hot_deals_rail)
+
+
+def invalidate_home_rails(**kwargs):
+    """
+    Drops the cached rails. Connected to Product save/delete and called after
+    each sales rollup, which updates amount_sold in bulk without sending signals.
+    """
+    cache.delete_many([BEST_SELLERS_KEY, HOT_DEALS_KEY])
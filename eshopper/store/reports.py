@@ -0,0 +1,172 @@
+"""
+Sales reports from daily aggregate tables instead of the order history.
+
+`rollup_reports()` (`python manage.py rollup_reports --loop`) reads only the
+orders placed since its watermark and adds them to DailyProductSales and
+DailyCategorySales. The reports below read those tables, so their cost
+depends on the days and products in the range and not on how many orders
+there are. Results are cached until the next rollup moves the watermark.
+"""
+import csv
+import io
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+from .catalog import category_registry
+from .models import DailyCategorySales, DailyProductSales, Order, OrderItem, Product, ReportWatermark
+
+WATERMARK = 'daily_sales'
+REPORT_KEY = 'store:reports:{}:{}:{}:{}'
+TOTALS = ('orders', 'quantity', 'revenue')
+
+
+# Adds one batch of order ids to an aggregate table in a single statement.
+# ON CONFLICT ... DO UPDATE is supported by SQLite and PostgreSQL alike.
+FOLD_SQL = """
+    INSERT INTO {table} (day, {key}, {extra_columns}orders, quantity, revenue)
+    SELECT o.date, {key_source}, {extra_sources}COUNT(DISTINCT i.order_id), SUM(i.quantity), SUM(i.price * i.quantity)
+    FROM {order_item} i
+    JOIN {order} o ON o.id = i.order_id
+    JOIN {product} p ON p.id = i.product_id
+    WHERE i.order_id BETWEEN %s AND %s
+    GROUP BY o.date, {key_source}{extra_group}
+    ON CONFLICT (day, {key}) DO UPDATE SET
+        orders = {table}.orders + excluded.orders,
+        quantity = {table}.quantity + excluded.quantity,
+        revenue = {table}.revenue + excluded.revenue
+"""
+
+
+def _fold_sql(model, key, key_source, extra=None):
+    quote = connection.ops.quote_name
+    return FOLD_SQL.format(
+        table=quote(model._meta.db_table),
+        key=key,
+        key_source=key_source,
+        extra_columns=f'{extra[0]}, ' if extra else '',
+        extra_sources=f'{extra[1]}, ' if extra else '',
+        extra_group=f', {extra[1]}' if extra else '',
+        order_item=quote(OrderItem._meta.db_table),
+        order=quote(Order._meta.db_table),
+        product=quote(Product._meta.db_table),
+    )
+
+
+def _fold(first_id, last_id):
+    """
+    Adds the orders with ids in [first_id, last_id] to the daily tables.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(_fold_sql(DailyProductSales, 'product_id', 'i.product_id', ('category_id', 'p.category_id')),
+                       [first_id, last_id])
+        cursor.execute(_fold_sql(DailyCategorySales, 'category_id', 'p.category_id'), [first_id, last_id])
+
+
+def rollup_reports(batch_size=None, settle=None):
+    """
+    Adds orders placed since the watermark to the daily tables, one batch of
+    order ids per transaction, and moves the watermark with each batch.
+    Returns the number of order ids covered.
+
+    Other databases may commit orders out of id order, so a run there
+    stops at the highest id the previous run saw. A checkout that was still
+    open then has had a whole interval to commit. SQLite serializes writers,
+    so it can read up to the newest order at once.
+    """
+    batch_size = batch_size or getattr(settings, 'SALES_REPORT_BATCH_SIZE', 5000)
+    if settle is None:
+        settle = connection.vendor != 'sqlite'
+    ReportWatermark.objects.get_or_create(name=WATERMARK)
+    newest = Order.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+    covered = 0
+    with transaction.atomic():
+        # Concurrent runs queue here instead of folding the same orders twice.
+        watermark = ReportWatermark.objects.select_for_update().get(name=WATERMARK)
+        target = watermark.horizon_order_id if settle else newest
+        watermark.horizon_order_id = max(watermark.horizon_order_id, newest)
+        watermark.save(update_fields=['horizon_order_id'])
+    while True:
+        with transaction.atomic():
+            watermark = ReportWatermark.objects.select_for_update().get(name=WATERMARK)
+            if watermark.last_order_id >= target:
+                break
+            last_id = min(watermark.last_order_id + batch_size, target)
+            _fold(watermark.last_order_id + 1, last_id)
+            covered += last_id - watermark.last_order_id
+            watermark.last_order_id = last_id
+            watermark.save(update_fields=['last_order_id'])
+    return covered
+
+
+def report_version():
+    """
+    The watermark, which every cached report is keyed on.
+    """
+    return ReportWatermark.objects.filter(name=WATERMARK).values_list('last_order_id', flat=True).first() or 0
+
+
+def category_revenue(start, end):
+    """
+    Orders, units and revenue per category per day, oldest day first.
+    """
+    names = {category.id: category.name for category in category_registry.all()}
+    return [
+        {'day': row['day'].isoformat(), 'category_id': row['category_id'],
+         'category': names.get(row['category_id'], ''), **{name: row[name] for name in TOTALS}}
+        for row in DailyCategorySales.objects.filter(day__range=(start, end))
+        .order_by('day', 'category_id').values('day', 'category_id', *TOTALS)
+    ]
+
+
+def top_products(start, end, limit=10):
+    """
+    The products with the most revenue over the range, best first.
+    """
+    rows = list(
+        DailyProductSales.objects.filter(day__range=(start, end)).values('product_id')
+        .annotate(orders=Sum('orders'), quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .order_by('-revenue', 'product_id')[:limit]
+    )
+    titles = dict(Product.objects.filter(id__in=[row['product_id'] for row in rows]).values_list('id', 'title'))
+    return [{'product_id': row['product_id'], 'title': titles.get(row['product_id'], ''),
+             **{name: row[name] for name in TOTALS}} for row in rows]
+
+
+# name -> (function, default days, columns)
+REPORTS = {
+    'categories': (category_revenue, 30, ['day', 'category_id', 'category', *TOTALS]),
+    'top-products': (top_products, 7, ['product_id', 'title', *TOTALS]),
+}
+
+
+def default_range(report):
+    """
+    (start, end) covering the report's default number of days up to today.
+    """
+    end = timezone.localdate()
+    return end - timedelta(days=REPORTS[report][1] - 1), end
+
+
+def get_report(report, start, end):
+    """
+    A report's rows, from the cache while no rollup has run since they were built.
+    """
+    version = report_version()
+    key = REPORT_KEY.format(report, start.isoformat(), end.isoformat(), version)
+    rows = cache.get(key)
+    if rows is None:
+        rows = REPORTS[report][0](start, end)
+        cache.set(key, rows, getattr(settings, 'SALES_REPORT_CACHE_TIMEOUT', 300))
+    return rows
+
+
+def to_csv(report, rows):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=REPORTS[report][2])
+    writer.writeheader()
+    writer.writerows(rows)
+    return out.getvalue()
@@ -0,0 +1,71 @@
+"""
+Sales counting that checkouts can write without contending on Product rows.
+
+With STORE_SALES_COUNTER = 'log' (the default) a checkout appends one
+SaleEvent per product it sold, and `rollup_sales()` (`python manage.py
+rollup_sales --loop`) periodically adds them to Product.amount_sold and
+deletes them. Until then the best-seller rail and sort lag behind by up to
+one rollup interval. 'row' updates amount_sold inside the checkout
+transaction instead, so checkouts for the same product queue on its row.
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from .models import Product, SaleEvent
+from .rails import invalidate_home_rails
+
+
+def counter_mode():
+    return getattr(settings, 'STORE_SALES_COUNTER', 'log')
+
+
+def record_sales(sold):
+    """
+    Records {product id: quantity} sold by one checkout, in one query.
+    Call inside the checkout's transaction.
+    """
+    if not sold:
+        return
+    if counter_mode() == 'row':
+        # F() keeps the increment in the database so concurrent checkouts don't lose updates.
+        Product.objects.bulk_update(
+            [Product(id=product_id, amount_sold=F('amount_sold') + quantity) for product_id, quantity in sold.items()],
+            ['amount_sold'],
+        )
+        # bulk_update skips signals, so drop the best-seller rail once the order commits.
+        transaction.on_commit(invalidate_home_rails)
+    else:
+        SaleEvent.objects.bulk_create([SaleEvent(product_id=product_id, quantity=quantity)
+                                       for product_id, quantity in sold.items()])
+
+
+def rollup_sales(batch_size=None):
+    """
+    Adds logged sales to Product.amount_sold and deletes them, one batch per
+    transaction. Exactly the events that were summed are deleted, so sales
+    committed meanwhile wait for the next batch, and rollups running at the
+    same time skip each other's locked rows where the database supports it.
+    Returns the number of events folded in.
+    """
+    batch_size = batch_size or getattr(settings, 'SALES_ROLLUP_BATCH_SIZE', 500)
+    total = 0
+    while True:
+        with transaction.atomic():
+            events = list(
+                SaleEvent.objects.select_for_update(skip_locked=True)
+                .order_by('id').values_list('id', 'product_id', 'quantity')[:batch_size]
+            )
+            if not events:
+                break
+            sold = defaultdict(int)
+            for _, product_id, quantity in events:
+                sold[product_id] += quantity
+            Product.objects.bulk_update(
+                [Product(id=product_id, amount_sold=F('amount_sold') + quantity) for product_id, quantity in sold.items()],
+                ['amount_sold'],
+            )
+            SaleEvent.objects.filter(id__in=[event_id for event_id, _, _ in events]).delete()
+            transaction.on_commit(invalidate_home_rails)
+        total += len(events)
+    return total
@@ -0,0 +1,218 @@
+"""
+Product search backends.
+
+`get_search_backend()` picks the engine for the default database: SQLite FTS5,
+Postgres full-text search, or a LIKE fallback for anything else. Set
+STORE_SEARCH_BACKEND to a dotted class path to choose one explicitly.
+"""
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+from .models import Product
+
+FTS_TABLE = 'store_product_fts'
+
+# SQLite keeps the FTS table in step with store_product through these triggers,
+# so bulk_create/bulk_update and raw SQL are indexed too. Category renames are
+# copied across by store.signals (sync_sqlite_category): a trigger on
+# store_category that reads store_product would stop SQLite from rebuilding
+# store_product in ordinary migrations.
+SQLITE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS store_product_fts_ai AFTER INSERT ON store_product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, category, description, material)
+        VALUES (new.id, new.title, (SELECT name FROM store_category WHERE id = new.category_id),
+                coalesce(new.description, ''), new.material);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS store_product_fts_ad AFTER DELETE ON store_product BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS store_product_fts_au
+    AFTER UPDATE OF title, description, material, category_id ON store_product BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE}(rowid, title, category, description, material)
+        VALUES (new.id, new.title, (SELECT name FROM store_category WHERE id = new.category_id),
+                coalesce(new.description, ''), new.material);
+    END
+    """,
+]
+
+# Must match the expression of the store_product_search_idx GIN index exactly.
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('english', coalesce({p}title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce({p}description, '') || ' ' || coalesce({p}material, '')), 'C')"
+)
+
+
+def install_sqlite_search(cursor):
+    """
+    Creates the FTS5 table and its sync triggers if they are missing.
+    Safe to call repeatedly; table rebuilds during migrations drop the triggers.
+    """
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "title, category, description, material, tokenize='unicode61 remove_diacritics 2')"
+    )
+    for trigger in SQLITE_TRIGGERS:
+        cursor.execute(trigger)
+
+
+def drop_sqlite_search_triggers(cursor):
+    for name in ['store_product_fts_ai', 'store_product_fts_ad', 'store_product_fts_au']:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def uninstall_sqlite_search(cursor):
+    drop_sqlite_search_triggers(cursor)
+    cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def sync_sqlite_category(cursor, category_id, name):
+    """
+    Sets the category column of the category's indexed products to `name`.
+    """
+    cursor.execute(
+        f"UPDATE {FTS_TABLE} SET category = %s "
+        "WHERE rowid IN (SELECT id FROM store_product WHERE category_id = %s)",
+        [name, category_id],
+    )
+
+
+def rebuild_sqlite_search(cursor):
+    """
+    Re-indexes every product from scratch.
+    """
+    cursor.execute(f"DELETE FROM {FTS_TABLE}")
+    cursor.execute(
+        f"INSERT INTO {FTS_TABLE}(rowid, title, category, description, material) "
+        "SELECT p.id, p.title, c.name, coalesce(p.description, ''), p.material "
+        "FROM store_product p LEFT JOIN store_category c ON c.id = p.category_id"
+    )
+
+
+@dataclass
+class SearchPage:
+    """
+    One page of ranked search results, as product value dicts.
+    """
+    query: str
+    number: int
+    per_page: int
+    results: list = field(default_factory=list)
+    has_next: bool = False
+
+    @property
+    def has_previous(self):
+        return self.number > 1
+
+    @property
+    def next_page_number(self):
+        return self.number + 1
+
+    @property
+    def previous_page_number(self):
+        return self.number - 1
+
+
+class SearchBackend:
+    """
+    Base class for search engines. Subclasses implement ranked_ids().
+    """
+
+    def ranked_ids(self, query, offset, limit):
+        """
+        Returns up to `limit` product ids matching `query`, best match first.
+        """
+        raise NotImplementedError
+
+    def search(self, query, page=1, per_page=24):
+        page = max(1, page)
+        ids = self.ranked_ids(query, (page - 1) * per_page, per_page + 1)
+        has_next = len(ids) > per_page
+        ids = ids[:per_page]
+        products = {product['id']: product for product in Product.objects.filter(id__in=ids).values()}
+        results = [products[product_id] for product_id in ids if product_id in products]
+        return SearchPage(query=query, number=page, per_page=per_page, results=results, has_next=has_next)
+
+
+class LikeSearchBackend(SearchBackend):
+    """
+    Portable fallback using case-insensitive LIKE matching. Scans the table.
+    """
+
+    def ranked_ids(self, query, offset, limit):
+        products = Product.objects.filter(
+            Q(title__icontains=query) | Q(category__name__icontains=query)
+            | Q(description__icontains=query) | Q(material__icontains=query)
+        ).order_by('id').values_list('id', flat=True)
+        return list(products[offset:offset + limit])
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """
+    SQLite FTS5 search ranked by bm25, title matches weighted highest.
+    """
+
+    @staticmethod
+    def match_expression(query):
+        # Quote every word so user input can't inject FTS5 syntax; prefix-match the last one.
+        words = re.findall(r'\w+', query)
+        if not words:
+            return None
+        terms = [f'"{word}"' for word in words]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def ranked_ids(self, query, offset, limit):
+        match = self.match_expression(query)
+        if match is None:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY bm25({FTS_TABLE}, 10.0, 5.0, 1.0, 1.0), rowid LIMIT %s OFFSET %s",
+                [match, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Postgres full-text search over the store_product_search_idx GIN index.
+    Category names are matched separately against the small category table.
+    """
+
+    def ranked_ids(self, query, offset, limit):
+        vector = POSTGRES_VECTOR.format(p='p.')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT p.id FROM store_product p, websearch_to_tsquery('english', %s) q "
+                f"WHERE ({vector}) @@ q "
+                f"OR p.category_id IN (SELECT id FROM store_category WHERE to_tsvector('english', name) @@ q) "
+                f"ORDER BY ts_rank({vector}, q) DESC, p.id LIMIT %s OFFSET %s",
+                [query, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+@lru_cache(maxsize=None)
+def _load_backend(path, vendor):
+    if path:
+        return import_string(path)()
+    if vendor == 'sqlite':
+        return SQLiteSearchBackend()
+    if vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return LikeSearchBackend()
+
+
+def get_search_backend():
+    return _load_backend(getattr(settings, 'STORE_SEARCH_BACKEND', None), connection.vendor)
@@ -0,0 +1,69 @@
+import threading
+from django.contrib.sessions.middleware import SessionMiddleware
+
+
+class SessionWriteStats:
+    """
+    Process-wide count of requests and session writes, thread safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.writes = 0
+
+    def record(self, writes):
+        with self._lock:
+            self.requests += 1
+            self.writes += writes
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'writes': self.writes,
+                'writes_per_request': self.writes / self.requests if self.requests else 0.0,
+            }
+
+
+session_write_stats = SessionWriteStats()
+
+
+class CountingSessionMiddleware(SessionMiddleware):
+    """
+    SessionMiddleware that counts how often the session store is written.
+
+    The count for each response is sent in the X-Session-Writes header and
+    added to `session_write_stats`, whichever session engine is configured.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.session_writes = 0
+        save = request.session.save
+        saving = False
+
+        def counting_save(*args, **kwargs):
+            # Creating a new session calls save() again from create(); count it once.
+            nonlocal saving
+            if saving:
+                return save(*args, **kwargs)
+            saving = True
+            request.session_writes += 1
+            try:
+                return save(*args, **kwargs)
+            finally:
+                saving = False
+
+        request.session.save = counting_save
+
+    def process_response(self, request, response):
+        response = super().process_response(request, response)
+        writes = getattr(request, 'session_writes', 0)
+        session_write_stats.record(writes)
+        response.headers['X-Session-Writes'] = str(writes)
+        return response
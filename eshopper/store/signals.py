@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from .catalog import category_registry
+from .fragments import bump_category_version, bump_product_version
+from .images import queue_derivatives
+from .instrumentation import _count_query
+from .models import Category, Product
+from .rails import image_basename, invalidate_home_rails
+from .search import FTS_TABLE, install_sqlite_search, sync_sqlite_category
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    """
+    Keeps the cached home page rails and product card fragments in step with the product table.
+    """
+    invalidate_home_rails()
+    bump_product_version()
+
+
+@receiver(post_save, sender=Product)
+def product_image_saved(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Queues resized variants of a product's image once a save that changed the
+    image commits. Saves that leave the image alone (price edits, checkout,
+    imports) do no image work, and the resizing runs on a background thread.
+    """
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    # Not loaded (deferred) and not assigned, so this save didn't change it.
+    if 'image' not in instance.__dict__:
+        return
+    name = image_basename(instance.image)
+    previous = getattr(instance, '_loaded_image', None)
+    instance._loaded_image = str(instance.image)
+    if not name or (not created and previous is not None and image_basename(previous) == name):
+        return
+    if getattr(settings, 'PRODUCT_THUMBNAILS_ON_SAVE', True):
+        transaction.on_commit(lambda: queue_derivatives(name))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    """
+    Reloads the category registry everywhere. Done again once the change
+    commits, in case another process reloaded it from the old rows meanwhile.
+    """
+    category_registry.invalidate()
+    transaction.on_commit(category_registry.invalidate)
+    bump_category_version()
+
+
+@receiver(post_save, sender=Category)
+def category_search_sync(sender, instance, created, using, update_fields=None, **kwargs):
+    """
+    Copies a category's name into its products' SQLite search rows, which the
+    store_product triggers only refresh when the product itself changes.
+    """
+    if created or (update_fields is not None and 'name' not in update_fields):
+        return
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            sync_sqlite_category(cursor, instance.id, instance.name)
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using='default', **kwargs):
+    """
+    SQLite rebuilds store_product on some schema changes, which drops the FTS
+    sync triggers; put them back after every migrate.
+    """
+    if sender.name != 'store':
+        return
+    connection = connections[using]
+    if connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+        with connection.cursor() as cursor:
+            install_sqlite_search(cursor)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Applies SQLITE_PRAGMAS to every new SQLite connection, except journal_mode
+    on SQLITE_TRACKED_DATABASE.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = dict(getattr(settings, 'SQLITE_PRAGMAS', {}))
+    tracked = getattr(settings, 'SQLITE_TRACKED_DATABASE', None)
+    if tracked and str(connection.settings_dict['NAME']) == str(tracked):
+        pragmas.pop('journal_mode', None)
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def count_queries(sender, connection, **kwargs):
+    """
+    Lets PerformanceMiddleware count this connection's queries, whichever
+    thread runs them. Put first, so execute_wrapper() blocks still pop their own.
+    """
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _count_query)
@@ -0,0 +1,52 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class StoreStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    WhiteNoise's hashed, precompressed storage, tolerant of files that are
+    missing from the manifest.
+
+    Product images are uploaded into store/static at runtime and only get a
+    hashed copy on the next collectstatic, so until then {% static %} falls
+    back to the plain file name instead of raising.
+    """
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+
+class StoreWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware that also runs natively under ASGI.
+
+    WhiteNoise's middleware is sync only, so under ASGI Django would run
+    everything below it, async views included, in a thread. This one awaits
+    the rest of the stack directly and only serves static files from a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
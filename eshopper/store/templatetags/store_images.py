@@ -0,0 +1,39 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from ..images import srcsets
+
+register = template.Library()
+
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+# Cards are a quarter of the row on large screens, half on tablets, full width on phones.
+CARD_SIZES = '(min-width: 992px) 25vw, (min-width: 768px) 50vw, 100vw'
+
+
+def _srcset(variants):
+    return ', '.join(f'{static(path)} {width}w' for path, width in variants)
+
+
+@register.simple_tag
+def product_image(name, alt='', css_class='', sizes=CARD_SIZES, default_width=640):
+    """
+    Renders a product image as a <picture> with AVIF/WebP/JPEG srcsets, or a
+    plain <img> of the original upload if no variants have been generated.
+    """
+    entry, sets = srcsets(name)
+    if entry is None:
+        return format_html('<img src="{}" class="{}" alt="{}">', static(name), css_class, alt)
+
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((MIME_TYPES[fmt], _srcset(variants), sizes) for fmt, variants in sets.items() if fmt != 'jpeg'),
+    )
+    jpeg = sets['jpeg']
+    fallback = min(jpeg, key=lambda variant: abs(variant[1] - default_width))
+    height = round(entry['height'] * fallback[1] / entry['width'])
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" class="{}" alt="{}" '
+        'loading="lazy" decoding="async"></picture>',
+        sources, static(fallback[0]), _srcset(jpeg), sizes, fallback[1], height, css_class, alt,
+    )
@@ -1,3 +1,1312 @@
-from django.test import TestCase
+import csv
+import json
+import tempfile
+import threading
+import time
+from io import StringIO
+from pathlib import Path
+from smtplib import SMTPException
+from unittest import mock
+from asgiref.sync import sync_to_async
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache, caches
+from django.template import Context, Template
+from django.templatetags.static import static
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections
+from django.db.models import Count
+from django.test import AsyncClient, Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from whitenoise.middleware import WhiteNoiseFileResponse
+from . import async_views
+from .benchmarks import traffic
+from .benchmarks.asgi import URLConf
+from .benchmarks.seed import seed_store
+from .models import (Category, Customer, DailyCategorySales, DailyProductSales, Product, Order, OrderItem,
+                     OutboundEmail, SaleEvent)
+from .instrumentation import histogram, load_slot_maps, merge_slots
+from .images import find_source, generate_derivatives, load_manifest, queue_derivatives
+from .catalog_io import ImageIngester, export_rows, import_catalog, read_rows, write_rows
+from .checkout import place_order
+from .exports import stream_order_lines
+from . import outbox
+from .outbox import queue_email, send_pending
+from .reports import rollup_reports
+from .sales import rollup_sales
+from .search import LikeSearchBackend, SQLiteSearchBackend
+from .sessions import session_write_stats
 
-# Create your tests here.
+
+def clear_caches():
+    """
+    Clears the default and template fragment caches; test databases reuse ids,
+    and bulk inserts don't bump the fragment versions.
+    """
+    cache.clear()
+    caches['fragments'].clear()
+
+
+def create_products(count, category=None, **kwargs):
+    """
+    Creates `count` products in a single category for tests.
+    """
+    if category is None:
+        category = Category.objects.create(name='Dress')
+    products = [
+        Product(title=f'Product {i}', material='Linen', price=10 + i, category=category,
+                image=f'store/static/{i}.png', **kwargs)
+        for i in range(count)
+    ]
+    return Product.objects.bulk_create(products)
+
+
+def cart_for(products, quantity=1):
+    """
+    Builds a session cart holding each product with the given quantity.
+    """
+    return {
+        'Cart_ID': '1',
+        'Quantity': quantity * len(products),
+        'Lines': {str(product.id): quantity for product in products},
+    }
+
+
+class CheckoutTests(TestCase):
+
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name='Jane', last_name='Doe', phone='07000000000',
+                                                email='jane@example.com', password='x')
+
+    def checkout(self, products, quantity=1):
+        session = self.client.session
+        session['Customer'] = {'First_Name': 'Jane', 'ID': self.customer.id,
+                               'Address': '1 High St', 'Phone': '07000000000'}
+        session['Cart'] = cart_for(products, quantity)
+        session.save()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('order'))
+        self.assertRedirects(response, reverse('ordered'), fetch_redirect_response=False)
+        return len(ctx.captured_queries)
+
+    def test_checkout_writes_items_and_amount_sold(self):
+        products = create_products(3)
+        self.checkout(products, quantity=2)
+
+        order = Order.objects.get(customer=self.customer)
+        self.assertEqual(OrderItem.objects.filter(order=order).count(), 3)
+        self.assertEqual(SaleEvent.objects.count(), 3)
+        self.assertEqual(rollup_sales(), 3)
+        for product in Product.objects.all():
+            self.assertEqual(product.amount_sold, 2)
+
+    def test_checkout_query_count_is_constant(self):
+        products = create_products(100)
+        small = self.checkout(products[:1])
+        large = self.checkout(products)
+        self.assertEqual(small, large)
+        rollup_sales()
+        self.assertEqual(Product.objects.get(id=products[0].id).amount_sold, 2)
+
+    def test_returning_guest_reuses_customer(self):
+        products = create_products(1)
+        guest = {'first_name': 'Sam', 'last_name': 'Smith', 'address': '2 Low St',
+                 'email': 'sam@example.com', 'phone': '07111111111', 'password': 'secret'}
+        for _ in range(2):
+            session = self.client.session
+            session['Customer'] = {'First_Name': 'Guest'}
+            session['Cart'] = cart_for(products)
+            session.save()
+            self.client.post(reverse('order'), guest)
+
+        customer = Customer.objects.get(email='sam@example.com')
+        self.assertEqual(Order.objects.filter(customer=customer).count(), 2)
+
+
+    def test_guest_email_of_an_account_needs_its_password(self):
+        products = create_products(1)
+        self.customer.password = make_password('secret')
+        self.customer.save()
+        guest = {'first_name': 'Mallory', 'last_name': 'Smith', 'address': '2 Low St',
+                 'email': 'jane@example.com', 'phone': '07111111111', 'password': 'guess'}
+        session = self.client.session
+        session['Customer'] = {'First_Name': 'Guest'}
+        session['Cart'] = cart_for(products)
+        session.save()
+
+        response = self.client.post(reverse('order'), guest)
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.client.session['Cart'], cart_for(products))
+
+
+class FailingEmailBackend(BaseEmailBackend):
+
+    def send_messages(self, email_messages):
+        raise SMTPException('connection refused')
+
+
+class OutboxTests(TestCase):
+
+    def test_checkout_queues_email_instead_of_sending(self):
+        customer = Customer.objects.create(first_name='Jane', last_name='Doe', phone='07000000000',
+                                           email='jane@example.com', password='x')
+        session = self.client.session
+        session['Customer'] = {'First_Name': 'Jane', 'ID': customer.id}
+        session['Cart'] = cart_for(create_products(2))
+        session.save()
+
+        self.client.post(reverse('order'))
+
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.to, ['jane@example.com'])
+        self.assertEqual(email.status, OutboundEmail.PENDING)
+
+    def test_command_drains_outbox(self):
+        for i in range(5):
+            queue_email('Order Confirmation', 'Thanks', 'Eshopper@example.com', [f'c{i}@example.com'],
+                        html_message='<p>Thanks</p>')
+
+        call_command('send_queued_emails', batch_size=2, workers=2, stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.SENT).exists())
+
+    def test_overlapping_senders_send_each_email_once(self):
+        for i in range(3):
+            queue_email('Order Confirmation', 'Thanks', 'Eshopper@example.com', [f'c{i}@example.com'])
+        claim = outbox._claim
+        overlapped = []
+
+        def claim_then_overlap(batch_size, now):
+            emails = claim(batch_size, now)
+            # A second sender polls while the first one's batch is still in flight.
+            if not overlapped:
+                overlapped.append(None)
+                overlapped[0] = send_pending(batch_size=2)
+            return emails
+
+        with mock.patch('store.outbox._claim', claim_then_overlap):
+            first = send_pending(batch_size=2)
+
+        self.assertEqual((first, overlapped), ((2, 0), [(1, 0)]))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         ['c0@example.com', 'c1@example.com', 'c2@example.com'])
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.SENT).exists())
+
+    @override_settings(EMAIL_BACKEND='store.tests.FailingEmailBackend', EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_back_off_then_give_up(self):
+        email = queue_email('Order Confirmation', 'Thanks', 'Eshopper@example.com', ['c@example.com'])
+
+        self.assertEqual(send_pending(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, email.created_at)
+        # Not due yet, so nothing is retried.
+        self.assertEqual(send_pending(), (0, 0))
+
+        OutboundEmail.objects.update(next_attempt_at=email.created_at)
+        send_pending()
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.FAILED)
+        self.assertIn('connection refused', email.last_error)
+
+
+class HomeRailsTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.products = create_products(10)
+
+    def product_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        return [q['sql'] for q in ctx.captured_queries if 'store_product' in q['sql']], response
+
+    def test_warm_home_page_runs_no_product_queries(self):
+        cold, _ = self.product_queries()
+        warm, response = self.product_queries()
+        self.assertEqual(len(cold), 2)
+        self.assertEqual(warm, [])
+        self.assertEqual(len(response.context['Most_Sold_Products']), 8)
+        self.assertEqual(response.context['Hot_Products'][0]['image_path']['path'], '0.png')
+
+    def test_price_change_invalidates_rails(self):
+        self.product_queries()
+        product = self.products[5]
+        product.price = 1
+        product.save()
+
+        queries, response = self.product_queries()
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(response.context['Hot_Products'][0]['product']['id'], product.id)
+
+    def test_sales_rollup_invalidates_best_sellers(self):
+        self.product_queries()
+        customer = Customer.objects.create(first_name='Jane', last_name='Doe', phone='07000000000',
+                                           email='jane@example.com', password='x')
+        session = self.client.session
+        session['Customer'] = {'First_Name': 'Jane', 'ID': customer.id}
+        session['Cart'] = cart_for(self.products[9:], quantity=3)
+        session.save()
+        self.client.post(reverse('order'))
+        with self.captureOnCommitCallbacks(execute=True):
+            rollup_sales()
+
+        _, response = self.product_queries()
+        self.assertEqual(response.context['Most_Sold_Products'][0]['product']['id'], self.products[9].id)
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        dresses = Category.objects.create(name='Dress')
+        jeans = Category.objects.create(name='Jeans')
+        Product.objects.bulk_create([
+            Product(title='Linen Midi Dress', material='Linen', description='Summer dress',
+                    category=dresses, image='store/static/1.png'),
+            Product(title='Slim Jeans', material='Denim', description='Dark wash with linen pocket lining',
+                    category=jeans, image='store/static/2.png'),
+            Product(title='Wide Leg', material='Denim', description='Relaxed fit', category=jeans,
+                    image='store/static/3.png'),
+        ])
+
+    def titles(self, backend, query, **kwargs):
+        return [product['title'] for product in backend.search(query, **kwargs).results]
+
+    def test_fts_ranks_title_matches_first(self):
+        self.assertEqual(self.titles(SQLiteSearchBackend(), 'linen'), ['Linen Midi Dress', 'Slim Jeans'])
+
+    def test_fts_covers_category_material_and_prefixes(self):
+        backend = SQLiteSearchBackend()
+        self.assertEqual(set(self.titles(backend, 'jeans')), {'Slim Jeans', 'Wide Leg'})
+        self.assertEqual(set(self.titles(backend, 'den')), {'Slim Jeans', 'Wide Leg'})
+        self.assertEqual(self.titles(backend, '"relaxed" (fit'), ['Wide Leg'])
+
+    def test_fts_stays_in_sync(self):
+        backend = SQLiteSearchBackend()
+        product = Product.objects.get(title='Wide Leg')
+        product.title = 'Bootcut'
+        product.save()
+        category = Category.objects.get(name='Jeans')
+        category.name = 'Trousers'
+        category.save()
+        Product.objects.filter(title='Slim Jeans').delete()
+
+        self.assertEqual(self.titles(backend, 'bootcut'), ['Bootcut'])
+        self.assertEqual(self.titles(backend, 'trousers'), ['Bootcut'])
+        self.assertEqual(self.titles(backend, 'slim'), [])
+
+    def test_pagination(self):
+        for backend in [SQLiteSearchBackend(), LikeSearchBackend()]:
+            first = backend.search('denim', per_page=1)
+            second = backend.search('denim', page=2, per_page=1)
+            self.assertTrue(first.has_next)
+            self.assertFalse(second.has_next)
+            self.assertNotEqual(first.results, second.results)
+
+    def test_search_view(self):
+        response = self.client.get(reverse('q'), {'search': 'dress'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['Products'][0]['image_path']['path'], '1.png')
+
+
+class CollectionsTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.category = Category.objects.create(name='Jeans')
+        self.products = create_products(30, category=self.category)
+        # Repeat prices and sales so the id tie-breaker matters.
+        for i, product in enumerate(self.products):
+            product.price = i % 4
+            product.amount_sold = i % 3
+        Product.objects.bulk_update(self.products, ['price', 'amount_sold'])
+        create_products(5)
+
+    def walk(self, sort):
+        url = reverse('collections', args=['jeans'])
+        response = self.client.get(url, {'sort': sort})
+        pages = [response.context['Products']]
+        while response.context['Next_Cursor']:
+            response = self.client.get(url, {'sort': sort, 'cursor': response.context['Next_Cursor']})
+            pages.append(response.context['Products'])
+        return pages, [x['product'] for page in pages for x in page]
+
+    def test_keyset_pages_cover_category_in_order(self):
+        for sort, key in [('default', lambda p: p['id']),
+                          ('price', lambda p: (p['price'], p['id'])),
+                          ('best-selling', lambda p: (-p['amount_sold'], p['id']))]:
+            pages, products = self.walk(sort)
+            self.assertEqual([len(page) for page in pages], [24, 6])
+            self.assertEqual(products, sorted(products, key=key))
+            self.assertEqual({p['id'] for p in products}, {p.id for p in self.products})
+
+    def test_category_slug_is_resolved_in_memory(self):
+        url = reverse('collections', args=['jeans'])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url, {'sort': 'price'})
+        self.assertFalse([q for q in ctx.captured_queries if 'store_category' in q['sql']])
+
+    def test_renamed_category_is_invalidated(self):
+        self.client.get(reverse('collections', args=['jeans']))
+        self.category.name = 'Denim'
+        self.category.save()
+
+        self.assertEqual(self.client.get(reverse('collections', args=['jeans'])).context['Products'], [])
+        self.assertEqual(len(self.client.get(reverse('collections', args=['denim'])).context['Products']), 24)
+
+    def test_category_name_redirects_to_slug(self):
+        response = self.client.get('/collections/Jeans/', {'sort': 'price'})
+        self.assertRedirects(response, reverse('collections', args=['jeans']) + '?sort=price',
+                             status_code=301, fetch_redirect_response=False)
+        self.assertEqual(self.client.get(reverse('collections', args=['coats'])).context['Products'], [])
+
+    def test_bad_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('collections', args=['jeans']), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.context['Products'][0]['product']['id'], self.products[0].id)
+
+
+class SessionWriteTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.product = create_products(1)[0]
+
+    def writes(self, response):
+        return int(response.headers['X-Session-Writes'])
+
+    def test_only_changed_sessions_are_written(self):
+        session_write_stats.reset()
+        self.assertEqual(self.writes(self.client.get(reverse('home'))), 1)
+        self.assertEqual(self.writes(self.client.get(reverse('home'))), 0)
+        self.assertEqual(self.writes(self.client.get(reverse('product', args=[self.product.id]))), 0)
+        self.assertEqual(self.writes(self.client.get(reverse('cart'))), 0)
+
+        add = reverse('add_to_cart', args=[self.product.id])
+        self.assertEqual(self.writes(self.client.post(add)), 1)
+        self.assertEqual(self.client.session['Cart']['Quantity'], 1)
+
+        self.assertEqual(session_write_stats.snapshot()['requests'], 5)
+        self.assertEqual(session_write_stats.snapshot()['writes'], 2)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions(self):
+        self.client.get(reverse('home'))
+        add = reverse('add_to_cart', args=[self.product.id])
+        self.client.post(add)
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.context['Cart']['Quantity'], 1)
+        self.assertEqual(self.writes(response), 0)
+
+
+class CartTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.products = create_products(3)
+
+    def test_add_and_remove_by_product_id(self):
+        add = reverse('add_to_cart', args=[self.products[0].id])
+        response = self.client.post(f"{add}?next={reverse('cart')}")
+        self.assertRedirects(response, reverse('cart'), fetch_redirect_response=False)
+        self.client.post(add)
+        self.client.post(reverse('add_to_cart', args=[self.products[1].id]))
+        self.client.post(reverse('remove_from_cart', args=[self.products[1].id]))
+
+        self.assertEqual(self.client.session['Cart']['Lines'], {str(self.products[0].id): 2})
+        self.assertEqual(self.client.session['Cart']['Quantity'], 2)
+
+    def test_unknown_product_and_offsite_next_are_ignored(self):
+        response = self.client.post(reverse('add_to_cart', args=[999]) + '?next=https://evil.example.com/')
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        self.assertNotIn('Cart', self.client.session)
+
+    def test_cart_page_prices_from_database_in_one_query(self):
+        session = self.client.session
+        session['Cart'] = cart_for(self.products, quantity=2)
+        session.save()
+        Product.objects.filter(id=self.products[0].id).update(price=100)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('cart'))
+        self.assertEqual(len([q for q in ctx.captured_queries if 'store_product' in q['sql']]), 1)
+        cart = response.context['Cart']
+        self.assertEqual(cart['Cart_Total'], 2 * (100 + 11 + 12))
+        self.assertEqual(cart['Products'][0]['Image'], '0.png')
+
+    def test_checkout_uses_database_prices(self):
+        customer = Customer.objects.create(first_name='Jane', last_name='Doe', phone='07000000000',
+                                           email='jane@example.com', password='x')
+        session = self.client.session
+        session['Customer'] = {'First_Name': 'Jane', 'ID': customer.id}
+        session['Cart'] = cart_for(self.products[:1], quantity=3)
+        session.save()
+        self.client.post(reverse('order'))
+
+        item = OrderItem.objects.get()
+        self.assertEqual((item.price, item.quantity), (self.products[0].price, 3))
+        self.assertNotIn('Cart', self.client.session)
+
+
+class CartApiTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.products = create_products(2)
+
+    def test_add_remove_set_and_summary(self):
+        first, second = self.products
+        self.client.post(reverse('cart_api_add', args=[first.id]))
+        data = self.client.post(reverse('cart_api_add', args=[second.id]), {'quantity': 3}).json()
+        self.assertEqual(data['quantity'], 4)
+        self.assertEqual(data['total'], first.price + 3 * second.price)
+
+        data = self.client.post(reverse('cart_api_remove', args=[second.id])).json()
+        self.assertEqual(data['quantity'], 3)
+        data = self.client.post(reverse('cart_api_set', args=[first.id]), {'quantity': 0}).json()
+        self.assertEqual([line['product_id'] for line in data['lines']], [second.id])
+
+        summary = self.client.get(reverse('cart_api_summary')).json()
+        self.assertEqual(summary, data)
+        self.assertEqual(summary['lines'][0]['total'], 2 * second.price)
+
+    def test_bad_requests(self):
+        product = self.products[0]
+        self.assertEqual(self.client.post(reverse('cart_api_add', args=[999])).status_code, 404)
+        self.assertEqual(self.client.post(reverse('cart_api_set', args=[product.id])).status_code, 400)
+        self.assertEqual(self.client.post(reverse('cart_api_add', args=[product.id]),
+                                          {'quantity': -1}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('cart_api_add', args=[product.id])).status_code, 405)
+        self.assertEqual(self.client.get(reverse('add_to_cart', args=[product.id])).status_code, 405)
+
+    def test_state_changes_require_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        self.assertEqual(client.post(reverse('cart_api_add', args=[self.products[0].id])).status_code, 403)
+        self.assertEqual(client.post(reverse('add_to_cart', args=[self.products[0].id])).status_code, 403)
+
+        client.get(reverse('home'))
+        token = client.cookies['csrftoken'].value
+        response = client.post(reverse('cart_api_add', args=[self.products[0].id]), HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.json()['quantity'], 1)
+
+
+class OrderHistoryTests(TestCase):
+
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name='Jane', last_name='Doe', phone='07000000000',
+                                                email='jane@example.com', password='x')
+        self.products = create_products(20)
+        session = self.client.session
+        session['Customer'] = {'First_Name': 'Jane', 'ID': self.customer.id}
+        session.save()
+        # Render the cached category menu once so it isn't counted below.
+        clear_caches()
+        self.client.get(reverse('orders'))
+
+    def create_order(self, lines):
+        order = Order.objects.create(customer=self.customer)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=2, price=product.price)
+            for product in self.products[:lines]
+        ])
+        return order
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_order_detail_query_count_is_constant(self):
+        small, _ = self.queries(reverse('orders_details', args=[self.create_order(1).id]))
+        large, response = self.queries(reverse('orders_details', args=[self.create_order(20).id]))
+        self.assertEqual(small, large)
+        self.assertEqual(response.context['Sum'], sum(2 * p.price for p in self.products))
+        self.assertContains(response, '2 x Product 19')
+
+    def test_order_history_query_count_is_constant_and_paginated(self):
+        self.create_order(3)
+        small, _ = self.queries(reverse('orders'))
+        for _ in range(30):
+            self.create_order(3)
+        large, response = self.queries(reverse('orders'))
+        self.assertEqual(small, large)
+
+        page = response.context['Orders']
+        self.assertEqual(len(page), 20)
+        self.assertEqual(page[0].item_count, 6)
+        self.assertEqual(page[0].total, 2 * sum(p.price for p in self.products[:3]))
+        self.assertEqual(len(self.client.get(reverse('orders'), {'page': 2}).context['Orders']), 11)
+
+    def test_other_customers_orders_are_hidden(self):
+        other = Customer.objects.create(first_name='Sam', last_name='Smith', phone='07000000000',
+                                        email='sam@example.com', password='x')
+        order = Order.objects.create(customer=other)
+        response = self.client.get(reverse('orders_details', args=[order.id]))
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        response = self.client.get(reverse('orders_details', args=['not-a-number']))
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+
+
+class ProductImageTests(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        overrides = override_settings(PRODUCT_THUMBNAIL_ROOT=Path(self.root.name))
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def render(self, name):
+        return Template('{% load store_images %}{% product_image name alt="Dress" %}').render(Context({'name': name}))
+
+    def test_variants_are_an_order_of_magnitude_smaller(self):
+        source = Path(find_source('1.png'))
+        entry = generate_derivatives(source)
+
+        self.assertEqual(entry['variants']['webp'], [320, 640, 960])
+        card = Path(self.root.name) / f"1-{entry['hash']}-640.webp"
+        self.assertLess(card.stat().st_size * 10, source.stat().st_size)
+        self.assertIs(generate_derivatives(source), load_manifest()['1.png'])
+
+    def test_only_saves_that_change_the_image_queue_variants(self):
+        with mock.patch('store.signals.queue_derivatives') as queue:
+            with self.captureOnCommitCallbacks(execute=True):
+                product = Product.objects.create(title='Dress', material='Linen', image='store/static/1.png',
+                                                 category=Category.objects.create(name='Dress'))
+            queue.assert_called_once_with('1.png')
+
+            product = Product.objects.get(pk=product.pk)
+            product.price = 99
+            with self.captureOnCommitCallbacks(execute=True):
+                product.save()
+            with self.captureOnCommitCallbacks(execute=True):
+                Product.objects.only('id', 'title').get(pk=product.pk).save()
+            self.assertEqual(queue.call_count, 1)
+
+            product.image = 'store/static/2.png'
+            with self.captureOnCommitCallbacks(execute=True):
+                product.save()
+            queue.assert_called_with('2.png')
+
+    def test_variants_are_generated_off_the_request_thread(self):
+        entry = queue_derivatives('1.png').result()
+        self.assertEqual(load_manifest()['1.png'], entry)
+        self.assertIsNone(queue_derivatives('missing.png'))
+
+    def test_tag_emits_srcset_or_falls_back(self):
+        self.assertHTMLEqual(self.render('1.png'), '<img src="/static/1.png" class="" alt="Dress">')
+
+        entry = generate_derivatives(find_source('1.png'))
+        html = self.render('1.png')
+        self.assertIn(f'<source type="image/webp" srcset="/static/thumbs/1-{entry["hash"]}-320.webp 320w', html)
+        self.assertIn(f'src="/static/thumbs/1-{entry["hash"]}-640.jpg"', html)
+        self.assertIn('loading="lazy"', html)
+
+
+class StaticFilesTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.TemporaryDirectory()
+        cls.overrides = override_settings(STATIC_ROOT=cls.root.name)
+        cls.overrides.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.overrides.disable()
+        cls.root.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        clear_caches()
+
+    def test_hashed_precompressed_immutable(self):
+        url = static('styles.css')
+        self.assertRegex(url, r'^/static/styles\.[0-9a-f]{12}\.css$')
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+
+    def test_uncollected_files_fall_back_to_plain_names(self):
+        self.assertEqual(static('uploaded-since-collectstatic.png'), '/static/uploaded-since-collectstatic.png')
+
+    def test_static_hits_skip_session_and_database(self):
+        url = static('styles.css')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertIsInstance(response, WhiteNoiseFileResponse)
+        self.assertNotIn('X-Session-Writes', response.headers)
+        self.assertNotIn('Set-Cookie', response.headers)
+
+
+class FragmentCacheTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.category = Category.objects.create(name='Jeans')
+        self.products = create_products(3, category=self.category)
+
+    def test_cards_and_menu_are_served_from_fragment_cache(self):
+        url = reverse('collections', args=['jeans'])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        # The menu comes from the fragment cache and the category from the in-memory registry.
+        self.assertFalse(any('"store_category"' in q['sql'] for q in ctx.captured_queries))
+        self.assertContains(response, 'Product 0')
+        self.assertContains(response, f'href="{reverse("collections", args=["jeans"])}"')
+
+    def test_product_save_busts_its_card(self):
+        url = reverse('collections', args=['jeans'])
+        self.assertContains(self.client.get(url), 'Product 0')
+        product = Product.objects.get(pk=self.products[0].pk)
+        product.title = 'Renamed Jeans'
+        product.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'Renamed Jeans')
+        self.assertNotContains(response, 'Product 0<')
+
+    def test_category_save_busts_menu(self):
+        self.client.get(reverse('home'))
+        Category.objects.create(name='Coats')
+        self.assertContains(self.client.get(reverse('home')), reverse('collections', args=['coats']))
+        self.category.name = 'Denim'
+        self.category.save()
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, reverse('collections', args=['denim']))
+        self.assertNotContains(response, reverse('collections', args=['jeans']))
+
+
+class ProductPageTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.product = create_products(1)[0]
+        self.url = reverse('product', args=[self.product.id])
+
+    def test_not_modified_without_rendering(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('Last-Modified'))
+        with self.assertTemplateNotUsed('product.html'), CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_body_is_shared_between_sessions_with_their_own_csrf_token(self):
+        first = self.client.get(self.url)
+        other = Client(enforce_csrf_checks=True)
+        with self.assertTemplateNotUsed('product.html'):
+            second = other.get(self.url)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertContains(second, 'data-hydrate="%s"' % reverse('cart_api_summary'))
+        self.assertNotContains(second, 'csrf_token__')
+
+        # The substituted token is accepted for the visitor it was served to.
+        token = second.content.decode().split('name="csrfmiddlewaretoken" value="')[1].split('"')[0]
+        response = other.post(reverse('cart_api_add', args=[self.product.id]), {'csrfmiddlewaretoken': token})
+        self.assertEqual(response.json()['quantity'], 1)
+
+    def test_product_save_changes_etag_and_body(self):
+        etag = self.client.get(self.url)['ETag']
+        time.sleep(0.001)
+        self.product.title = 'Linen Midi Dress'
+        self.product.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, 'Linen Midi Dress')
+
+    def test_signed_in_customer_gets_their_own_navbar(self):
+        guest = self.client.get(self.url)
+        session = self.client.session
+        session['Customer'] = {'First_Name': 'Jane'}
+        session.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=guest['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Jane')
+
+    def test_missing_product_redirects_home(self):
+        response = self.client.get(reverse('product', args=[self.product.id + 100]))
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher',
+                                     'django.contrib.auth.hashers.PBKDF2PasswordHasher'],
+                   LOGIN_THROTTLE_PER_IP=5, LOGIN_THROTTLE_PER_EMAIL=3)
+class LoginTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.customer = Customer.objects.create(first_name='Jane', last_name='Doe', phone='07000000000',
+                                                email='jane@example.com',
+                                                password=make_password('secret', hasher='pbkdf2_sha256'))
+
+    def login(self, password, email='jane@example.com', ip='192.0.2.1'):
+        return self.client.post(reverse('login'), {'email': email, 'password': password}, REMOTE_ADDR=ip)
+
+    def test_login_rehashes_with_current_hasher(self):
+        self.assertRedirects(self.login('secret'), reverse('home'), fetch_redirect_response=False)
+        self.customer.refresh_from_db()
+        self.assertTrue(self.customer.password.startswith('md5$'))
+        self.client.session.flush()
+        self.assertRedirects(self.login('secret'), reverse('home'), fetch_redirect_response=False)
+
+    def test_email_is_throttled_before_hashing(self):
+        for ip in range(3):
+            self.assertContains(self.login('wrong', ip=f'192.0.2.{ip}'), 'Invalid credentials!')
+        with mock.patch('store.models.check_password') as check:
+            response = self.login('secret', ip='192.0.2.9')
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(int(response['Retry-After']) > 0)
+        check.assert_not_called()
+
+    def test_ip_is_throttled_across_emails(self):
+        for i in range(5):
+            self.assertEqual(self.login('wrong', email=f'nobody{i}@example.com').status_code, 200)
+        self.assertEqual(self.login('secret').status_code, 429)
+        self.assertRedirects(self.login('secret', ip='192.0.2.2'), reverse('home'), fetch_redirect_response=False)
+
+    @override_settings(STORE_THROTTLE_IP_HEADER='X-Forwarded-For')
+    def test_ip_limit_uses_the_proxy_header(self):
+        def login(forwarded_for, email):
+            return self.client.post(reverse('login'), {'email': email, 'password': 'wrong'},
+                                    REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=forwarded_for)
+
+        # The client-supplied entry on the left doesn't change the key.
+        for i in range(5):
+            self.assertEqual(login(f'203.0.113.{i}, 198.51.100.7', f'nobody{i}@example.com').status_code, 200)
+        self.assertEqual(login('198.51.100.7', 'someone@example.com').status_code, 429)
+        # Another client behind the same proxy isn't locked out.
+        self.assertEqual(login('198.51.100.8', 'someone@example.com').status_code, 200)
+
+    def test_successful_login_resets_email_counter(self):
+        self.login('wrong')
+        self.login('wrong')
+        self.login('secret', ip='192.0.2.2')
+        for _ in range(3):
+            self.assertEqual(self.login('wrong', ip='192.0.2.3').status_code, 200)
+
+    def test_unknown_email_is_not_found(self):
+        self.assertIs(Customer.get_customer_by_email('nobody@example.com'), False)
+
+
+class DatabaseSettingsTests(TestCase):
+
+    def test_new_sqlite_connections_get_pragmas(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            wrapper = connections['default'].__class__({**connection.settings_dict, 'NAME': str(Path(tmp) / 'wal.sqlite3')})
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute('PRAGMA synchronous')
+                    self.assertEqual(cursor.fetchone()[0], 1)
+                    cursor.execute('PRAGMA busy_timeout')
+                    self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+            finally:
+                wrapper.close()
+
+    def test_tracked_database_keeps_its_journal_mode(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            name = str(Path(tmp) / 'db.sqlite3')
+            wrapper = connections['default'].__class__({**connection.settings_dict, 'NAME': name})
+            try:
+                with override_settings(SQLITE_TRACKED_DATABASE=name), wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'delete')
+                    cursor.execute('PRAGMA busy_timeout')
+                    self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+            finally:
+                wrapper.close()
+
+    def test_connections_are_reused_with_health_checks(self):
+        self.assertGreater(connection.settings_dict['CONN_MAX_AGE'], 0)
+        self.assertTrue(connection.settings_dict['CONN_HEALTH_CHECKS'])
+
+
+@override_settings(LOGIN_THROTTLE_PER_IP=0, LOGIN_THROTTLE_PER_EMAIL=0)
+class TrafficBenchmarkTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+
+    def test_seeded_store_replays_without_errors(self):
+        seed_store(categories=2, products=30, customers=3, orders=10)
+        self.assertEqual(Order.objects.count(), 10)
+        self.assertTrue(OrderItem.objects.exists())
+
+        options = {'users': 2, 'customers': 3, 'requests': 80, 'seed': 1, 'mix': traffic.DEFAULT_MIX}
+        catalog = {
+            'products': list(Product.objects.values_list('id', flat=True)),
+            'categories': ['dress', 'jeans'],
+            'terms': ['linen'],
+        }
+        results, logged_in = traffic.replay(traffic.ClientDriver(), options, catalog)
+        self.assertEqual(logged_in, 2)
+        self.assertEqual(sum(len(r['samples']) for r in results.values()), 80)
+        self.assertEqual(sum(r['errors'] for r in results.values()), 0)
+        self.assertGreater(Order.objects.count(), 10)
+
+        overall, endpoints = traffic._report(results)
+        self.assertEqual(overall['count'], 80)
+        self.assertGreater(endpoints['home']['queries_mean'], 0)
+
+    def test_mix_parsing(self):
+        self.assertEqual(traffic.parse_mix('home=3, checkout=1'), {'home': 3.0, 'checkout': 1.0})
+        with self.assertRaises(ValueError):
+            traffic.parse_mix('admin=1')
+
+
+@override_settings(STORE_METRICS_DIR=None)
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        histogram.reset()
+        create_products(3)
+
+    def timings(self, response):
+        return dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+
+    def test_server_timing_reports_queries_cache_and_templates(self):
+        self.client.get(reverse('home'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('home'))
+        timings = self.timings(response)
+        self.assertIn(f'desc="{len(ctx.captured_queries)} queries"', timings['db'])
+        self.assertGreater(float(timings['tpl'].split('=')[1]), 0)
+        # Rails, fragments and the session all come from the cache on the second visit.
+        self.assertNotIn('desc="hits=0 ', timings['cache'])
+        self.assertIn('desc="0 writes"', timings['session'])
+
+    def test_histogram_is_kept_per_view_and_dumped(self):
+        for _ in range(3):
+            self.client.get(reverse('home'))
+        self.client.get(reverse('collections', args=['dress']))
+        self.client.get('/no-such-page')
+
+        out = StringIO()
+        call_command('dump_metrics', '--json', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['home']['count'], 3)
+        self.assertEqual(report['collections']['count'], 1)
+        self.assertEqual(report['unresolved']['count'], 1)
+        self.assertGreater(report['home']['template_ms_mean'], 0)
+        self.assertLessEqual(report['home']['p50_ms'], report['home']['max_ms'])
+
+    def test_flushed_files_are_merged_within_window(self):
+        self.client.get(reverse('home'))
+        with tempfile.TemporaryDirectory() as tmp:
+            histogram.flush(tmp)
+            slots = histogram.slots()
+            minute = next(iter(slots))
+            old = {minute - 60: slots[minute]}
+            merged = merge_slots(load_slot_maps(tmp) + [slots, old], window=300)
+        self.assertEqual(merged['home']['count'], 2)
+
+
+@override_settings(ROOT_URLCONF=URLConf(async_views), STORE_METRICS_DIR=None)
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.category = Category.objects.create(name='Jeans')
+        self.products = create_products(3, category=self.category)
+        self.client = AsyncClient()
+
+    async def test_storefront_pages_render(self):
+        for url in [reverse('home'), reverse('collections', args=['jeans']) + '?sort=price',
+                    reverse('product', args=[self.products[0].id]), reverse('cart'),
+                    reverse('q') + '?search=product', reverse('order')]:
+            response = await self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+        response = await self.client.get(reverse('collections', args=['jeans']) + '?sort=price')
+        self.assertEqual([card['product']['id'] for card in response.context['Products']],
+                         [product.id for product in self.products])
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    async def test_old_collection_links_redirect(self):
+        response = await self.client.get('/collections/Jeans/')
+        self.assertRedirects(response, reverse('collections', args=['jeans']), status_code=301,
+                             fetch_redirect_response=False)
+
+    async def test_product_not_modified(self):
+        url = reverse('product', args=[self.products[0].id])
+        response = await self.client.get(url)
+        self.assertTrue(response.has_header('Last-Modified'))
+        response = await self.client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_checkout_places_order_and_queues_email(self):
+        await self.client.post(reverse('cart_api_add', args=[self.products[0].id]))
+        await self.client.post(reverse('cart_api_add', args=[self.products[1].id]))
+        response = await self.client.get(reverse('cart'))
+        self.assertEqual(response.context['Cart']['Quantity'], 2)
+
+        response = await self.client.post(reverse('order'), {
+            'email': 'guest@example.com', 'first_name': 'Guest', 'last_name': 'Shopper',
+            'address': '1 High St', 'phone': '07000000000', 'password': 'secret',
+        })
+        self.assertRedirects(response, reverse('ordered'), fetch_redirect_response=False)
+        self.assertEqual(await Order.objects.acount(), 1)
+        self.assertEqual(await OrderItem.objects.acount(), 2)
+        self.assertEqual(await OutboundEmail.objects.acount(), 1)
+        response = await self.client.get(reverse('cart'))
+        self.assertEqual(response.context['Cart']['Quantity'], 0)
+
+
+class SalesCounterTests(TransactionTestCase):
+
+    def checkout_concurrently(self, threads=8, orders=10):
+        product = create_products(1)[0]
+        customer = Customer.objects.create(first_name='Jane', last_name='Doe', phone='07000000000',
+                                           email='jane@example.com', password='x')
+        start = threading.Barrier(threads)
+        errors = []
+
+        def shop():
+            try:
+                start.wait()
+                for _ in range(orders):
+                    while True:
+                        try:
+                            place_order(customer, {product.id: 2})
+                            break
+                        except OperationalError:
+                            # The in-memory test database locks whole tables; retry as busy_timeout would.
+                            time.sleep(0.001)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=shop) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return product, errors
+
+    def test_concurrent_checkouts_of_one_product_are_counted_exactly(self):
+        product, errors = self.checkout_concurrently()
+        self.assertEqual(errors, [])
+        self.assertEqual(Order.objects.count(), 80)
+        self.assertEqual(SaleEvent.objects.count(), 80)
+        self.assertEqual(rollup_sales(batch_size=7), 80)
+        self.assertEqual(Product.objects.get(id=product.id).amount_sold, 160)
+        self.assertFalse(SaleEvent.objects.exists())
+
+    @override_settings(STORE_SALES_COUNTER='row')
+    def test_row_counter_is_exact_too(self):
+        product, errors = self.checkout_concurrently(threads=4)
+        self.assertEqual(errors, [])
+        self.assertEqual(Product.objects.get(id=product.id).amount_sold, 80)
+        self.assertFalse(SaleEvent.objects.exists())
+
+    def test_checkout_never_writes_the_product_row(self):
+        product = create_products(1)[0]
+        customer = Customer.objects.create(first_name='Jane', last_name='Doe', phone='07000000000',
+                                           email='jane@example.com', password='x')
+        with CaptureQueriesContext(connection) as ctx:
+            place_order(customer, {product.id: 1})
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "store_product"')])
+
+
+class SalesReportTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        dresses = Category.objects.create(name='Dress')
+        jeans = Category.objects.create(name='Jeans')
+        self.dress, self.gown = create_products(2, category=dresses)
+        self.jean = create_products(1, category=jeans)[0]
+        self.customer = Customer.objects.create(first_name='Jane', last_name='Doe', phone='07000000000',
+                                                email='jane@example.com', password='x')
+        self.today = timezone.localdate()
+        self.order({self.dress.id: 2, self.jean.id: 1}, days_ago=1)
+        self.order({self.dress.id: 1, self.gown.id: 1}, days_ago=1)
+        self.order({self.jean.id: 3})
+
+    def order(self, lines, days_ago=0):
+        order, _, _ = place_order(self.customer, lines)
+        Order.objects.filter(id=order.id).update(date=self.today - timedelta(days=days_ago))
+        return order
+
+    def category_totals(self):
+        return {(row.day, row.category.name): (row.orders, row.quantity, row.revenue)
+                for row in DailyCategorySales.objects.select_related('category')}
+
+    def test_rollup_matches_order_history_and_is_incremental(self):
+        self.assertEqual(rollup_reports(), 3)
+        yesterday = self.today - timedelta(days=1)
+        self.assertEqual(self.category_totals(), {
+            (yesterday, 'Dress'): (2, 4, 2 * 10 + 10 + 11),
+            (yesterday, 'Jeans'): (1, 1, 10),
+            (self.today, 'Jeans'): (1, 3, 30),
+        })
+        self.assertEqual(DailyProductSales.objects.get(day=yesterday, product=self.dress).quantity, 3)
+
+        # Only the new order is read; the existing row for today is added to.
+        self.assertEqual(rollup_reports(), 0)
+        self.order({self.jean.id: 1})
+        self.assertEqual(rollup_reports(), 1)
+        self.assertEqual(self.category_totals()[self.today, 'Jeans'], (2, 4, 40))
+
+    def test_settled_rollup_waits_for_the_previous_horizon(self):
+        self.assertEqual(rollup_reports(settle=True), 0)
+        self.order({self.gown.id: 1})
+        self.assertEqual(rollup_reports(settle=True), 3)
+        self.assertEqual(rollup_reports(settle=True), 1)
+
+    def test_staff_endpoint_serves_cached_json_and_csv(self):
+        url = reverse('sales_report', args=['top-products'])
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        User.objects.create_user('staff', password='secret', is_staff=True)
+        self.client.login(username='staff', password='secret')
+        rollup_reports()
+        rows = self.client.get(url).json()['rows']
+        self.assertEqual([row['product_id'] for row in rows], [self.jean.id, self.dress.id, self.gown.id])
+        self.assertEqual(rows[0]['revenue'], 40)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        self.assertFalse([q for q in ctx.captured_queries if 'store_daily' in q['sql']])
+
+        response = self.client.get(reverse('sales_report', args=['categories']), {'format': 'csv'})
+        lines = response.content.decode().splitlines()
+        self.assertEqual(lines[0], 'day,category_id,category,orders,quantity,revenue')
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(self.client.get(url, {'start': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2024-02-30'}).status_code, 400)
+
+
+class AdminTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_store(categories=3, products=200, customers=500, orders=100000)
+        cls.staff = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+
+    def setUp(self):
+        clear_caches()
+        self.client.force_login(self.staff)
+
+    def changelist(self, model, params=None):
+        url = reverse(f'admin:store_{model}_changelist')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response, [q['sql'] for q in ctx.captured_queries]
+
+    def test_changelists_do_not_query_per_row(self):
+        for model in ('order', 'orderitem', 'product', 'customer'):
+            _, queries = self.changelist(model)
+            self.assertLessEqual(len(queries), 8, model)
+
+    def test_unfiltered_changelist_estimates_the_total(self):
+        response, queries = self.changelist('order')
+        self.assertEqual(response.context['cl'].result_count, Order.objects.count())
+        self.assertFalse([sql for sql in queries if 'COUNT(' in sql.upper() and 'store_order' in sql])
+
+    def test_filtered_changelist_counts_exactly(self):
+        customer = Customer.objects.get(email='customer7@example.com')
+        response, queries = self.changelist('order', {'q': customer.email})
+        self.assertEqual(response.context['cl'].result_count, Order.objects.filter(customer=customer).count())
+        # No second COUNT(*) over the whole table for "x of y selected".
+        self.assertEqual(len([sql for sql in queries if 'COUNT(' in sql.upper()]), 1)
+
+        day = Order.objects.order_by('date').values_list('date', flat=True).first()
+        response, _ = self.changelist('order', {'date__year': day.year, 'date__month': day.month})
+        self.assertEqual(response.context['cl'].result_count,
+                         Order.objects.filter(date__year=day.year, date__month=day.month).count())
+
+    def test_product_search_uses_the_search_backend(self):
+        product = Product.objects.first()
+        response, _ = self.changelist('product', {'q': product.title})
+        self.assertIn(product, response.context['cl'].result_list)
+
+    def test_order_change_page_queries_do_not_grow_with_items(self):
+        def change_page_queries(order):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(reverse('admin:store_order_change', args=[order.id]))
+            self.assertEqual(response.status_code, 200)
+            return len(ctx.captured_queries)
+
+        orders = Order.objects.annotate(items=Count('orderitem')).order_by('items')
+        change_page_queries(orders.first())  # Warms the content type and category caches.
+        self.assertEqual(change_page_queries(orders.first()), change_page_queries(orders.last()))
+
+
+class CatalogImportTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.jeans = Category.objects.create(name='Jeans')
+
+    def load(self, text, fmt='csv', **kwargs):
+        return import_catalog(read_rows(StringIO(text), fmt), **kwargs)
+
+    def test_import_upserts_on_sku_in_batches(self):
+        existing = Product.objects.create(sku='J-1', title='Old', material='Denim', price=5, category=self.jeans)
+        stats = self.load(
+            'sku,title,material,description,price,category,image\n'
+            'J-1,Slim Jeans,Denim,,40,Jeans,store/static/1.png\n'
+            'D-1,Wrap Dress,Linen,Midi,55,Dress,store/static/2.png\n'
+            'D-1,Wrap Dress,Linen,Midi,60,Dress,store/static/2.png\n'
+            ',Scarf,Silk,,15,Accessories,\n',
+            batch_size=2,
+        )
+        self.assertEqual(stats, {'rows': 4, 'batches': 2, 'categories': 2, 'images': 0})
+
+        existing.refresh_from_db()
+        self.assertEqual((existing.title, existing.price), ('Slim Jeans', 40))
+        # The later of two rows for a SKU in one batch wins.
+        self.assertEqual(Product.objects.get(sku='D-1').price, 60)
+        self.assertEqual(Product.objects.get(title='Scarf').category.name, 'Accessories')
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(Category.objects.filter(name='Dress').count(), 1)
+        # Imported products are searchable straight away.
+        self.assertEqual([p['title'] for p in Product.search('wrap').results], ['Wrap Dress'])
+
+    def test_round_trips_through_jsonl_export(self):
+        self.load('{"sku": "J-1", "title": "Slim Jeans", "price": 40, "category": "Jeans"}\n\n', fmt='jsonl')
+        out = StringIO()
+        self.assertEqual(write_rows(out, export_rows(chunk_size=1), 'jsonl'), 1)
+        row = json.loads(out.getvalue())
+        self.assertEqual((row['sku'], row['category'], row['price']), ('J-1', 'Jeans', 40))
+
+        row['price'] = 45
+        self.load(json.dumps(row), fmt='jsonl')
+        self.assertEqual(Product.objects.get().price, 45)
+
+    def test_reimport_busts_cached_cards_and_menu(self):
+        self.load('sku,title,price,category\nA,Tee,10,Jeans\n')
+        url = reverse('collections', args=['jeans'])
+        self.assertContains(self.client.get(url), 'Tee')
+
+        self.load('sku,title,price,category\nA,Renamed Tee,99,Tops\n')
+        response = self.client.get(reverse('collections', args=['tops']))
+        self.assertContains(response, 'Renamed Tee')
+        self.assertContains(response, '£99')
+        self.assertContains(response, f'href="{reverse("collections", args=["tops"])}"')
+        self.assertNotContains(self.client.get(url), 'Tee<')
+
+    def test_bad_row_reports_its_line_and_keeps_earlier_batches(self):
+        with self.assertRaisesMessage(ValueError, 'line 3'):
+            self.load('sku,title,price,category\nA,Tee,10,Tops\nB,Tee,ten,Tops\n', batch_size=1)
+        self.assertEqual(list(Product.objects.values_list('sku', flat=True)), ['A'])
+
+    def test_commands_stream_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'catalog.csv'
+            path.write_text('sku,title,price,category\nA,Tee,10,Tops\n')
+            out = StringIO()
+            call_command('import_catalog', str(path), stdout=out)
+            self.assertIn('Imported 1 row(s)', out.getvalue())
+
+            export = Path(tmp) / 'export.jsonl'
+            call_command('export_catalog', str(export), stderr=StringIO())
+            self.assertEqual(json.loads(export.read_text())['title'], 'Tee')
+
+            path.write_text('sku,title,price,category\nA,,10,Tops\n')
+            with self.assertRaisesMessage(CommandError, 'title is required'):
+                call_command('import_catalog', str(path), stdout=StringIO())
+
+    def test_images_are_generated_in_worker_processes(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(PRODUCT_THUMBNAIL_ROOT=Path(root)):
+            images = ImageIngester(workers=2)
+            try:
+                stats = self.load('sku,title,price,category,image\nA,Tee,10,Tops,store/static/1.png\n'
+                                  'B,Top,12,Tops,store/static/1.png\n', images=images)
+            finally:
+                images.close()
+            self.assertEqual(stats['images'], 1)
+            self.assertIn('1.png', load_manifest())
+
+
+class OrderExportTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Dress')
+        self.dress, self.gown = create_products(2, category=category)
+        self.customer = Customer.objects.create(first_name='Jane', last_name='Doe', phone='07000000000',
+                                                email='jane@example.com', password='x')
+        self.today = timezone.localdate()
+        self.old = Order.objects.create(customer=self.customer, date=self.today - timedelta(days=40))
+        OrderItem.objects.create(order=self.old, product=self.dress, quantity=2, price=10)
+        self.new = Order.objects.create(customer=self.customer, date=self.today)
+        OrderItem.objects.create(order=self.new, product=self.dress, quantity=1, price=10)
+        OrderItem.objects.create(order=self.new, product=self.gown, quantity=3, price=11)
+        User.objects.create_user('staff', password='secret', is_staff=True)
+
+    def download(self, **params):
+        response = self.client.get(reverse('order_export'), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_staff_download_streams_one_row_per_order_line(self):
+        self.assertEqual(self.client.get(reverse('order_export')).status_code, 302)
+        self.client.login(username='staff', password='secret')
+
+        rows = list(csv.DictReader(StringIO(self.download())))
+        self.assertEqual([(int(r['order_id']), r['product_title'], r['line_total']) for r in rows], [
+            (self.old.id, self.dress.title, '20'),
+            (self.new.id, self.dress.title, '10'),
+            (self.new.id, self.gown.title, '33'),
+        ])
+        self.assertEqual(rows[0]['customer_email'], 'jane@example.com')
+
+        rows = [json.loads(line) for line in self.download(format='jsonl', start=self.today.isoformat()).splitlines()]
+        self.assertEqual([row['item_id'] is not None for row in rows], [True, True])
+        self.assertEqual({row['order_id'] for row in rows}, {self.new.id})
+
+        self.assertEqual(self.client.get(reverse('order_export'), {'start': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('order_export'), {'format': 'xlsx'}).status_code, 400)
+
+    @override_settings(ORDER_EXPORT_CHUNK_SIZE=1)
+    async def test_asgi_download_streams_blocks_as_they_are_read(self):
+        client = AsyncClient()
+        await sync_to_async(client.force_login)(await User.objects.aget(username='staff'))
+        response = await client.get(reverse('order_export'), {'format': 'jsonl'})
+        self.assertTrue(response.is_async)
+        blocks = [block async for block in response.streaming_content]
+        self.assertEqual(len(blocks), 3)
+        self.assertEqual([json.loads(block)['order_id'] for block in blocks], [self.old.id, self.new.id, self.new.id])
+
+    def test_export_is_one_query_read_in_chunks(self):
+        for _ in range(5):
+            order = Order.objects.create(customer=self.customer)
+            OrderItem.objects.create(order=order, product=self.gown, quantity=1, price=11)
+        with CaptureQueriesContext(connection) as ctx:
+            blocks = list(stream_order_lines('jsonl', chunk_size=2))
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual([block.count('\n') for block in blocks], [2, 2, 2, 2])
+
+    def test_command_writes_a_date_range(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'orders.jsonl'
+            call_command('export_orders', str(path), '--end', (self.today - timedelta(days=1)).isoformat(),
+                         stderr=StringIO())
+            rows = [json.loads(line) for line in path.read_text().splitlines()]
+        self.assertEqual([(row['order_id'], row['quantity']) for row in rows], [(self.old.id, 2)])
+        with self.assertRaisesMessage(CommandError, 'Invalid date'):
+            call_command('export_orders', '--start', '2024-02-30', stdout=StringIO(), stderr=StringIO())
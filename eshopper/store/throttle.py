@@ -0,0 +1,85 @@
+"""
+Login rate limiting on the cache backend.
+
+Attempts are counted per client IP and per email address in fixed windows,
+before any password is hashed, so a credential-stuffing burst costs a couple
+of cache operations per request once it is over the limit.
+"""
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+IP_KEY = 'store:login:ip:{}:{}'
+EMAIL_KEY = 'store:login:email:{}:{}'
+
+
+def _window():
+    return getattr(settings, 'LOGIN_THROTTLE_WINDOW', 300)
+
+
+def _email_key(email):
+    digest = hashlib.sha256((email or '').strip().lower().encode()).hexdigest()[:32]
+    return EMAIL_KEY.format(digest, int(time.time() // _window()))
+
+
+def client_ip(request):
+    """
+    The client's address. Behind a reverse proxy every request comes from the
+    proxy, so set STORE_THROTTLE_IP_HEADER to the header it forwards the client
+    address in. For a list like X-Forwarded-For, the entry STORE_THROTTLE_PROXY_COUNT
+    places from the right is used; entries further left came from the client
+    and can be forged.
+    """
+    header = getattr(settings, 'STORE_THROTTLE_IP_HEADER', None)
+    if header:
+        addresses = [address.strip() for address in request.headers.get(header, '').split(',') if address.strip()]
+        proxies = getattr(settings, 'STORE_THROTTLE_PROXY_COUNT', 1)
+        if addresses:
+            return addresses[-min(proxies, len(addresses))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _ip_key(request):
+    return IP_KEY.format(client_ip(request), int(time.time() // _window()))
+
+
+def _keys(request, email):
+    """
+    (cache key, limit) for each counter that is switched on; a limit of 0 turns one off.
+    """
+    keys = [
+        (_ip_key(request), getattr(settings, 'LOGIN_THROTTLE_PER_IP', 50)),
+        (_email_key(email), getattr(settings, 'LOGIN_THROTTLE_PER_EMAIL', 10)),
+    ]
+    return [(key, limit) for key, limit in keys if limit]
+
+
+def throttle_login(request, email):
+    """
+    Counts a login attempt and returns 0 if it may go ahead, otherwise the
+    number of seconds until the current window ends.
+    """
+    window = _window()
+    throttled = False
+    for key, limit in _keys(request, email):
+        cache.add(key, 0, window)
+        try:
+            attempts = cache.incr(key)
+        except ValueError:
+            # The counter expired between add() and incr().
+            cache.set(key, 1, window)
+            attempts = 1
+        if attempts > limit:
+            throttled = True
+    if not throttled:
+        return 0
+    return max(1, int(window - time.time() % window))
+
+
+def reset_login_attempts(email):
+    """
+    Clears the email's counter after a successful login. The IP counter is
+    left alone so one good password doesn't unlock a burst from that address.
+    """
+    cache.delete(_email_key(email))
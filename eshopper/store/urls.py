@@ -1,21 +1,37 @@
+from django.conf import settings
 from django.urls import path
 from .views import Login
-from . import views
+from . import async_views, views
 
-urlpatterns = [
-    path('', views.home, name='home'),
-    path('q', views.q, name='q'),
-    path('product/<int:product_id>', views.product, name='product'),
-    path('collections/<str:product_type>/', views.collections, name='collections'),
-    path('cart', views.cart, name='cart'),
-    path('add/<str:title>/<int:id>/<str:price>/<str:img>/<path:return_url>/', views.add_to_cart, name='add_to_cart'),
-    path('remove/<str:title>/<int:id>/<str:price>/<str:img>/<path:return_url>/', views.remove_from_cart, name='remove_from_cart'),
-    path('login', Login.as_view(), name='login'),
-    path('logout', views.logout, name='logout'),
-    path('signup', views.signup, name='signup'),
-    path('order', views.order, name='order'),
-    path('orders', views.orders, name='orders'),
-    path('orders/<str:order_id>/', views.orders_details, name='orders_details'),
-    path('ordered', views.ordered, name='ordered'),
-    path('showcase', views.ordered, name='ordered'),
-]
\ No newline at end of file
+
+def storefront_urlpatterns(pages):
+    """
+    The store's URLs, with the home, search, product, collections, cart and
+    order pages taken from `pages`: store.views or store.async_views.
+    """
+    return [
+        path('', pages.home, name='home'),
+        path('q', pages.q, name='q'),
+        path('product/<int:product_id>', pages.product, name='product'),
+        path('collections/<str:slug>/', pages.collections, name='collections'),
+        path('cart', pages.cart, name='cart'),
+        path('add/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
+        path('remove/<int:product_id>/', views.remove_from_cart, name='remove_from_cart'),
+        path('api/cart/', views.cart_api_summary, name='cart_api_summary'),
+        path('api/cart/add/<int:product_id>/', views.cart_api_add, name='cart_api_add'),
+        path('api/cart/remove/<int:product_id>/', views.cart_api_remove, name='cart_api_remove'),
+        path('api/cart/set/<int:product_id>/', views.cart_api_set, name='cart_api_set'),
+        path('login', Login.as_view(), name='login'),
+        path('logout', views.logout, name='logout'),
+        path('signup', views.signup, name='signup'),
+        path('order', pages.order, name='order'),
+        path('orders', views.orders, name='orders'),
+        path('orders/<str:order_id>/', views.orders_details, name='orders_details'),
+        path('ordered', views.ordered, name='ordered'),
+        path('showcase', views.ordered, name='ordered'),
+        path('reports/sales/<str:report>/', views.sales_report, name='sales_report'),
+        path('reports/orders/export/', views.order_export, name='order_export'),
+    ]
+
+
+urlpatterns = storefront_urlpatterns(async_views if getattr(settings, 'STORE_ASYNC_VIEWS', False) else views)
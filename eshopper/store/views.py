@@ -1,70 +1,85 @@
 from .models import Product, Customer, Order, OrderItem
+from .cart import Cart
+from .catalog import SORT_MODES, category_registry, collection_page
+from .checkout import place_order
+from .exports import (CONTENT_TYPES, FORMATS as EXPORT_FORMATS, astream_order_lines, export_filename,
+                      stream_order_lines)
+from .outbox import queue_email
+from .pages import (CSRF_PLACEHOLDER, get_cached_page, personalize, product_etag, product_last_modified,
+                    product_validators, set_cached_page)
+from .rails import get_best_sellers, get_hot_deals, image_basename
+from .reports import REPORTS, default_range, get_report, to_csv
+from .throttle import reset_login_attempts, throttle_login
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
-from django.contrib.auth.hashers import make_password, check_password
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.hashers import make_password
 from django.views.decorators.csrf import csrf_exempt, csrf_protect
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
+from django.urls import reverse
 from django.utils.html import strip_tags
+from django.utils.dateparse import parse_date
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.utils.text import slugify
 from django.views import View
-import random
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_GET, require_POST
 
 def home(request):
     """
     Renders the main index page, populating session data and product lists.
     """
-    #Fetch products for home page (Most sold and Hot)
-    most_sold_products = Product.objects.all().order_by('-amount_sold').values()[:8]
-    hot_products = Product.objects.all().order_by('price').values()[:3]
-    #List to hold products
-    most_sold_prod = []
-    hot_prod = []
-    #Iterate and create map for context.
-    for product in most_sold_products:
-        full_path = product['image']
-        index = full_path.rfind('/')
-        path = full_path[index+1:]
-        most_sold_prod.append({'product': product, 'image_path': {'path': path}})
-
-    for product in hot_products:
-        full_path = product['image']
-        index = full_path.rfind('/')
-        path = full_path[index+1:]
-        price_cut = int(product['price'] * 1.6)
-        hot_prod.append({'product': product, 'image_path': {'path': path}, 'price_cut': price_cut})
+    #Fetch products for home page (Most sold and Hot), precomputed and cached in store.rails
+    most_sold_prod = get_best_sellers()
+    hot_prod = get_hot_deals()
+    cust, cart = _init_home_session(request)
 
+    #Context map holding data for home page.
+    context = {
+        'Customer': cust,
+        'Cart': cart,
+        'Most_Sold_Products': most_sold_prod,
+        'Hot_Products': hot_prod,
+    }
+
+    return render(request, 'home.html', context)
+
+def _init_home_session(request):
+    """
+    Initializes the Customer and Cart session entries for a first visit and
+    returns them. Shared with the async home view.
+    """
     # Use .get() to retrieve existing session data or initialize with an empty dictionary.
     cust = request.session.get('Customer', {})
-    cart = request.session.get('Cart', {})
+    # Only write the session back when something was actually initialized.
+    changed = False
     
     # Initialize Customer and Cart session.
     if 'First_Name' not in cust:
         cust['First_Name'] = 'Guest'
+        changed = True
     
     if 'Session_ID' not in cust:
         cust['Session_ID'] = request.session.session_key
+        changed = True
     
-    if 'Cart_ID' not in cart:
-        cart['Cart_ID'] = str(random.randint(0, 999))
-    
-    if 'Quantity' not in cart:
-        cart['Quantity'] = 0
-    
-    if 'Products' not in cart:
-        cart['Products'] = {}
-    
-    #Reassign values to session and set session modified to true.
-    request.session['Customer'] = cust
-    request.session['Cart'] = cart
-    request.session.modified = True
-    #Context map holding data for home page.
-    context = {
-        'Customer': cust,
-        'Cart': cart,
-        'Most_Sold_Products': most_sold_prod,
-        'Hot_Products': hot_prod,
-    }
+    if changed:
+        request.session['Customer'] = cust
 
-    return render(request, 'home.html', context)
+    cart = Cart(request.session)
+    if request.session.get('Cart') != cart.data:
+        cart.save()
+    return cust, cart.data
+
+def _product_cards(products):
+    """
+    Wraps product value dicts the way the card templates expect them.
+    """
+    return [{'product': product, 'image_path': {'path': image_basename(product['image'])}} for product in products]
 
 def q(request):
     """
@@ -76,66 +91,108 @@ def q(request):
     searchRes = []
     
     if search:
-        
-        products = Product.search(search)
+        try:
+            page_number = int(request.GET.get('page', 1))
+        except ValueError:
+            page_number = 1
+
+        # Ranked, paginated results from whichever search backend is configured.
+        page = Product.search(search, page=page_number)
 
-        for product in products:
-            full_path = product['image']
-            index = full_path.rfind('/')
-            path = full_path[index+1:]
-            searchRes.append({'product': product, 'image_path': {'path': path}})
+        searchRes = _product_cards(page.results)
 
-        return render(request, 'q.html', {'Products': searchRes, 'Cart': cart})
+        return render(request, 'q.html', {'Products': searchRes, 'Page': page, 'Cart': cart})
     else:
         # Redirect to the home page if no search query is provided.
         return redirect('home')
 
+@condition(etag_func=product_etag, last_modified_func=product_last_modified)
 def product(request, product_id):
     """
     Displays the details of a specific product.
+    The rendered page is cached and shared between sessions; the cart badge is
+    filled in client side, so a 304 or a cache hit never renders the template.
     """
-    cart = request.session.get('Cart', {})
     cust = request.session.get('Customer', {})
-    
-    try:
-        product_obj = Product.objects.get(id=product_id)
-        full_path = str(product_obj.image)
-        index = full_path.rfind('/')
-        img = full_path[index+1:]
-        context = {
-            'product': product_obj,
-            'Image': img,
-            'Cart': cart,
-            'Customer': cust
-        }
-        return render(request, 'product.html', context)
-    except Product.DoesNotExist:
+
+    validators = product_validators(request, product_id)
+    if validators is None:
         # Redirect to the home page or a 404 page if the product is not found
         return redirect('home')
 
-def collections(request, product_type):
-
-    cart = request.session.get('Cart', {})
-    cust = request.session.get('Customer', {})
-    prod = Product.objects.all().filter(category__name=product_type).values()
-    collections = [
+    body = get_cached_page(validators['key'])
+    if body is None:
+        try:
+            product_obj = Product.objects.get(id=product_id)
+        except Product.DoesNotExist:
+            return redirect('home')
+        body = _render_product_page(request, product_obj, cust)
+        set_cached_page(validators['key'], body)
 
-    ]
-    for product in prod:
-        full_path = product['image']
-        index = full_path.rfind('/')
-        path = full_path[index+1:]
-        collections.append({'product': product, 'image_path': {'path': path}})
+    return _product_response(request, body)
 
+def _render_product_page(request, product_obj, cust):
+    """
+    Renders the shareable product page body, with a placeholder CSRF token and no cart badge count.
+    """
     context = {
-        'Products': collections,
-        'Name': product_type,
-        'Cart': cart,
+        'product': product_obj,
+        'Image': image_basename(product_obj.image),
+        'Cart': {},
+        'Hydrate_Cart': True,
         'Customer': cust,
+        'csrf_token': CSRF_PLACEHOLDER,
     }
-    
+    return render_to_string('product.html', context, request)
+
+def _product_response(request, body):
+    response = HttpResponse(personalize(request, body))
+    # Browsers must revalidate, which is answered with a 304 while nothing has changed.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+def collections(request, slug):
+    """
+    Lists a category's products one page at a time, optionally sorted by price or best-selling.
+    """
+    category = category_registry.get(slug)
+    if category is None:
+        # Old links used the category name; send them to the slug.
+        moved = category_registry.get(slugify(slug))
+        if moved is not None:
+            return _collection_moved(request, moved)
+
+    sort = _collection_sort(request)
+
+    # The category comes from the in-memory registry, so the product query filters on the integer FK alone.
+    prod, next_cursor = [], None
+    if category is not None:
+        prod, next_cursor = collection_page(category.id, sort=sort, cursor=request.GET.get('cursor'))
+
+    context = _collections_context(request, slug, category, sort, prod, next_cursor)
     return render(request, 'collections.html', context)
 
+def _collection_moved(request, category):
+    url = reverse('collections', args=[category.slug])
+    if request.GET:
+        url += '?' + request.GET.urlencode()
+    return redirect(url, permanent=True)
+
+def _collection_sort(request):
+    sort = request.GET.get('sort', 'default')
+    return sort if sort in SORT_MODES else 'default'
+
+def _collections_context(request, slug, category, sort, prod, next_cursor):
+    return {
+        'Products': _product_cards(prod),
+        'Name': category.name if category is not None else slug,
+        'Sort': sort,
+        'Next_Cursor': next_cursor,
+        'Is_First_Page': not request.GET.get('cursor'),
+        'Cart': request.session.get('Cart', {}),
+        'Customer': request.session.get('Customer', {}),
+    }
+
 class Login(View):
     """
     Renders the login page, it gets user from database and initializes user into customer session.
@@ -149,11 +206,25 @@ class Login(View):
         #Get POST data
         email = request.POST.get('email')
         password = request.POST.get('password')
+        cart = request.session.get('Cart', {})
+        cust = request.session.get('Customer', {})
+
+        # Rate limit before any hashing, so a burst of guesses can't tie up the workers.
+        retry_after = throttle_login(request, email)
+        if retry_after:
+            response = render(request, 'login.html', {
+                'error': 'Too many login attempts, please try again later.', 'Cart': cart, 'Customer': cust,
+            }, status=429)
+            response['Retry-After'] = str(retry_after)
+            return response
+
         customer = Customer.get_customer_by_email(email)
         error_message = None
         #Validate input and store customer session
         if customer:
-            if check_password(password, customer.password):
+            # Upgrades the stored hash if the hasher profile has changed.
+            if customer.check_password(password):
+                reset_login_attempts(email)
                 # Correctly set the customer session data
                 request.session['Customer'] = {
                     'First_Name': customer.first_name,
@@ -169,10 +240,10 @@ class Login(View):
             else:
                 error_message = 'Invalid credentials!'
         else:
+            # Hash anyway so unknown emails take as long as wrong passwords.
+            make_password(password)
             error_message = 'Invalid credentials!'
 
-        cart = request.session.get('Cart', {})
-        cust = request.session.get('Customer', {})
         return render(request, 'login.html', {'error': error_message, 'Cart': cart, 'Customer': cust})
 
 def logout(request):
@@ -259,118 +330,140 @@ def cart(request):
     """
     Renders the shopping cart page.
     """
-    cart = request.session.get('Cart', {})
+    # Prices, titles and images come from the Product table in one query.
+    cart = Cart(request.session).summary()
     cust = request.session.get('Customer', {})
 
     return render(request,'cart.html', {'Cart': cart, 'Customer': cust})
 
-def add_to_cart(request, title, id, price, img, return_url):
+def _next_url(request, default='home'):
     """
-    Adds a product to the cart session and redirects to a specified URL.
+    Returns the ?next= redirect target if it is a safe, local URL.
     """
-    cart = request.session.get('Cart', {})
-    price = float(price)
-    
-    if 'Quantity' not in cart:
-        cart['Quantity'] = 0
-    if 'Products' not in cart:
-        cart['Products'] = {}
-    
-    product_key = f"{title}_{id}"
-    
-    if product_key in cart['Products']:
-        cart['Products'][product_key]['Quantity'] += 1
-    else:
-        cart['Products'][product_key] = {
-            'title': title,
-            'Product_ID': id,
-            'Price': price,
-            'Quantity': 1,
-            'Image': img
-        }
-    
-    total_quantity = 0
-    total_price = 0.0
-    
-    for product_data in cart['Products'].values():
-        quantity = product_data['Quantity']
-        unit_price = product_data['Price']
-        product_data['Product_Total'] = quantity * unit_price
-        total_quantity += quantity
-        total_price += product_data['Product_Total']
-    
-    cart['Quantity'] = total_quantity
-    cart['Cart_Total'] = round(total_price, 2)
-    
-    request.session['Cart'] = cart
-    request.session.modified = True
+    next_url = request.GET.get('next')
+    if next_url and url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()},
+                                                    require_https=request.is_secure()):
+        return next_url
+    return default
+
+@require_POST
+def add_to_cart(request, product_id):
+    """
+    Adds one of a product to the cart session and redirects to ?next=.
+    Fallback for browsers without JavaScript; the templates use the JSON cart API.
+    """
+    if Product.objects.filter(id=product_id).exists():
+        Cart(request.session).add(product_id)
 
-    # Redirect to the URL provided in the function call.
-    return redirect(return_url)
+    return redirect(_next_url(request))
 
-def remove_from_cart(request, title, id, price, img, return_url):
+@require_POST
+def remove_from_cart(request, product_id):
     """
-    Removes a product from the cart session by reducing quantity by 1.
+    Removes one of a product from the cart session and redirects to ?next=.
     If quantity reaches 0, removes the product entirely.
     """
-    cart = request.session.get('Cart', {})
-    
-    # Convert price to float
-    price = float(price)
-    
-    # Initialize cart structure if keys are missing
-    if 'Quantity' not in cart:
-        cart['Quantity'] = 0
-    if 'Products' not in cart:
-        cart['Products'] = {}
-    
-    # Create unique key
-    product_key = f"{title}_{id}"
-    
-    if product_key in cart['Products']:
-        # Product exists, decrement quantity
-        cart['Products'][product_key]['Quantity'] -= 1
-        
-        # Remove product if quantity reaches 0 or below
-        if cart['Products'][product_key]['Quantity'] <= 0:
-            del cart['Products'][product_key]
-    
-    # Calculate totals from scratch
-    total_quantity = 0
-    total_price = 0.0
-    
-    for product_data in cart['Products'].values():
-        quantity = product_data['Quantity']
-        unit_price = product_data['Price']
-        
-        # Calculate product total
-        product_data['Product_Total'] = quantity * unit_price
-        
-        # Add to cart totals
-        total_quantity += quantity
-        total_price += product_data['Product_Total']
-    
-    # Update cart totals
-    cart['Quantity'] = total_quantity
-    cart['Cart_Total'] = round(total_price, 2)
-    
-    # Save to session
-    request.session['Cart'] = cart
-    request.session.modified = True
+    cart = Cart(request.session)
+
+    # Nothing to remove, so leave the session untouched.
+    if cart.get(product_id):
+        cart.remove(product_id)
+
+    return redirect(_next_url(request))
+
+def _cart_response(cart, status=200):
+    """
+    JSON body shared by the cart API endpoints: totals plus every line.
+    """
+    summary = cart.summary()
+    return JsonResponse({
+        'quantity': summary['Quantity'],
+        'total': summary['Cart_Total'],
+        'lines': [{
+            'product_id': line['Product_ID'],
+            'title': line['title'],
+            'price': line['Price'],
+            'quantity': line['Quantity'],
+            'total': line['Product_Total'],
+        } for line in summary['Products']],
+    }, status=status)
+
+@require_GET
+def cart_api_summary(request):
+    """
+    Returns the cart totals and lines as JSON.
+    """
+    return _cart_response(Cart(request.session))
+
+@require_POST
+def cart_api_add(request, product_id):
+    """
+    Adds `quantity` (default 1) of a product and returns the updated cart.
+    """
+    return _cart_api_change(request, product_id, lambda cart, quantity: cart.add(product_id, quantity))
+
+@require_POST
+def cart_api_remove(request, product_id):
+    """
+    Removes `quantity` (default 1) of a product and returns the updated cart.
+    """
+    return _cart_api_change(request, product_id, lambda cart, quantity: cart.remove(product_id, quantity))
+
+@require_POST
+def cart_api_set(request, product_id):
+    """
+    Sets a product's quantity (0 removes it) and returns the updated cart.
+    """
+    return _cart_api_change(request, product_id, lambda cart, quantity: cart.set(product_id, quantity),
+                            default=None)
+
+def _cart_api_change(request, product_id, change, default=1):
+    cart = Cart(request.session)
+    try:
+        quantity = int(request.POST.get('quantity', default))
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'quantity must be a whole number'}, status=400)
+    if quantity < 0:
+        return JsonResponse({'error': 'quantity must not be negative'}, status=400)
 
-    # Redirect to the URL provided in the function call.
-    return redirect(return_url)
+    # Removing something that isn't there is a no-op and doesn't touch the session.
+    if not cart.get(product_id) and not Product.objects.filter(id=product_id).exists():
+        return JsonResponse({'error': 'Unknown product'}, status=404)
+
+    change(cart, quantity)
+    return _cart_response(cart)
 
 def order(request):
     if request.method == 'POST':
         # Get cart and customer data from session
-        cart = request.session.get('Cart', {})
+        cart = Cart(request.session)
         cust = request.session.get('Customer', {})
         
         # Handle the case where the cart is empty
-        if not cart.get('Products'):
+        if not len(cart):
             return redirect('home')
 
+        failed = _checkout(request, cart, cust)
+        if failed is not None:
+            return failed
+
+        # Clear the cart from the session after successful order
+        cart.clear()
+        
+        # Redirect to the order confirmation page
+        return redirect('ordered')
+    
+    # If it's a GET request, just render the order page
+    return render(request, 'order.html', {'Cart': request.session.get('Cart', {}), 'Customer': request.session.get('Customer', {})})
+
+def _checkout(request, cart, cust):
+    """
+    Writes the customer (for guests), the order and its confirmation email as
+    one transaction. Returns a redirect if the order can't be placed, else None.
+    Shared with the async checkout, which runs it in a worker thread.
+    """
+    # The customer lookup/creation and the order rows are written as one unit.
+    with transaction.atomic():
         # Determine if the user is logged in
         customer_obj = None
         if 'ID' in cust:
@@ -390,8 +483,8 @@ def order(request):
                 phone = request.POST.get('phone')
                 passwordTemp = request.POST.get('password')
                 password = make_password(passwordTemp)
+                # Customer.email is unique, so a returning guest reuses their row
                 customer_obj, created = Customer.objects.get_or_create(
-                    first_name="Customer",
                     email=guest_email,
                     defaults={
                         'first_name': guest_first_name,
@@ -404,45 +497,20 @@ def order(request):
             except Exception as e:
                 # Handle potential database errors
                 return redirect('home')
-
-        # Create the Order object
-        order = Order.objects.create(
-            customer=customer_obj,
+            # An existing account only gets the order if the guest knows its
+            # password; otherwise anyone could add orders to someone else's history.
+            if not created and not (passwordTemp and customer_obj.check_password(passwordTemp)):
+                return redirect('login')
+
+        # Create the Order and its OrderItem entries in bulk
+        order, order_items_data, total_price = place_order(
+            customer_obj,
+            cart.lines,
             address=cust.get('Address', ''),  # Assuming address is in session for logged-in users
             phone=cust.get('Phone', ''),      # Assuming phone is in session for logged-in users
         )
 
-        # Prepare order details for email and database
-        order_items_data = []
-        total_price = 0.0
-
-        # Loop through cart products and create OrderItem entries
-        for product_key, item_data in cart['Products'].items():
-            try:
-                product_obj = Product.objects.get(id=item_data['Product_ID'])
-                OrderItem.objects.create(
-                    order=order,
-                    product=product_obj,
-                    quantity=item_data['Quantity'],
-                    price=item_data['Price']
-                )
-                # Update the amount_sold field in the Product model
-                product_obj.amount_sold += item_data['Quantity']
-                product_obj.save()
-                
-                # Add item data to a list for the email
-                order_items_data.append({
-                    'title': item_data['title'],
-                    'quantity': item_data['Quantity'],
-                    'price': item_data['Price']
-                })
-                total_price += item_data['Price'] * item_data['Quantity']
-            except Product.DoesNotExist:
-                # Handle case where a product in the cart no longer exists
-                continue
-
         # Render the HTML template for the email
-
         html_message = render_to_string('email_confirmation.html', {
             'customer_name': customer_obj.first_name,
             'order_items': order_items_data,
@@ -452,47 +520,36 @@ def order(request):
         # Create a plain-text version for email clients that don't support HTML
         plain_message = strip_tags(html_message)
 
-        # Send the email
-        send_mail(
+        # Queue the email in the same transaction as the order; send_queued_emails delivers it
+        queue_email(
             'Order Confirmation',
             plain_message,
             'Eshopper@example.com',
             [customer_obj.email],
-            fail_silently=False,
             html_message=html_message
         )
-        
-        # Clear the cart from the session after successful order
-        del request.session['Cart']
-        request.session.modified = True
-        
-        # Redirect to the order confirmation page
-        return redirect('ordered')
-    
-    # If it's a GET request, just render the order page
-    return render(request, 'order.html', {'Cart': request.session.get('Cart', {}), 'Customer': request.session.get('Customer', {})})
+    return None
+
+def _customer_orders(request):
+    """
+    Orders belonging to the logged-in customer or the session's guest customer,
+    filtered by join so no separate Customer query is needed.
+    """
+    cust = request.session.get('Customer', {})
+    if 'ID' in cust:
+        return Order.with_totals().filter(customer_id=cust['ID'])
+    session_key = request.session.session_key
+    return Order.with_totals().filter(customer__email=f"guest-{session_key}@guest.com")
 
 def orders(request):
     """
-    Displays a list of all orders for the logged-in customer or guest user.
+    Displays a paginated list of orders, with totals, for the logged-in customer or guest user.
     """
     cust = request.session.get('Customer', {})
     cart = request.session.get('Cart', {})
-    if 'ID' in cust:
-        # Logged-in customer
-        customer_id = cust['ID']
-        orders = Order.objects.filter(customer_id=customer_id).order_by('-date')
-        return render(request, 'orders.html', {'Orders': orders, 'Cart': cart, 'Customer': cust})
-    else:
-        # Guest user
-        session_key = request.session.session_key
-        # Find the temporary guest customer
-        try:
-            guest_customer = Customer.objects.get(email=f"guest-{session_key}@guest.com")
-            orders = Order.objects.filter(customer=guest_customer).order_by('-date')
-            return render(request, 'orders.html', {'Orders': orders})
-        except Customer.DoesNotExist:
-            return render(request, 'orders.html', {'Orders': []})
+    orders = _customer_orders(request).order_by('-date', '-id')
+    page = Paginator(orders, 20).get_page(request.GET.get('page'))
+    return render(request, 'orders.html', {'Orders': page, 'Page': page, 'Cart': cart, 'Customer': cust})
 
 def orders_details(request, order_id):
     """
@@ -500,35 +557,20 @@ def orders_details(request, order_id):
     """
     cust = request.session.get('Customer', {})
     cart = request.session.get('Cart', {})
-    
-    # Determine the customer object to check ownership
-    customer_obj = None
-    if 'ID' in cust:
-        try:
-            customer_obj = Customer.objects.get(id=cust['ID'])
-        except Customer.DoesNotExist:
-            return redirect('home')
-    else:
-        try:
-            session_key = request.session.session_key
-            customer_obj = Customer.objects.get(email=f"guest-{session_key}@guest.com")
-        except Customer.DoesNotExist:
-            return redirect('home')
 
     # Get the order and check if it belongs to the current user
     try:
-        order = Order.objects.get(id=order_id, customer=customer_obj)
-        order_items = OrderItem.objects.filter(order=order)
-
-        sum = 0
-        for x in order_items:
-            sum += x.price
-
-        return render(request, 'orders_details.html', {'order': order, 'order_items': order_items, 'Cart': cart, 'Customer': cust, 'Sum': sum})
-    except Order.DoesNotExist:
+        order = _customer_orders(request).get(id=order_id)
+    except (Order.DoesNotExist, ValueError):
         # Redirect if the order does not exist or doesn't belong to the user
         return redirect('home')
 
+    # select_related so OrderItem.__str__ doesn't query each product
+    order_items = (OrderItem.objects.filter(order=order).select_related('product')
+                   .annotate(line_total=F('price') * F('quantity')).order_by('id'))
+
+    return render(request, 'orders_details.html', {'order': order, 'order_items': order_items, 'Cart': cart, 'Customer': cust, 'Sum': order.total})
+
 
 def ordered(request):
 
@@ -541,3 +583,65 @@ def ordered(request):
     }
 
     return render(request, 'ordered.html', context)
+
+def _date_params(request):
+    """
+    {'start': date or None, 'end': date or None} from ?start= and ?end=
+    (YYYY-MM-DD), or None if either is given but isn't a valid date.
+    """
+    dates = {}
+    for name in ('start', 'end'):
+        value = request.GET.get(name, '')
+        try:
+            dates[name] = parse_date(value)
+        except ValueError:
+            dates[name] = None
+        if value and dates[name] is None:
+            return None
+    return dates
+
+
+@staff_member_required
+@require_GET
+def sales_report(request, report):
+    """
+    Staff-only sales report as JSON, or CSV with ?format=csv, read from the
+    daily rollup tables. ?start= and ?end= (YYYY-MM-DD) pick the days.
+    """
+    if report not in REPORTS:
+        return JsonResponse({'error': f'Unknown report {report!r}.'}, status=404)
+    dates = _date_params(request)
+    if dates is None:
+        return JsonResponse({'error': 'Dates must be YYYY-MM-DD.'}, status=400)
+    default_start, default_end = default_range(report)
+    start, end = dates['start'] or default_start, dates['end'] or default_end
+
+    rows = get_report(report, start, end)
+    if request.GET.get('format') == 'csv':
+        response = HttpResponse(to_csv(report, rows), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{report}-{start}-{end}.csv"'
+        return response
+    return JsonResponse({'report': report, 'start': start.isoformat(), 'end': end.isoformat(), 'rows': rows})
+
+
+@staff_member_required
+@require_GET
+def order_export(request):
+    """
+    Staff-only download of every order line as CSV, or JSON Lines with
+    ?format=jsonl, streamed as it is read. ?start= and ?end= (YYYY-MM-DD)
+    limit it to orders dated in that range.
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({'error': f'Unknown format {fmt!r}.'}, status=400)
+    dates = _date_params(request)
+    if dates is None:
+        return JsonResponse({'error': 'Dates must be YYYY-MM-DD.'}, status=400)
+    start, end = dates['start'], dates['end']
+
+    # Under ASGI a sync iterator would be read whole before the first byte is sent.
+    stream = astream_order_lines if isinstance(request, ASGIRequest) else stream_order_lines
+    response = StreamingHttpResponse(stream(fmt, start, end), content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(fmt, start, end)}"'
+    return response